@@ -48,6 +48,7 @@ class FieldValueResponse(BaseModel):
     field_name: str
     field_type: str
     value: Any 
+    file_urls: Optional[List[str]] = None  # presigned download URLs for file fields, when requested
 
 
 class FormBySubmissionResponse(BaseModel):
@@ -76,6 +77,109 @@ class PresignedUrlResponse(BaseModel):
     method: str
     message: str
 
+# Direct-to-storage submission uploads
+class UploadUrlRequestItem(BaseModel):
+    field_id: UUID
+    file_name: str
+
+
+class SubmissionUploadUrlRequest(BaseModel):
+    form_id: UUID
+    files: List[UploadUrlRequestItem]
+    expiryHours: int = Field(1, ge=1, le=24)
+
+
+class SubmissionUploadUrl(BaseModel):
+    field_id: UUID
+    file_name: str
+    key: str
+    content_type: str  # must be sent as the Content-Type of the PUT
+    url: str
+
+
+class SubmissionUploadUrlResponse(BaseModel):
+    uploads: List[SubmissionUploadUrl]
+    expiryHours: int
+    method: str = "PUT"
+
+
+class UploadedFileRef(BaseModel):
+    field_id: UUID
+    key: str
+
+
+class FinalizeSubmissionRequest(BaseModel):
+    form_id: UUID
+    field_values: List[FieldValue] = []
+    files: List[UploadedFileRef]
+
+
+# Batch submissions (offline sync)
+class BatchSubmissionItem(BaseModel):
+    idempotency_key: Optional[str] = None  # echoed back in the item's result
+    form_id: UUID
+    field_values: List[FieldValue] = []
+    files: List[UploadedFileRef] = []  # keys from upload-urls or resumable uploads
+
+
+class BatchSubmissionRequest(BaseModel):
+    submissions: List[BatchSubmissionItem]
+
+
+class BatchSubmissionItemResult(BaseModel):
+    index: int
+    idempotency_key: Optional[str] = None
+    status: str  # created / rejected / failed
+    submission_id: Optional[UUID] = None
+    submitted_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
+class BatchSubmissionResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchSubmissionItemResult]
+
+
+# Write-behind (queued) submissions
+class QueuedSubmissionResponse(BaseModel):
+    submission_id: UUID
+    message: str
+    status: str  # pending until the ingest worker has written it
+    enqueued_at: datetime
+
+
+class IngestStatusResponse(BaseModel):
+    submission_id: UUID
+    status: str  # pending / materialized / failed
+    enqueued_at: Optional[datetime] = None  # while the queue row is kept
+    materialized_at: Optional[datetime] = None
+    submitted_at: Optional[datetime] = None  # once the queue row has been purged
+    error: Optional[str] = None  # last error; a pending row with one is being retried
+    attempts: int = 0
+
+
+# Resumable uploads
+class ResumableUploadCreateRequest(BaseModel):
+    file_name: str
+    size: int = Field(..., ge=0)  # total bytes the client will send
+    content_type: Optional[str] = None
+
+
+class ResumableUploadResponse(BaseModel):
+    upload_id: UUID
+    key: str
+    offset: int
+    size: int
+    max_chunk_size: int
+
+
+class ResumableUploadCompleteResponse(BaseModel):
+    upload_id: UUID
+    key: str  # pass to submit-form/finalize
+    size: int
+
+
 # Request model for export endpoint
 class ExportRequest(BaseModel):
     form_id: Optional[str] = None
@@ -85,4 +189,6 @@ class ExportRequest(BaseModel):
     start_date: Optional[str] = None
     end_date: Optional[str] = None
     page: int = 0
-    limit: int = 10
\ No newline at end of file
+    limit: int = 10
+    include_file_urls: bool = False
+    count: str = "exact"  # exact / estimated / none
@@ -0,0 +1,203 @@
+"""
+In-process cache for the dashboards, which every open client polls.
+
+Entries are keyed (schema, user_id, endpoint), with user_id None for
+tenant-wide views such as the admin dashboard. They expire after
+DASHBOARD_CACHE_TTL_SECONDS and the least recently used ones are evicted
+beyond DASHBOARD_CACHE_SIZE. Write paths that move a dashboard number call
+invalidate_dashboards(), which drops the affected entries once the request
+commits.
+
+Each worker process has its own cache. With DASHBOARD_CACHE_NOTIFY on, an
+invalidation is also published on a Postgres channel and applied by the
+other workers' listeners; with it off, their copies expire after the TTL.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set
+
+import psycopg
+from psycopg import sql
+
+from app.configuration.database import DB_CONFIG, get_async_db_connection, on_commit, outside_request_session
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "10000"))
+# Publish invalidations to the other workers over LISTEN/NOTIFY.
+DASHBOARD_CACHE_NOTIFY = os.getenv("DASHBOARD_CACHE_NOTIFY", "false").lower() in ("1", "true", "yes")
+DASHBOARD_CACHE_CHANNEL = os.getenv("DASHBOARD_CACHE_CHANNEL", "dashboard_cache")
+
+ADMIN_DASHBOARD = "admin_dashboard"
+USER_DASHBOARD = "user_dashboard"
+
+# Tells this worker's own notifications apart from the others'.
+_ORIGIN = uuid.uuid4().hex
+
+
+class TTLCache:
+    """
+    Thread-safe TTL + LRU map of tuple keys whose first item is the schema.
+
+    A load that was running while its schema was invalidated is returned to
+    its caller but not stored, so it cannot put pre-write numbers back.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._by_schema: Dict[str, Set[tuple]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: tuple, load: Callable[[], Any]) -> Any:
+        schema = key[0]
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                self._remove(key)
+            generation = self._generations.get(schema, 0)
+
+        value = load()
+
+        if self.maxsize > 0 and self.ttl > 0:
+            with self._lock:
+                if self._generations.get(schema, 0) == generation:
+                    self._entries[key] = (now + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    self._by_schema.setdefault(schema, set()).add(key)
+                    while len(self._entries) > self.maxsize:
+                        self._remove(next(iter(self._entries)))
+        return value
+
+    def invalidate(self, schema: str, user_id: Optional[str] = None):
+        """Drop the schema's entries; with user_id, only that user's and the tenant-wide ones."""
+        with self._lock:
+            self._generations[schema] = self._generations.get(schema, 0) + 1
+            for key in list(self._by_schema.get(schema, ())):
+                if user_id is None or key[1] is None or key[1] == user_id:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            for schema in self._by_schema:
+                self._generations[schema] = self._generations.get(schema, 0) + 1
+            self._entries.clear()
+            self._by_schema.clear()
+
+    def _remove(self, key: tuple):
+        self._entries.pop(key, None)
+        keys = self._by_schema.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_schema[key[0]]
+
+
+dashboard_cache = TTLCache(DASHBOARD_CACHE_SIZE, DASHBOARD_CACHE_TTL_SECONDS)
+
+
+def cached_dashboard(schema: str, user_id: Optional[str], endpoint: str, load: Callable[[], Any]) -> Any:
+    """`load()`'s result for this dashboard, from the cache while it is fresh."""
+    return dashboard_cache.get_or_load((schema, str(user_id) if user_id else None, endpoint), load)
+
+
+def invalidate_dashboards(schema: str, user_id: Optional[str] = None):
+    """
+    Drop the cached dashboards a write changed, once it commits: the
+    tenant-wide ones, plus only `user_id`'s own (every user's when None).
+    """
+    user_id = str(user_id) if user_id else None
+
+    def apply():
+        dashboard_cache.invalidate(schema, user_id)
+        if DASHBOARD_CACHE_NOTIFY:
+            _publish(schema, user_id)
+
+    on_commit(apply)
+
+
+# --- Cross-worker invalidation ---
+
+_listener: Optional[asyncio.Task] = None
+_publishing: Set[asyncio.Task] = set()
+
+
+def _publish(schema: str, user_id: Optional[str]):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # no event loop in this thread; the other workers fall back to the TTL
+        return
+    task = loop.create_task(_notify(json.dumps({"schema": schema, "user_id": user_id, "origin": _ORIGIN})))
+    _publishing.add(task)
+    task.add_done_callback(_publishing.discard)
+
+
+async def _notify(payload: str):
+    try:
+        with outside_request_session():
+            async with get_async_db_connection("public") as cursor:
+                await cursor.execute("SELECT pg_notify(%s, %s)", (DASHBOARD_CACHE_CHANNEL, payload))
+    except Exception as e:
+        logger.error(f"Could not publish dashboard cache invalidation: {str(e)}")
+
+
+def _apply_notification(payload: str):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.error(f"Ignoring malformed dashboard cache notification: {payload!r}")
+        return
+    if message.get("origin") != _ORIGIN and message.get("schema"):
+        dashboard_cache.invalidate(message["schema"], message.get("user_id"))
+
+
+async def _listen():
+    while True:
+        try:
+            conn = await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True)
+            async with conn:
+                await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(DASHBOARD_CACHE_CHANNEL)))
+                # anything published while we were not listening is lost
+                dashboard_cache.clear()
+                async for notification in conn.notifies():
+                    _apply_notification(notification.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Dashboard cache listener lost its connection, reconnecting: {str(e)}")
+            await asyncio.sleep(5)
+
+
+def start_cache_listener():
+    """Start applying other workers' invalidations (when DASHBOARD_CACHE_NOTIFY is on)."""
+    global _listener
+    if not DASHBOARD_CACHE_NOTIFY or _listener is not None:
+        return
+    _listener = asyncio.create_task(_listen())
+
+
+async def stop_cache_listener():
+    global _listener
+    if _listener is None:
+        return
+    _listener.cancel()
+    try:
+        await _listener
+    except asyncio.CancelledError:
+        pass
+    _listener = None
@@ -0,0 +1,57 @@
+"""
+Total-count strategies for paginated listings, chosen by the caller with
+?count=:
+
+    exact      the true total: from a maintained counter table when the
+               listing has one that covers the filter, else COUNT(*)
+    estimated  the planner's row estimate for the filter, from EXPLAIN;
+               nothing is scanned, so it costs the same at any table size
+    none       no total at all; the page reports has_more instead
+
+Listings fetch limit + 1 rows in every mode, so has_more is always exact.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+COUNT_EXACT = "exact"
+COUNT_ESTIMATED = "estimated"
+COUNT_NONE = "none"
+COUNT_STRATEGIES = (COUNT_EXACT, COUNT_ESTIMATED, COUNT_NONE)
+
+
+def check_count_strategy(count: Optional[str]) -> str:
+    """The strategy to use for `count`; exact when not given."""
+    count = (count or COUNT_EXACT).lower()
+    if count not in COUNT_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Invalid count value. Must be one of: {', '.join(COUNT_STRATEGIES)}.")
+    return count
+
+
+def _plan_rows(plan) -> int:
+    # EXPLAIN (FORMAT JSON) returns one json value: [{"Plan": {...}}]
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def estimate_count(cursor, query: str, params: Sequence) -> int:
+    """Planner estimate of how many rows `query` returns."""
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", tuple(params))
+    return _plan_rows(cursor.fetchone()[0])
+
+
+async def estimate_count_async(cursor, query: str, params: Sequence) -> int:
+    """estimate_count for psycopg 3 async cursors."""
+    await cursor.execute(f"EXPLAIN (FORMAT JSON) {query}", tuple(params))
+    return _plan_rows((await cursor.fetchone())[0])
+
+
+def split_page(rows: List, limit: int) -> Tuple[List, bool]:
+    """Rows fetched with LIMIT limit + 1 -> (the page, has_more)."""
+    return rows[:limit], len(rows) > limit
+
+
+def total_pages(total: Optional[int], limit: int) -> Optional[int]:
+    if total is None or limit <= 0:
+        return None
+    return (total + limit - 1) // limit
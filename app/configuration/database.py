@@ -35,15 +35,30 @@ load_dotenv()
 # Create the pool
 
 
+import functools
+import inspect
 import os
+import threading
+import time
 import jwt  # PyJWT library for token handling
+import psycopg
 import psycopg2
 from psycopg2 import pool
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 from fastapi import FastAPI, Request, HTTPException, APIRouter
 from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 
+from app.configuration import metrics, query_stats
+from app.configuration.pool import (
+    AsyncSchemaAwarePool,
+    PoolQueueFullError,
+    PoolTimeoutError,
+    SchemaAwarePool,
+)
+
 # --- Configuration (Simulating .env) ---
 # In a real app, use a library like python-dotenv to load these
 
@@ -51,6 +66,10 @@ from typing import Optional
 # This section sets up the connection pool and the crucial context manager.
 
 db_pool = None
+async_db_pool = None
+# Optional read replica; None unless DB_REPLICA_HOST is set.
+replica_db_pool = None
+async_replica_db_pool = None
 
 
 DB_CONFIG = {
@@ -61,28 +80,368 @@ DB_CONFIG = {
     "port": int(os.getenv("DATABASE_PORT", "5432")),
 }
 
+DB_POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("DB_POOL_MAX", "10")),
+    # seconds a checkout may wait for a busy pool before giving up
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    # requests allowed to wait at once; the rest are rejected straight away
+    "max_waiters": int(os.getenv("DB_POOL_MAX_WAITERS", "50")),
+    # value of the Retry-After header sent with a 503
+    "retry_after": int(os.getenv("DB_POOL_RETRY_AFTER", "1")),
+}
+
+
+def _parse_schema_map(value: Optional[str], cast) -> dict:
+    """Parses "schema_a=3,schema_b=1" into {"schema_a": cast("3"), ...}."""
+    result = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        schema, _, setting = item.partition("=")
+        result[schema.strip()] = cast(setting.strip())
+    return result
+
+
+# Per-tenant quotas, shared by both pools. A schema may hold at most its
+# limit of connections at once (0 = the whole pool) and is served by
+# weighted fair queuing when connections are scarce (default weight 1).
+DB_POOL_SCHEMA_CONFIG = {
+    "schema_limit": int(os.getenv("DB_POOL_SCHEMA_LIMIT", "0")),
+    "schema_limits": _parse_schema_map(os.getenv("DB_POOL_SCHEMA_LIMITS"), int),
+    "schema_weights": _parse_schema_map(os.getenv("DB_POOL_SCHEMA_WEIGHTS"), float),
+    # waiters allowed per schema (0 = max_waiters), so one tenant cannot fill the queue
+    "schema_max_waiters": int(os.getenv("DB_POOL_SCHEMA_MAX_WAITERS", "0")),
+}
+
+# Read replica. Everything but the host defaults to the primary's settings.
+DB_REPLICA_CONFIG = {
+    "host": os.getenv("DB_REPLICA_HOST"),
+    "user": os.getenv("DB_REPLICA_USER", os.getenv("DB_USER")),
+    "password": os.getenv("DB_REPLICA_PASSWORD", os.getenv("DB_PASSWORD")),
+    "dbname": os.getenv("DB_REPLICA_NAME", os.getenv("DATABASE_NAME")),
+    "port": int(os.getenv("DB_REPLICA_PORT", os.getenv("DATABASE_PORT", "5432"))),
+    # refuse writes even if a non-read-only query is routed here by mistake
+    "options": "-c default_transaction_read_only=on",
+}
+
+DB_REPLICA_POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_REPLICA_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("DB_REPLICA_POOL_MAX", os.getenv("DB_POOL_MAX", "10"))),
+}
+
+# Pool used by the async routes (psycopg 3); sized independently of db_pool.
+DB_ASYNC_POOL_CONFIG = {
+    "minconn": int(os.getenv("DB_ASYNC_POOL_MIN", "1")),
+    "maxconn": int(os.getenv("DB_ASYNC_POOL_MAX", "10")),
+}
+
+
+class DatabaseBusyError(HTTPException):
+    """Raised when no pooled connection is available; surfaces as a 503 with Retry-After."""
+
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=503,
+            detail=detail,
+            headers={"Retry-After": str(DB_POOL_CONFIG["retry_after"])},
+        )
+
+
+def _route_label(session: Optional["RequestDBSession"] = None) -> str:
+    session = session or _current_session.get()
+    return session.route if session is not None else "none"
+
+
+def _observe_hold(pool: str, schema: str, checked_out_at: float, route: Optional[str] = None):
+    metrics.hold_seconds.observe(
+        time.perf_counter() - checked_out_at,
+        pool=pool,
+        schema=schema,
+        route=route or _route_label(),
+    )
+
+
+def _record_query(cur, query, started: float, failed: bool):
+    elapsed = time.perf_counter() - started
+    schema = cur.schema
+    session = _current_session.get()
+    route = _route_label(session)
+    labels = {"pool": cur.pool_label, "schema": schema or "none", "route": route}
+    metrics.queries_total.inc(**labels)
+    metrics.query_seconds.observe(elapsed, **labels)
+    if session is not None:
+        session.count_query(schema)
+    rows = None if failed else cur.rowcount
+    query_stats.record(query, elapsed, rows, schema, route, cur.pool_label, failed=failed)
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """psycopg2 cursor that times every statement for the metrics and slow-query log."""
+
+    schema = None  # set by get_db_connection
+    pool_label = "sync"
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, vars)
+            failed = False
+            return result
+        finally:
+            _record_query(self, query, started, failed)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().executemany(query, vars_list)
+            failed = False
+            return result
+        finally:
+            _record_query(self, query, started, failed)
+
+
+class InstrumentedAsyncCursor(psycopg.AsyncCursor):
+    """psycopg 3 counterpart of InstrumentedCursor."""
+
+    schema = None  # set by get_async_db_connection
+    pool_label = "async"
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await super().execute(query, params, **kwargs)
+            failed = False
+            return result
+        finally:
+            _record_query(self, query, started, failed)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await super().executemany(query, params_seq, **kwargs)
+            failed = False
+            return result
+        finally:
+            _record_query(self, query, started, failed)
+
+
+metrics.register_pool("sync", lambda: db_pool)
+metrics.register_pool("async", lambda: async_db_pool)
+metrics.register_pool("sync_replica", lambda: replica_db_pool)
+metrics.register_pool("async_replica", lambda: async_replica_db_pool)
+
+
+def _new_sync_pool(pool_config: dict, db_config: dict) -> SchemaAwarePool:
+    return SchemaAwarePool(
+        minconn=pool_config["minconn"],
+        maxconn=pool_config["maxconn"],
+        timeout=DB_POOL_CONFIG["timeout"],
+        max_waiters=DB_POOL_CONFIG["max_waiters"],
+        **DB_POOL_SCHEMA_CONFIG,
+        **db_config,
+        cursor_factory=InstrumentedCursor,
+    )
+
 
 def initialize_db_pool():
     """Initializes the connection pool. Call this once at application startup."""
-    global db_pool
+    global db_pool, replica_db_pool
     if db_pool is None:
         try:
             print("Initializing database connection pool...")
-            db_pool = psycopg2.pool.SimpleConnectionPool(
-                minconn=1,
-                maxconn=10,
-                host=DB_CONFIG["host"],
-                user=DB_CONFIG["user"],
-                password=DB_CONFIG["password"],
-                dbname=DB_CONFIG["dbname"],
-                port=DB_CONFIG["port"],
-            )
+            db_pool = _new_sync_pool(DB_POOL_CONFIG, DB_CONFIG)
             print("Database pool initialized successfully.")
         except psycopg2.OperationalError as e:
             print(f"FATAL: Could not connect to database: {e}")
             # In a real app, you might exit or have a retry mechanism
             raise RuntimeError(f"Error creating DB pool: {e}")
 
+    if replica_db_pool is None and DB_REPLICA_CONFIG["host"]:
+        try:
+            print("Initializing read replica connection pool...")
+            replica_db_pool = _new_sync_pool(DB_REPLICA_POOL_CONFIG, DB_REPLICA_CONFIG)
+            print("Read replica pool initialized successfully.")
+        except psycopg2.OperationalError as e:
+            # Reads keep working against the primary.
+            print(f"WARNING: Could not connect to read replica, reads stay on the primary: {e}")
+
+
+def close_db_pool():
+    """Closes every pooled connection. Call this once at application shutdown."""
+    global db_pool, replica_db_pool
+    if replica_db_pool is not None:
+        replica_db_pool.closeall()
+        replica_db_pool = None
+        print("Read replica connection pool closed.")
+    if db_pool is not None:
+        db_pool.closeall()
+        db_pool = None
+        print("Database connection pool closed.")
+
+
+async def _new_async_pool(pool_config: dict, db_config: dict) -> AsyncSchemaAwarePool:
+    pool = AsyncSchemaAwarePool(
+        minconn=pool_config["minconn"],
+        maxconn=pool_config["maxconn"],
+        timeout=DB_POOL_CONFIG["timeout"],
+        max_waiters=DB_POOL_CONFIG["max_waiters"],
+        **DB_POOL_SCHEMA_CONFIG,
+        **db_config,
+        cursor_factory=InstrumentedAsyncCursor,
+    )
+    await pool.open()
+    return pool
+
+
+async def initialize_async_db_pool():
+    """Initializes the async connection pool. Await this once at application startup."""
+    global async_db_pool, async_replica_db_pool
+    if async_db_pool is None:
+        try:
+            print("Initializing async database connection pool...")
+            async_db_pool = await _new_async_pool(DB_ASYNC_POOL_CONFIG, DB_CONFIG)
+            print("Async database pool initialized successfully.")
+        except psycopg.OperationalError as e:
+            print(f"FATAL: Could not connect to database: {e}")
+            raise RuntimeError(f"Error creating async DB pool: {e}")
+
+    if async_replica_db_pool is None and DB_REPLICA_CONFIG["host"]:
+        try:
+            print("Initializing async read replica connection pool...")
+            async_replica_db_pool = await _new_async_pool(DB_REPLICA_POOL_CONFIG, DB_REPLICA_CONFIG)
+            print("Async read replica pool initialized successfully.")
+        except psycopg.OperationalError as e:
+            print(f"WARNING: Could not connect to read replica, reads stay on the primary: {e}")
+
+
+async def close_async_db_pool():
+    """Closes every async pooled connection. Await this once at application shutdown."""
+    global async_db_pool, async_replica_db_pool
+    if async_replica_db_pool is not None:
+        await async_replica_db_pool.closeall()
+        async_replica_db_pool = None
+        print("Async read replica connection pool closed.")
+    if async_db_pool is not None:
+        await async_db_pool.closeall()
+        async_db_pool = None
+        print("Async database connection pool closed.")
+
+
+# --- 2. Read replica routing ---
+# Service methods decorated with @read_only run their queries on the replica
+# when one is configured. Once a request has run anything else on the primary
+# its later reads stay on the primary too, so a request always sees its own
+# writes.
+
+_read_only: ContextVar[bool] = ContextVar("db_read_only", default=False)
+
+
+def read_only(func):
+    """Marks a service method or function whose queries may run on the read replica."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = _read_only.set(True)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _read_only.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+
+    return wrapper
+
+
+def _choose_pool(primary, replica, label: str, session: Optional["RequestDBSession"]):
+    """Returns (pool, label, is_replica) for the next block."""
+    if _read_only.get():
+        if replica is not None and not (session is not None and session.used_primary):
+            return replica, f"{label}_replica", True
+    elif session is not None:
+        session.used_primary = True
+    return primary, label, False
+
+
+def _checkout(pool, label: str, schema: str):
+    """Returns (conn, checked_out_at); turns an exhausted pool into a 503."""
+    started = time.perf_counter()
+    labels = {"pool": label, "schema": schema, "route": _route_label()}
+    try:
+        conn = pool.getconn(schema)
+    except PoolQueueFullError:
+        metrics.checkout_rejected_total.inc(reason="queue_full", **labels)
+        raise DatabaseBusyError("Server is busy, please retry shortly")
+    except PoolTimeoutError:
+        metrics.checkout_rejected_total.inc(reason="timeout", **labels)
+        raise DatabaseBusyError("Timed out waiting for a database connection")
+    checked_out_at = time.perf_counter()
+    metrics.checkout_wait_seconds.observe(checked_out_at - started, **labels)
+    return conn, checked_out_at
+
+
+async def _checkout_async(pool, label: str, schema: str):
+    """Async version of _checkout."""
+    started = time.perf_counter()
+    labels = {"pool": label, "schema": schema, "route": _route_label()}
+    try:
+        conn = await pool.getconn(schema)
+    except PoolQueueFullError:
+        metrics.checkout_rejected_total.inc(reason="queue_full", **labels)
+        raise DatabaseBusyError("Server is busy, please retry shortly")
+    except PoolTimeoutError:
+        metrics.checkout_rejected_total.inc(reason="timeout", **labels)
+        raise DatabaseBusyError("Timed out waiting for a database connection")
+    checked_out_at = time.perf_counter()
+    metrics.checkout_wait_seconds.observe(checked_out_at - started, **labels)
+    return conn, checked_out_at
+
+
+def _checkout_routed(schema: str, session: Optional["RequestDBSession"]):
+    """Check out from the replica or the primary; falls back to the primary if the replica is down."""
+    pool, label, replica = _choose_pool(db_pool, replica_db_pool, "sync", session)
+    if replica:
+        try:
+            return (pool, label) + _checkout(pool, label, schema)
+        except psycopg2.OperationalError as e:
+            print(f"Read replica unavailable, using the primary for schema '{schema}': {e}")
+            pool, label = db_pool, "sync"
+    return (pool, label) + _checkout(pool, label, schema)
+
+
+async def _checkout_routed_async(schema: str, session: Optional["RequestDBSession"]):
+    """Async version of _checkout_routed."""
+    pool, label, replica = _choose_pool(async_db_pool, async_replica_db_pool, "async", session)
+    if replica:
+        try:
+            return (pool, label) + await _checkout_async(pool, label, schema)
+        except psycopg.OperationalError as e:
+            print(f"Read replica unavailable, using the primary for schema '{schema}': {e}")
+            pool, label = async_db_pool, "async"
+    return (pool, label) + await _checkout_async(pool, label, schema)
+
+
+def _new_cursor(conn, schema: str, label: str):
+    cur = conn.cursor()
+    cur.schema = schema
+    cur.pool_label = label
+    return cur
+
+
+# --- 3. Connection context managers ---
+
 
 @contextmanager
 def get_db_connection(schema: str):
@@ -91,23 +450,424 @@ def get_db_connection(schema: str):
     if not db_pool:
         raise RuntimeError("Database pool is not initialized.")
 
+    session = _current_session.get()
+    if session is not None and not session.closed:
+        with _session_cursor(session, schema) as cur:
+            yield cur
+        return
+
+    pool = None
     conn = None
     cur = None
+    switched_schema = False
+    broken = False
     try:
-        conn = db_pool.getconn()
-        cur = conn.cursor()
-        # set schema
-        cur.execute(f"SET search_path TO {schema};")
+        pool, label, conn, checked_out_at = _checkout_routed(schema, None)
+        cur = _new_cursor(conn, schema, label)
+        # set schema, unless this connection is already on it
+        if pool.get_search_path(conn) != schema:
+            cur.execute(f"SET search_path TO {schema};")
+            pool.set_search_path(conn, schema)
+            switched_schema = True
         yield cur
         conn.commit()
     except Exception as e:
-        if conn:
-            conn.rollback()
+        if conn and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            # SET is transactional, so the rollback undid it as well
+            if switched_schema:
+                pool.set_search_path(conn, None)
         print(f"Error in DB context for schema '{schema}': {e}")
         raise
     finally:
-        if cur:
+        if cur and not cur.closed:
             cur.close()
         if conn:
-            db_pool.putconn(conn)
-            print(f"DB Context: Connection returned to pool for schema '{schema}'.")
+            pool.putconn(conn, close=broken or conn.closed)
+            _observe_hold(label, schema, checked_out_at)
+
+
+@asynccontextmanager
+async def get_async_db_connection(schema: str):
+    """
+    Async equivalent of get_db_connection for `async def` routes.
+
+    Yields a psycopg 3 AsyncCursor on `schema`; queries keep the same `%s`
+    placeholders but must be awaited (`await cursor.execute(...)`,
+    `await cursor.fetchone()`), so the event loop is free while they run.
+    """
+    if not schema:
+        raise ValueError("Schema name must be provided.")
+    if not async_db_pool:
+        raise RuntimeError("Async database pool is not initialized.")
+
+    session = _current_session.get()
+    if session is not None and not session.closed:
+        async with _async_session_cursor(session, schema) as cur:
+            yield cur
+        return
+
+    pool = None
+    conn = None
+    cur = None
+    switched_schema = False
+    broken = False
+    try:
+        pool, label, conn, checked_out_at = await _checkout_routed_async(schema, None)
+        cur = _new_cursor(conn, schema, label)
+        # set schema, unless this connection is already on it
+        if pool.get_search_path(conn) != schema:
+            await cur.execute(f"SET search_path TO {schema};")
+            pool.set_search_path(conn, schema)
+            switched_schema = True
+        yield cur
+        await conn.commit()
+    except Exception as e:
+        if conn and not conn.closed:
+            try:
+                await conn.rollback()
+            except psycopg.Error:
+                broken = True
+            # SET is transactional, so the rollback undid it as well
+            if switched_schema:
+                pool.set_search_path(conn, None)
+        print(f"Error in async DB context for schema '{schema}': {e}")
+        raise
+    finally:
+        if cur and not cur.closed:
+            await cur.close()
+        if conn:
+            await pool.putconn(conn, close=broken or conn.closed)
+            _observe_hold(label, schema, checked_out_at)
+
+
+# --- 4. Request-scoped session (unit of work) ---
+# Installed by the DB session middleware for every HTTP request. While it is
+# active, get_db_connection / get_async_db_connection check out one connection
+# per pool and schema on first use and hand it to every later block in the
+# same request, so a route that runs several blocks holds one pooled
+# connection and sets search_path once. Nothing is committed until the
+# request finishes.
+
+
+class _SessionConn:
+    __slots__ = (
+        "pool", "label", "conn", "schema", "checked_out_at",
+        "dirty", "switched_schema", "depth", "savepoints",
+    )
+
+    def __init__(self, pool, label: str, conn, schema: str, checked_out_at: float):
+        self.pool = pool
+        self.label = label
+        self.conn = conn
+        self.schema = schema
+        self.checked_out_at = checked_out_at
+        self.dirty = False  # a block already completed in the open transaction
+        self.switched_schema = False  # search_path was SET in the open transaction
+        self.depth = 0  # blocks currently open on this connection
+        self.savepoints = 0
+
+
+class RequestDBSession:
+    """
+    Connections held for the lifetime of one request, keyed by pool and schema.
+
+    Each `with get_db_connection(...)` block still succeeds or fails on its
+    own: the first block of a transaction rolls the whole transaction back
+    on error, later blocks run inside a savepoint so a failure only undoes
+    their own work. Blocks must not run concurrently on the same schema
+    (e.g. under asyncio.gather); one connection serves them all.
+    """
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.closed = False
+        self.scope = scope
+        self.used_primary = False  # later @read_only blocks must see what this request did
+        self.queries = {}  # schema -> statements executed
+        self._lock = threading.Lock()
+        self._sync = {}
+        self._async = {}
+        self._after_commit = []
+
+    @property
+    def route(self) -> str:
+        """Route template (e.g. /api/forms/{form_id}) once the router has matched one."""
+        route = self.scope.get("route") if self.scope else None
+        return getattr(route, "path", None) or "unmatched"
+
+    def count_query(self, schema: Optional[str]):
+        with self._lock:
+            self.queries[schema] = self.queries.get(schema, 0) + 1
+
+    def _get(self, conns: dict, key) -> Optional[_SessionConn]:
+        with self._lock:
+            return conns.get(key)
+
+    def _put(self, conns: dict, key, entry: _SessionConn):
+        with self._lock:
+            conns[key] = entry
+
+    def _drop(self, conns: dict, key):
+        with self._lock:
+            conns.pop(key, None)
+
+    def after_commit(self, callback):
+        with self._lock:
+            self._after_commit.append(callback)
+
+    def _take_all(self, conns: dict):
+        with self._lock:
+            entries = list(conns.values())
+            conns.clear()
+        return entries
+
+
+_current_session: ContextVar[Optional[RequestDBSession]] = ContextVar("db_session", default=None)
+
+
+def begin_request_session(scope: Optional[dict] = None):
+    """Start a session for the current request; returns (session, token) for reset_request_session."""
+    session = RequestDBSession(scope)
+    return session, _current_session.set(session)
+
+
+def reset_request_session(token):
+    _current_session.reset(token)
+
+
+@contextmanager
+def outside_request_session():
+    """
+    Run the enclosed DB blocks on their own connections, each committed as
+    soon as it exits, instead of on the request session.
+
+    For routes that do slow non-DB work (file uploads) and must not hold a
+    pooled connection across it, and that need to know the write committed
+    before the response is built. Don't use it after the request has
+    written to the same rows through the session: the two transactions
+    would wait on each other.
+    """
+    session = _current_session.get()
+    if session is not None:
+        # Writes made in here are invisible to the session's flag, so keep
+        # the rest of the request's reads on the primary.
+        session.used_primary = True
+    token = _current_session.set(None)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def on_commit(callback):
+    """
+    Call `callback()` once the current request's writes are committed; it is
+    dropped if the request rolls back. Outside a request session blocks
+    commit as they exit, so it runs straight away: call it after the block.
+    """
+    session = _current_session.get()
+    if session is None or session.closed:
+        callback()
+        return
+    session.after_commit(callback)
+
+
+async def end_request_session(session: RequestDBSession, commit: bool):
+    """
+    Commit (or roll back) and release every connection the request used.
+
+    Every connection is returned to its pool even if one of them fails; the
+    first failure is re-raised afterwards so the caller can turn the
+    response into an error.
+    """
+    session.closed = True
+    route = session.route
+
+    error = None
+    sync_entries = session._take_all(session._sync)
+    if sync_entries:
+        try:
+            await run_in_threadpool(_finish_sync, sync_entries, commit, route)
+        except Exception as e:
+            error = e
+
+    for entry in session._take_all(session._async):
+        try:
+            await _finish_async(entry, commit, route)
+        except Exception as e:
+            error = error or e
+
+    for schema, count in session.queries.items():
+        metrics.queries_per_request.observe(count, schema=schema or "none", route=route)
+
+    if error is not None:
+        raise error
+
+    if commit:
+        for callback in session._after_commit:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in after-commit callback: {e}")
+
+
+def _finish_sync(entries, commit: bool, route: str):
+    error = None
+    for entry in entries:
+        conn = entry.conn
+        broken = False
+        try:
+            if conn.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        except psycopg2.Error as e:
+            error = error or e
+            broken = True
+        if entry.switched_schema and (broken or not commit):
+            entry.pool.set_search_path(conn, None)
+        # putconn rolls back whatever a failed commit left behind
+        entry.pool.putconn(conn, close=bool(conn.closed))
+        _observe_hold(entry.label, entry.schema, entry.checked_out_at, route)
+    if error is not None:
+        raise error
+
+
+async def _finish_async(entry: _SessionConn, commit: bool, route: str):
+    conn = entry.conn
+    error = None
+    broken = False
+    try:
+        if conn.closed:
+            raise psycopg.InterfaceError("connection already closed")
+        if commit:
+            await conn.commit()
+        else:
+            await conn.rollback()
+    except psycopg.Error as e:
+        error = e
+        broken = True
+    if entry.switched_schema and (broken or not commit):
+        entry.pool.set_search_path(conn, None)
+    # putconn rolls back whatever a failed commit left behind
+    await entry.pool.putconn(conn, close=conn.closed)
+    _observe_hold(entry.label, entry.schema, entry.checked_out_at, route)
+    if error is not None:
+        raise error
+
+
+def _session_entry(session: RequestDBSession, conns: dict, schema: str, primary, replica, label: str):
+    """The session's connection for this block's pool and schema, if it already has one."""
+    _, label, _ = _choose_pool(primary, replica, label, session)
+    return (label, schema), session._get(conns, (label, schema))
+
+
+@contextmanager
+def _session_cursor(session: RequestDBSession, schema: str):
+    key, entry = _session_entry(session, session._sync, schema, db_pool, replica_db_pool, "sync")
+    if entry is None:
+        pool, label, conn, checked_out_at = _checkout_routed(schema, session)
+        key = (label, schema)
+        entry = session._get(session._sync, key)
+        if entry is None:
+            entry = _SessionConn(pool, label, conn, schema, checked_out_at)
+            session._put(session._sync, key, entry)
+        else:
+            # the replica was down and the session already holds a primary connection
+            pool.putconn(conn)
+
+    pool = entry.pool
+    conn = entry.conn
+    cur = _new_cursor(conn, schema, entry.label)
+    savepoint = None
+    entry.depth += 1
+    try:
+        if pool.get_search_path(conn) != schema:
+            cur.execute(f"SET search_path TO {schema};")
+            pool.set_search_path(conn, schema)
+            entry.switched_schema = True
+        if entry.dirty or entry.depth > 1:
+            entry.savepoints += 1
+            savepoint = f"block_{entry.savepoints}"
+            cur.execute(f"SAVEPOINT {savepoint};")
+        yield cur
+        entry.dirty = True
+    except Exception as e:
+        try:
+            if savepoint:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {savepoint};")
+            else:
+                conn.rollback()
+                entry.dirty = False
+                if entry.switched_schema:
+                    entry.switched_schema = False
+                    pool.set_search_path(conn, None)
+        except psycopg2.Error:
+            # The connection is unusable; let the next block start afresh.
+            session._drop(session._sync, key)
+            pool.putconn(conn, close=True)
+            _observe_hold(entry.label, schema, entry.checked_out_at)
+        print(f"Error in DB context for schema '{schema}': {e}")
+        raise
+    finally:
+        entry.depth -= 1
+        if not cur.closed:
+            cur.close()
+
+
+@asynccontextmanager
+async def _async_session_cursor(session: RequestDBSession, schema: str):
+    key, entry = _session_entry(session, session._async, schema, async_db_pool, async_replica_db_pool, "async")
+    if entry is None:
+        pool, label, conn, checked_out_at = await _checkout_routed_async(schema, session)
+        key = (label, schema)
+        entry = session._get(session._async, key)
+        if entry is None:
+            entry = _SessionConn(pool, label, conn, schema, checked_out_at)
+            session._put(session._async, key, entry)
+        else:
+            # the replica was down and the session already holds a primary connection
+            await pool.putconn(conn)
+
+    pool = entry.pool
+    conn = entry.conn
+    cur = _new_cursor(conn, schema, entry.label)
+    savepoint = None
+    entry.depth += 1
+    try:
+        if pool.get_search_path(conn) != schema:
+            await cur.execute(f"SET search_path TO {schema};")
+            pool.set_search_path(conn, schema)
+            entry.switched_schema = True
+        if entry.dirty or entry.depth > 1:
+            entry.savepoints += 1
+            savepoint = f"block_{entry.savepoints}"
+            await cur.execute(f"SAVEPOINT {savepoint};")
+        yield cur
+        entry.dirty = True
+    except Exception as e:
+        try:
+            if savepoint:
+                await cur.execute(f"ROLLBACK TO SAVEPOINT {savepoint};")
+            else:
+                await conn.rollback()
+                entry.dirty = False
+                if entry.switched_schema:
+                    entry.switched_schema = False
+                    pool.set_search_path(conn, None)
+        except psycopg.Error:
+            # The connection is unusable; let the next block start afresh.
+            session._drop(session._async, key)
+            await pool.putconn(conn, close=True)
+            _observe_hold(entry.label, schema, entry.checked_out_at)
+        print(f"Error in async DB context for schema '{schema}': {e}")
+        raise
+    finally:
+        entry.depth -= 1
+        if not cur.closed:
+            await cur.close()
@@ -0,0 +1,243 @@
+"""
+In-process metrics for the connection pools and queries, rendered in the
+Prometheus text exposition format by the admin metrics endpoint.
+
+Metrics are per worker process; scrape every worker (or run one) to get
+the full picture.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers everything from a warm checkout to a pool timeout.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self.header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(state[0]), state[1], state[2]]) for key, state in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A gauge read at scrape time from a callback returning [(labels, value)]."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str],
+        collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in sorted(self._collect(), key=lambda item: self._key(item[0])):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+checkout_wait_seconds = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+    ("pool", "schema", "route"),
+))
+checkout_rejected_total = registry.register(Counter(
+    "db_pool_checkout_rejected_total",
+    "Checkouts refused with a 503 because the pool stayed exhausted.",
+    ("pool", "schema", "route", "reason"),
+))
+hold_seconds = registry.register(Histogram(
+    "db_pool_hold_seconds",
+    "Time a connection stayed checked out before going back to the pool.",
+    ("pool", "schema", "route"),
+))
+queries_total = registry.register(Counter(
+    "db_queries_total",
+    "Statements executed, including search_path and savepoint statements.",
+    ("pool", "schema", "route"),
+))
+query_seconds = registry.register(Histogram(
+    "db_query_duration_seconds",
+    "Execution time of a single statement.",
+    ("pool", "schema", "route"),
+))
+queries_per_request = registry.register(Histogram(
+    "db_queries_per_request",
+    "Statements executed per HTTP request and schema.",
+    ("schema", "route"),
+    buckets=COUNT_BUCKETS,
+))
+
+
+_pools: List[Tuple[str, Callable[[], Optional[object]]]] = []
+
+
+def register_pool(name: str, get_pool: Callable[[], Optional[object]]):
+    """Expose the live occupancy of a pool; `get_pool` may return None while it is closed."""
+    _pools.append((name, get_pool))
+
+
+def _pool_stats():
+    for name, get_pool in _pools:
+        pool = get_pool()
+        if pool is not None:
+            yield name, pool.stats()
+
+
+def _collect_in_use():
+    return [
+        ({"pool": name, "schema": schema or "none"}, count)
+        for name, stats in _pool_stats()
+        for schema, count in stats["in_use"].items()
+    ]
+
+
+def _collect(field: str):
+    return lambda: [({"pool": name}, stats[field]) for name, stats in _pool_stats()]
+
+
+registry.register(Gauge(
+    "db_pool_in_use_connections",
+    "Connections currently checked out, by the schema they were requested for.",
+    ("pool", "schema"),
+    _collect_in_use,
+))
+registry.register(Gauge(
+    "db_pool_idle_connections",
+    "Open connections waiting in the pool.",
+    ("pool",),
+    _collect("idle"),
+))
+registry.register(Gauge(
+    "db_pool_waiters",
+    "Callers queued for a connection, by the schema they asked for.",
+    ("pool", "schema"),
+    lambda: [
+        ({"pool": name, "schema": schema or "none"}, count)
+        for name, stats in _pool_stats()
+        for schema, count in stats["waiters_by_schema"].items()
+    ],
+))
+registry.register(Gauge(
+    "db_pool_max_connections",
+    "Configured maximum pool size.",
+    ("pool",),
+    _collect("max"),
+))
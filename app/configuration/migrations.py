@@ -0,0 +1,191 @@
+"""
+Applies the SQL files in app/schema_templates/migrations to every tenant schema.
+
+A tenant schema is any schema with a form_submissions table, including the
+schema_copy template that new tenants are cloned from. Each schema records
+what it has run in its own schema_migrations table. Files run in name
+order, each in its own transaction with search_path set to the tenant, so
+they are written without schema prefixes. They must be idempotent
+(IF NOT EXISTS and so on): a freshly cloned tenant copies the template's
+tables but not its schema_migrations rows, so it replays every file.
+
+A file whose first line is `-- migrate: no-transaction` runs outside a
+transaction instead, one statement at a time, for statements that refuse
+to run inside one (CREATE INDEX CONCURRENTLY). Its statements are split on
+semicolons, so keep such files to plain DDL. An index a failed concurrent
+build left INVALID is dropped before the file is retried.
+
+Runs at startup (unless DB_AUTO_MIGRATE=false) and from the command line:
+
+    python -m app.configuration.migrations [schema ...]
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import sql
+
+from app.configuration.database import DB_CONFIG
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "schema_templates" / "migrations"
+
+AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+
+def load_migrations() -> List[Tuple[str, str]]:
+    """Returns [(version, sql)] sorted by file name; the version is the file stem."""
+    if not MIGRATIONS_DIR.is_dir():
+        return []
+    return [(path.stem, path.read_text(encoding="utf-8")) for path in sorted(MIGRATIONS_DIR.glob("*.sql"))]
+
+
+def list_tenant_schemas(cursor) -> List[str]:
+    cursor.execute(
+        """
+        SELECT table_schema
+        FROM information_schema.tables
+        WHERE table_name = 'form_submissions' AND table_type = 'BASE TABLE'
+        ORDER BY table_schema
+        """
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _lock_schema(cursor, schema: str):
+    # Serializes workers that start at the same time; released at commit.
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"migrations:{schema}",))
+    cursor.execute(sql.SQL("SET LOCAL search_path TO {}").format(sql.Identifier(schema)))
+
+
+def _split_statements(statement: str) -> List[str]:
+    lines = [line for line in statement.splitlines() if not line.lstrip().startswith("--")]
+    return [part.strip() for part in "\n".join(lines).split(";") if part.strip()]
+
+
+def _drop_invalid_indexes(cursor, schema: str, statement: str):
+    cursor.execute(
+        """
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND NOT i.indisvalid
+        """,
+        (schema,),
+    )
+    for (name,) in cursor.fetchall():
+        if name in statement:
+            print(f"Dropping invalid index {schema}.{name} left by an earlier attempt.")
+            cursor.execute(
+                sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}.{}").format(sql.Identifier(schema), sql.Identifier(name))
+            )
+
+
+def _apply_without_transaction(conn, schema: str, version: str, statement: str) -> bool:
+    """Run a no-transaction migration; returns False if another worker already applied it."""
+    lock_key = f"migrations:{schema}"
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (lock_key,))
+            try:
+                cursor.execute(sql.SQL("SET search_path TO {}").format(sql.Identifier(schema)))
+                cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cursor.fetchone():
+                    return False
+                _drop_invalid_indexes(cursor, schema, statement)
+                for part in _split_statements(statement):
+                    cursor.execute(part)
+                cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                return True
+            finally:
+                cursor.execute("RESET search_path")
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (lock_key,))
+    finally:
+        conn.autocommit = False
+
+
+def migrate_schema(conn, schema: str, migrations: List[Tuple[str, str]]) -> List[str]:
+    """Apply pending migrations to one schema; returns the versions applied."""
+    with conn.cursor() as cursor:
+        _lock_schema(cursor, schema)
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT now()
+            )
+            """
+        )
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+
+    done = []
+    for version, statement in migrations:
+        if version in applied:
+            continue
+        if statement.lstrip().startswith(NO_TRANSACTION_MARKER):
+            if _apply_without_transaction(conn, schema, version, statement):
+                done.append(version)
+                print(f"Migration {version} applied to schema '{schema}'.")
+            continue
+        try:
+            with conn.cursor() as cursor:
+                _lock_schema(cursor, schema)
+                cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cursor.fetchone():
+                    conn.rollback()
+                    continue
+                cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        done.append(version)
+        print(f"Migration {version} applied to schema '{schema}'.")
+    return done
+
+
+def run_migrations(schemas: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+    """
+    Migrate the given schemas, or every tenant schema when None.
+
+    Uses its own connection so DDL never runs on a pooled connection.
+    A failure in one schema is reported and the others still run.
+    """
+    migrations = load_migrations()
+    if not migrations:
+        return {}
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    results: Dict[str, List[str]] = {}
+    failures: Dict[str, str] = {}
+    try:
+        if schemas is None:
+            with conn.cursor() as cursor:
+                schemas = list_tenant_schemas(cursor)
+            conn.commit()
+        for schema in schemas:
+            try:
+                results[schema] = migrate_schema(conn, schema, migrations)
+            except psycopg2.Error as e:
+                failures[schema] = str(e)
+                print(f"Migration failed for schema '{schema}': {e}")
+    finally:
+        conn.close()
+
+    if failures:
+        raise RuntimeError(f"Migrations failed for schemas: {', '.join(sorted(failures))}")
+    return results
+
+
+if __name__ == "__main__":
+    applied = run_migrations(sys.argv[1:] or None)
+    for schema, versions in applied.items():
+        print(f"{schema}: {', '.join(versions) if versions else 'up to date'}")
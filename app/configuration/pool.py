@@ -0,0 +1,529 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import psycopg
+import psycopg2
+from psycopg import pq
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+
+class PoolQueueFullError(PoolError):
+    """Every connection is busy and the wait queue is already at its limit."""
+
+
+class PoolTimeoutError(PoolError):
+    """No connection was handed over before the checkout timeout expired."""
+
+
+def _on_event_loop() -> bool:
+    """True on a thread that is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class _Waiter(ABC):
+    """A caller parked in the wait queue; woken with a connection or a free slot."""
+
+    __slots__ = ("schema", "conn", "can_open", "woken")
+
+    def __init__(self, schema: Optional[str]):
+        self.schema = schema
+        self.conn = None
+        self.can_open = False
+        self.woken = False
+
+    @abstractmethod
+    def wake(self):
+        """Resume the parked caller; safe to call from any thread."""
+
+
+class _ThreadWaiter(_Waiter):
+    __slots__ = ("event",)
+
+    def __init__(self, schema: Optional[str]):
+        super().__init__(schema)
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+
+class _AsyncWaiter(_Waiter):
+    __slots__ = ("loop", "future")
+
+    def __init__(self, schema: Optional[str]):
+        super().__init__(schema)
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class _BasePool:
+    """
+    Bookkeeping shared by the sync and async pools.
+
+    Every method here only touches in-memory state under a lock; opening,
+    closing and rolling back connections is left to the subclasses so the
+    lock is never held across a network round trip.
+
+    Checkouts are accounted to the schema they were requested for. A schema
+    may hold at most its limit (`schema_limits`, else `schema_limit`, else
+    the whole pool) and waits in its own FIFO queue. When a connection or
+    slot frees up, it goes to the queue with the lowest virtual time among
+    schemas still under their limit; each grant advances that schema's
+    virtual time by 1 / weight, so a busy tenant is served in proportion to
+    its weight instead of in arrival order.
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        timeout: float,
+        max_waiters: int,
+        schema_limit: int = 0,
+        schema_limits: Optional[Dict[str, int]] = None,
+        schema_weights: Optional[Dict[str, float]] = None,
+        schema_max_waiters: int = 0,
+        **kwargs,
+    ):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: need 0 <= minconn <= maxconn and maxconn >= 1")
+        if any(weight <= 0 for weight in (schema_weights or {}).values()):
+            raise ValueError("Schema weights must be positive")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.schema_limit = schema_limit
+        self.schema_limits = dict(schema_limits or {})
+        self.schema_weights = dict(schema_weights or {})
+        self.schema_max_waiters = schema_max_waiters or max_waiters
+        self.closed = False
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._idle: List[Any] = []  # least recently used first
+        self._in_use: Dict[int, Any] = {}
+        self._owner: Dict[int, Optional[str]] = {}  # checked-out conn -> schema it was requested for
+        self._search_path: Dict[int, Optional[str]] = {}
+        self._opening = 0  # slots reserved for connections being opened
+        self._schema_in_use: Dict[Optional[str], int] = {}  # checked out or being opened, per schema
+        self._queues: Dict[Optional[str], Deque[_Waiter]] = {}
+        self._waiting = 0
+        self._vtime: Dict[Optional[str], float] = {}
+        self._vclock = 0.0
+
+    def get_search_path(self, conn) -> Optional[str]:
+        with self._lock:
+            return self._search_path.get(id(conn))
+
+    def set_search_path(self, conn, schema: Optional[str]):
+        with self._lock:
+            if id(conn) in self._search_path:
+                self._search_path[id(conn)] = schema
+
+    def stats(self) -> dict:
+        """Point-in-time occupancy, with checkouts and waiters counted per schema."""
+        with self._lock:
+            return {
+                "in_use": {schema: count for schema, count in self._schema_in_use.items() if count},
+                "idle": len(self._idle),
+                "opening": self._opening,
+                "waiters": self._waiting,
+                "waiters_by_schema": {schema: len(queue) for schema, queue in self._queues.items()},
+                "max": self.maxconn,
+            }
+
+    def _limit(self, schema: Optional[str]) -> int:
+        limit = self.schema_limits.get(schema, self.schema_limit)
+        return min(limit, self.maxconn) if limit and limit > 0 else self.maxconn
+
+    def _under_limit(self, schema: Optional[str]) -> bool:
+        return self._schema_in_use.get(schema, 0) < self._limit(schema)
+
+    def _has_capacity(self) -> bool:
+        return len(self._in_use) + self._opening < self.maxconn
+
+    def _reserve(self, schema: Optional[str], waiter_factory):
+        """
+        Returns (conn, waiter). With a conn the checkout is done; with a waiter
+        the caller must wait on it; with neither a slot was reserved and the
+        caller must open a new connection.
+        """
+        with self._lock:
+            if self.closed:
+                raise PoolError("connection pool is closed")
+
+            # Never overtake callers of the same schema that are already queued.
+            if schema not in self._queues and self._under_limit(schema):
+                conn = self._take_idle(schema)
+                if conn is not None:
+                    self._hand_out(conn, schema)
+                    return conn, None
+
+                if self._has_capacity():
+                    self._opening += 1
+                    self._schema_in_use[schema] = self._schema_in_use.get(schema, 0) + 1
+                    return None, None
+
+            queue = self._queues.get(schema)
+            if self._waiting >= self.max_waiters:
+                raise PoolQueueFullError("connection pool wait queue is full")
+            if queue is not None and len(queue) >= self.schema_max_waiters:
+                raise PoolQueueFullError(f"connection pool wait queue for schema '{schema}' is full")
+
+            waiter = waiter_factory(schema)
+            if queue is None:
+                # A schema that was idle rejoins at the current virtual time, so
+                # it cannot cash in credit saved up while it had nothing queued.
+                queue = self._queues[schema] = deque()
+                self._vtime[schema] = max(self._vtime.get(schema, 0.0), self._vclock)
+            queue.append(waiter)
+            self._waiting += 1
+            return None, waiter
+
+    def _abandon(self, waiter: _Waiter, wait_for: float):
+        """Leave the queue after a timed-out wait, unless the handover raced it."""
+        with self._lock:
+            if not waiter.woken:
+                self._dequeue(waiter)
+                raise PoolTimeoutError(f"timed out after {wait_for}s waiting for a connection")
+
+    def _dequeue(self, waiter: _Waiter):
+        """Drop a waiter that gave up; caller must hold the lock."""
+        queue = self._queues[waiter.schema]
+        queue.remove(waiter)
+        self._waiting -= 1
+        if not queue:
+            del self._queues[waiter.schema]
+
+    def _claim(self, waiter: _Waiter):
+        """Returns the handed-over connection, or None if a slot was handed over."""
+        if waiter.conn is not None:
+            return waiter.conn
+        if not waiter.can_open:
+            raise PoolError("connection pool is closed")
+        return None
+
+    def _register(self, conn, schema: Optional[str]):
+        with self._lock:
+            self._opening -= 1
+            self._in_use[id(conn)] = conn
+            self._owner[id(conn)] = schema
+            self._search_path[id(conn)] = None
+
+    def _open_failed(self, schema: Optional[str]):
+        with self._lock:
+            self._opening -= 1
+            self._release_slot(schema)
+            self._dispatch()
+
+    def _is_known(self, conn) -> bool:
+        """False once closeall() has forgotten every connection."""
+        with self._lock:
+            if self.closed:
+                return False
+            if self._in_use.get(id(conn)) is not conn:
+                raise PoolError("trying to put unkeyed connection")
+            return True
+
+    def _check_in(self, conn, discard: bool):
+        key = id(conn)
+        with self._lock:
+            del self._in_use[key]
+            self._release_slot(self._owner.pop(key, None))
+            if discard:
+                self._search_path.pop(key, None)
+            else:
+                self._idle.append(conn)
+            self._dispatch()
+
+    def _close_all(self) -> List[Any]:
+        with self._lock:
+            if self.closed:
+                return []
+            self.closed = True
+            conns = self._idle + list(self._in_use.values())
+            self._idle = []
+            self._in_use.clear()
+            self._owner.clear()
+            self._search_path.clear()
+            self._schema_in_use.clear()
+            waiters = [waiter for queue in self._queues.values() for waiter in queue]
+            self._queues.clear()
+            self._waiting = 0
+
+        for waiter in waiters:
+            waiter.woken = True
+            waiter.wake()
+        return conns
+
+    def _hand_out(self, conn, schema: Optional[str]):
+        """Mark `conn` as checked out for `schema`; caller must hold the lock."""
+        self._in_use[id(conn)] = conn
+        self._owner[id(conn)] = schema
+        self._schema_in_use[schema] = self._schema_in_use.get(schema, 0) + 1
+
+    def _release_slot(self, schema: Optional[str]):
+        """Caller must hold the lock."""
+        count = self._schema_in_use.get(schema, 0) - 1
+        if count > 0:
+            self._schema_in_use[schema] = count
+        else:
+            self._schema_in_use.pop(schema, None)
+
+    def _next_schema(self):
+        """The backlogged schema under its limit with the lowest virtual time; caller must hold the lock."""
+        best = None
+        best_vtime = 0.0
+        for schema in self._queues:
+            if not self._under_limit(schema):
+                continue
+            vtime = self._vtime.get(schema, 0.0)
+            if best is None or vtime < best_vtime:
+                best, best_vtime = schema, vtime
+        return best, best_vtime
+
+    def _dispatch(self):
+        """Hand idle connections or free slots to waiters; caller must hold the lock."""
+        while self._queues and not self.closed:
+            schema, vtime = self._next_schema()
+            if schema is None:
+                return
+
+            conn = self._take_idle(schema)
+            if conn is None and not self._has_capacity():
+                return
+
+            queue = self._queues[schema]
+            waiter = queue.popleft()
+            self._waiting -= 1
+            if not queue:
+                del self._queues[schema]
+            self._vclock = vtime
+            self._vtime[schema] = vtime + 1.0 / self.schema_weights.get(schema, 1.0)
+
+            if conn is not None:
+                self._hand_out(conn, schema)
+                waiter.conn = conn
+            else:
+                self._opening += 1
+                self._schema_in_use[schema] = self._schema_in_use.get(schema, 0) + 1
+                waiter.can_open = True
+            waiter.woken = True
+            waiter.wake()
+
+    def _take_idle(self, schema: Optional[str]):
+        """Pop the best idle connection; caller must hold the lock."""
+        if not self._idle:
+            return None
+
+        # Most recently used connection already on this schema.
+        for index in range(len(self._idle) - 1, -1, -1):
+            if self._search_path.get(id(self._idle[index])) == schema:
+                return self._idle.pop(index)
+
+        # Otherwise steal the least recently used one so warm schemas stay warm.
+        return self._idle.pop(0)
+
+
+class SchemaAwarePool(_BasePool):
+    """
+    Thread-safe psycopg2 connection pool.
+
+    Every sync route runs in FastAPI's threadpool, so checkouts happen
+    concurrently. The pool also remembers which search_path each connection
+    was last left on, so get_db_connection can hand a tenant a connection that
+    is already on its schema and skip the `SET search_path` round trip.
+
+    When every connection is checked out (or the caller's schema is at its
+    limit), callers wait for up to `timeout` seconds in a per-schema FIFO
+    queue; at most `max_waiters` callers wait in total. Returned connections
+    are handed straight to a waiter chosen by weighted fair queuing across
+    schemas, so late arrivals cannot jump the queue and one busy tenant
+    cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        timeout: float = 5.0,
+        max_waiters: int = 50,
+        **kwargs,
+    ):
+        super().__init__(minconn, maxconn, timeout, max_waiters, **kwargs)
+        for _ in range(minconn):
+            conn = psycopg2.connect(**self._kwargs)
+            self._search_path[id(conn)] = None
+            self._idle.append(conn)
+
+    def getconn(self, schema: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Check out a connection, preferring one already on `schema`.
+
+        Waits up to `timeout` seconds (the pool default when None) if the pool
+        is exhausted. Raises PoolQueueFullError straight away when the wait
+        queue is full and PoolTimeoutError when the wait runs out. Called on
+        an event loop thread it never waits: blocking there would also block
+        the request-session releases that could hand it a connection.
+        """
+        conn, waiter = self._reserve(schema, _ThreadWaiter)
+        if conn is not None:
+            return conn
+
+        if waiter is not None:
+            wait_for = self.timeout if timeout is None else timeout
+            if _on_event_loop():
+                wait_for = 0
+            if not waiter.event.wait(wait_for):
+                self._abandon(waiter, wait_for)
+            conn = self._claim(waiter)
+            if conn is not None:
+                return conn
+
+        # Connect outside the lock so other threads can keep checking out.
+        try:
+            conn = psycopg2.connect(**self._kwargs)
+        except Exception:
+            self._open_failed(schema)
+            raise
+        self._register(conn, schema)
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Return a connection to the pool (or close it if it is unusable)."""
+        if not self._is_known(conn):
+            if not conn.closed:
+                conn.close()
+            return
+
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                # A rollback also undoes any SET search_path from that transaction.
+                try:
+                    conn.rollback()
+                    self.set_search_path(conn, None)
+                except psycopg2.Error:
+                    close = True
+
+        discard = close or bool(conn.closed)
+        self._check_in(conn, discard)
+        if discard and not conn.closed:
+            conn.close()
+
+    def closeall(self):
+        for conn in self._close_all():
+            if not conn.closed:
+                conn.close()
+
+
+class AsyncSchemaAwarePool(_BasePool):
+    """
+    The asyncio counterpart of SchemaAwarePool, built on psycopg 3.
+
+    Same schema affinity and FIFO wait queue, but checkouts are awaited so
+    the event loop keeps serving other requests while a query runs. Call
+    `open()` from inside the running loop before using it.
+    """
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        timeout: float = 5.0,
+        max_waiters: int = 50,
+        **kwargs,
+    ):
+        super().__init__(minconn, maxconn, timeout, max_waiters, **kwargs)
+
+    async def open(self):
+        for _ in range(self.minconn):
+            conn = await psycopg.AsyncConnection.connect(**self._kwargs)
+            with self._lock:
+                self._search_path[id(conn)] = None
+                self._idle.append(conn)
+
+    async def getconn(self, schema: Optional[str] = None, timeout: Optional[float] = None):
+        """Async version of SchemaAwarePool.getconn."""
+        conn, waiter = self._reserve(schema, _AsyncWaiter)
+        if conn is not None:
+            return conn
+
+        if waiter is not None:
+            wait_for = self.timeout if timeout is None else timeout
+            try:
+                await asyncio.wait_for(waiter.future, wait_for)
+            except asyncio.TimeoutError:
+                self._abandon(waiter, wait_for)
+            except BaseException:
+                # Cancelled (e.g. client went away): don't strand a handover.
+                await self._give_back(waiter)
+                raise
+            conn = self._claim(waiter)
+            if conn is not None:
+                return conn
+
+        try:
+            conn = await psycopg.AsyncConnection.connect(**self._kwargs)
+        except BaseException:
+            self._open_failed(schema)
+            raise
+        self._register(conn, schema)
+        return conn
+
+    async def _give_back(self, waiter: _Waiter):
+        with self._lock:
+            if not waiter.woken:
+                self._dequeue(waiter)
+                return
+        if waiter.conn is not None:
+            await self.putconn(waiter.conn)
+        elif waiter.can_open:
+            self._open_failed(waiter.schema)
+
+    async def putconn(self, conn, close: bool = False):
+        """Return a connection to the pool (or close it if it is unusable)."""
+        if not self._is_known(conn):
+            if not conn.closed:
+                await conn.close()
+            return
+
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == pq.TransactionStatus.UNKNOWN:
+                close = True
+            elif status != pq.TransactionStatus.IDLE:
+                # A rollback also undoes any SET search_path from that transaction.
+                try:
+                    await conn.rollback()
+                    self.set_search_path(conn, None)
+                except psycopg.Error:
+                    close = True
+
+        discard = close or conn.closed
+        self._check_in(conn, discard)
+        if discard and not conn.closed:
+            await conn.close()
+
+    async def closeall(self):
+        for conn in self._close_all():
+            if not conn.closed:
+                await conn.close()
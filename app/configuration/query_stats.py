@@ -0,0 +1,160 @@
+"""
+Per-statement timing aggregates and the slow-query log.
+
+Every statement run through the instrumented cursors in database.py is
+reduced to a fingerprint (literals and placeholders replaced by `?`, IN
+lists collapsed, whitespace squashed) so the same query built with
+different values lands in the same bucket. Aggregates are kept per
+fingerprint and route, in process memory, and served by the admin
+query-stats endpoint.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("app.db.slow_query")
+
+# Statements at or above this many milliseconds are written to the slow-query log.
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# Recent durations kept per fingerprint for the p50/p99 estimates.
+SAMPLE_SIZE = int(os.getenv("DB_QUERY_STATS_SAMPLES", "512"))
+# Distinct (fingerprint, route) pairs tracked; anything beyond is folded into one bucket.
+MAX_ENTRIES = int(os.getenv("DB_QUERY_STATS_MAX", "1000"))
+
+OVERFLOW_FINGERPRINT = "<other statements>"
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """Normalize a statement so different literal values map to the same text."""
+    text = _COMMENT.sub(" ", sql)
+    text = _STRING.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _IN_LIST.sub("(?, ...)", text)
+    return _WHITESPACE.sub(" ", text).strip().rstrip(";").strip()
+
+
+def _as_text(query) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, (bytes, bytearray, memoryview)):
+        return bytes(query).decode("utf-8", "replace")
+    return str(query)
+
+
+class _Stat:
+    __slots__ = ("calls", "total", "max", "rows", "errors", "schemas", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.schemas = set()
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+
+_lock = threading.Lock()
+_stats: Dict[Tuple[str, str], _Stat] = {}
+
+
+def record(query, elapsed: float, rows: Optional[int], schema: Optional[str], route: str, pool: str, failed: bool = False):
+    """Fold one execution into the aggregates and log it if it was slow."""
+    sql = fingerprint(_as_text(query))
+    key = (sql, route)
+
+    with _lock:
+        stat = _stats.get(key)
+        if stat is None:
+            if len(_stats) >= MAX_ENTRIES:
+                key = (OVERFLOW_FINGERPRINT, route)
+                stat = _stats.get(key)
+            if stat is None:
+                stat = _stats[key] = _Stat()
+        stat.calls += 1
+        stat.total += elapsed
+        stat.max = max(stat.max, elapsed)
+        if rows is not None and rows > 0:
+            stat.rows += rows
+        if failed:
+            stat.errors += 1
+        if schema and len(stat.schemas) < 20:
+            stat.schemas.add(schema)
+        stat.samples.append(elapsed)
+
+    duration_ms = elapsed * 1000
+    if duration_ms >= SLOW_QUERY_MS:
+        logger.warning(json.dumps({
+            "event": "slow_query",
+            "duration_ms": round(duration_ms, 2),
+            "threshold_ms": SLOW_QUERY_MS,
+            "fingerprint": sql,
+            "route": route,
+            "schema": schema,
+            "pool": pool,
+            "rows": rows,
+            "failed": failed,
+        }))
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def snapshot(limit: int = 50, sort: str = "total", route: Optional[str] = None) -> List[dict]:
+    """The top `limit` fingerprints, most expensive first; times are in milliseconds."""
+    with _lock:
+        items = [
+            (fp, rt, stat.calls, stat.total, stat.max, stat.rows, stat.errors, sorted(stat.schemas), sorted(stat.samples))
+            for (fp, rt), stat in _stats.items()
+            if route is None or rt == route
+        ]
+
+    result = []
+    for fp, rt, calls, total, longest, rows, errors, schemas, ordered in items:
+        result.append({
+            "fingerprint": fp,
+            "route": rt,
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "mean_ms": round(total * 1000 / calls, 3) if calls else 0.0,
+            "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+            "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round(longest * 1000, 3),
+            "rows": rows,
+            "errors": errors,
+            "schemas": schemas,
+        })
+
+    sort_key = {
+        "total": "total_ms",
+        "mean": "mean_ms",
+        "p99": "p99_ms",
+        "calls": "calls",
+        "rows": "rows",
+    }.get(sort, "total_ms")
+    result.sort(key=lambda item: item[sort_key], reverse=True)
+    return result[:limit]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
@@ -1,13 +1,18 @@
 
+import asyncio
 import mimetypes
+import threading
+import time
+from collections import OrderedDict
 import boto3
 import uuid
 import os
 from fastapi import UploadFile
-from typing import Optional
+from typing import Dict, Iterable, List, NamedTuple, Optional
 from dotenv import load_dotenv
 import logging
 from botocore.config import Config  # Correct import
+from botocore.exceptions import ClientError
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -15,6 +20,38 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+MIB = 1024 * 1024
+# Uploads running at once per worker; each buffers at most one part in memory.
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "8"))
+# S3 rejects multipart parts under 5 MiB (except the last one).
+S3_UPLOAD_PART_SIZE = max(5, int(os.getenv("S3_UPLOAD_PART_SIZE_MB", "8"))) * MIB
+S3_UPLOAD_PREFIX = os.getenv("S3_UPLOAD_PREFIX", "uploads")
+# HTTP connections kept by the shared client: one per concurrent upload, plus
+# headroom for deletes and HEADs running alongside them.
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", str(S3_UPLOAD_CONCURRENCY + 4)))
+
+# Lifetime of inlined download URLs. A signed URL is reused for a quarter of
+# that, so a cached one always has at least three quarters of it left.
+S3_DOWNLOAD_URL_TTL = int(os.getenv("S3_DOWNLOAD_URL_TTL", "3600"))
+S3_DOWNLOAD_URL_CACHE_SIZE = int(os.getenv("S3_DOWNLOAD_URL_CACHE_SIZE", "10000"))
+
+_upload_slots: Optional[asyncio.Semaphore] = None
+_download_urls: "OrderedDict[tuple, str]" = OrderedDict()
+_download_urls_lock = threading.Lock()
+
+
+def upload_semaphore() -> asyncio.Semaphore:
+    """Held while an upload to the bucket runs; caps them at S3_UPLOAD_CONCURRENCY per worker."""
+    global _upload_slots
+    if _upload_slots is None:
+        _upload_slots = asyncio.Semaphore(S3_UPLOAD_CONCURRENCY)
+    return _upload_slots
+
+
+class UploadedObject(NamedTuple):
+    key: str
+    size: int
+
 
 class S3Service:
     def __init__(self):
@@ -41,7 +78,7 @@ class S3Service:
             retries={"max_attempts": 3, "mode": "standard"},
             connect_timeout=90,
             read_timeout=200,
-            max_pool_connections=10,
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
         )
 
         # Initialize S3 client with explicit credentials
@@ -58,9 +95,7 @@ class S3Service:
             verify=False,  # Try this if SSL certificate issues
         )
     def generate_upload_presigned_url(self, object_name: str, expiry_hours: int) -> str:
-        content_type, _ = mimetypes.guess_type(object_name)
-        if not content_type:
-            content_type = "application/octet-stream"
+        content_type = self.guess_content_type(object_name)
 
         return self.s3_client.generate_presigned_url(
             "put_object",
@@ -78,10 +113,200 @@ class S3Service:
             Params={"Bucket": self.bucket_name, "Key": object_name},
             ExpiresIn=expiry_hours * 3600
         )
+    def generate_download_presigned_urls(self, keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Presigned GET URLs for many keys at once, valid for S3_DOWNLOAD_URL_TTL.
+
+        URLs are cached per key and expiry bucket (a quarter of the TTL), so
+        repeat views of the same files reuse the signature instead of
+        signing again.
+        """
+        bucket_span = max(1, S3_DOWNLOAD_URL_TTL // 4)
+        expiry_bucket = int(time.time()) // bucket_span
+        urls = {}
+        missing = []
+        with _download_urls_lock:
+            for key in dict.fromkeys(keys):
+                cache_key = (key, expiry_bucket)
+                url = _download_urls.get(cache_key)
+                if url is None:
+                    missing.append(key)
+                else:
+                    _download_urls.move_to_end(cache_key)
+                    urls[key] = url
+
+        signed = {
+            key: self.s3_client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket_name, "Key": key},
+                ExpiresIn=S3_DOWNLOAD_URL_TTL,
+            )
+            for key in missing
+        }
+        if signed:
+            with _download_urls_lock:
+                for key, url in signed.items():
+                    _download_urls[(key, expiry_bucket)] = url
+                while len(_download_urls) > S3_DOWNLOAD_URL_CACHE_SIZE:
+                    _download_urls.popitem(last=False)
+        urls.update(signed)
+        return urls
+
+    def delete_objects(self, keys: List[str]) -> List[str]:
+        """Delete objects by key; returns the keys S3 reported as not deleted."""
+        failed = []
+        # DeleteObjects takes at most 1000 keys per call
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+            failed.extend(error["Key"] for error in response.get("Errors", []))
+        return failed
+
+    async def upload_file(self, file: UploadFile, folder: Optional[str] = None) -> UploadedObject:
+        """
+        Stream an UploadFile to the bucket under a new random key.
+
+        The file is read one part at a time; anything larger than a part goes
+        up as a multipart upload, so a worker never holds more than one part
+        per upload in memory. At most S3_UPLOAD_CONCURRENCY uploads run at
+        once per worker; the rest wait their turn.
+        """
+        key = self.new_object_key(folder, file.filename)
+        content_type = file.content_type or self.guess_content_type(file.filename)
+
+        async with upload_semaphore():
+            await file.seek(0)
+            chunk = await self._read_part(file)
+            if len(chunk) < S3_UPLOAD_PART_SIZE:
+                await self.put_bytes(key, chunk, content_type)
+                return UploadedObject(key, len(chunk))
+
+            upload_id = await self.create_multipart_upload(key, content_type)
+            parts = []
+            size = 0
+            try:
+                while chunk:
+                    parts.append(await self.upload_part(key, upload_id, len(parts) + 1, chunk))
+                    size += len(chunk)
+                    chunk = await self._read_part(file)
+                await self.complete_multipart_upload(key, upload_id, parts)
+            except BaseException:
+                # Don't leave billed, invisible parts behind
+                await asyncio.shield(self.abort_multipart_upload(key, upload_id))
+                raise
+        logger.debug(f"Uploaded {key} ({size} bytes, {len(parts)} parts)")
+        return UploadedObject(key, size)
+
+    async def put_bytes(self, key: str, body: bytes, content_type: Optional[str] = None):
+        """Single-request upload for bodies small enough to hold in memory."""
+        await asyncio.to_thread(
+            self.s3_client.put_object,
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=body,
+            ContentType=content_type or self.guess_content_type(key),
+        )
+
+    async def create_multipart_upload(self, key: str, content_type: str) -> str:
+        """Start a multipart upload; returns its UploadId."""
+        upload = await asyncio.to_thread(
+            self.s3_client.create_multipart_upload,
+            Bucket=self.bucket_name,
+            Key=key,
+            ContentType=content_type,
+        )
+        return upload["UploadId"]
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        """Upload one part; returns the {"ETag", "PartNumber"} entry complete_multipart_upload needs."""
+        part = await asyncio.to_thread(
+            self.s3_client.upload_part,
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return {"ETag": part["ETag"], "PartNumber": part_number}
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[dict]):
+        await asyncio.to_thread(
+            self.s3_client.complete_multipart_upload,
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        """Best effort; a failure is logged, not raised."""
+        try:
+            await asyncio.to_thread(
+                self.s3_client.abort_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+            )
+        except Exception as e:
+            logger.error(f"Could not abort multipart upload {upload_id} for {key}: {str(e)}")
+
+    async def head_objects(self, keys: List[str]) -> Dict[str, Optional[int]]:
+        """Size of each object by key, None for those that don't exist; HEADs run in parallel."""
+        async def head(key):
+            try:
+                response = await asyncio.to_thread(self.s3_client.head_object, Bucket=self.bucket_name, Key=key)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                    return None
+                raise
+            return response["ContentLength"]
+
+        unique = list(dict.fromkeys(keys))
+        sizes = await asyncio.gather(*(head(key) for key in unique))
+        return dict(zip(unique, sizes))
+
+    def new_object_key(self, folder: Optional[str], filename: Optional[str]) -> str:
+        """A fresh random key under `folder` that keeps the file's extension."""
+        prefix = (folder or S3_UPLOAD_PREFIX).strip("/")
+        return f"{prefix}/{uuid.uuid4()}{self._get_file_extension(filename)}"
+
+    def guess_content_type(self, filename: Optional[str]) -> str:
+        return mimetypes.guess_type(filename or "")[0] or "application/octet-stream"
+
+    async def _read_part(self, file: UploadFile) -> bytes:
+        """Read up to one part; shorter only at end of file."""
+        buffer = bytearray()
+        while len(buffer) < S3_UPLOAD_PART_SIZE:
+            data = await file.read(S3_UPLOAD_PART_SIZE - len(buffer))
+            if not data:
+                break
+            buffer += data
+        return bytes(buffer)
+
     def _get_file_extension(self, filename: str) -> str:
         if not filename:
             return ""
         return os.path.splitext(filename)[1] or ""
-    
 
 
+_s3_service: Optional[S3Service] = None
+_s3_service_lock = threading.Lock()
+
+
+def get_s3_service() -> S3Service:
+    """
+    The worker's shared S3Service, created on first use.
+
+    boto3 clients are thread-safe and keep their own HTTP connection pool, so
+    one per process is reused by every request instead of building a
+    session, client and pool each time.
+    """
+    global _s3_service
+    if _s3_service is None:
+        with _s3_service_lock:
+            if _s3_service is None:
+                _s3_service = S3Service()
+    return _s3_service
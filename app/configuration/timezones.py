@@ -0,0 +1,50 @@
+"""
+Tenant-local dates vs stored timestamps.
+
+Timestamp columns such as form_submissions.submitted_at are TIMESTAMP
+without time zone, written with now() in the database session's zone
+(DB_TIMEZONE). Date filters arrive as calendar dates in the tenant's own
+zone (TENANT_TIMEZONES, falling back to TENANT_TIMEZONE). local_date_range
+turns such dates into a half-open [start, end) range of stored timestamps,
+so queries compare the bare column and can use its indexes.
+
+    DB_TIMEZONE=UTC
+    TENANT_TIMEZONE=Asia/Kolkata
+    TENANT_TIMEZONES=the_doller=Asia/Kolkata,acme=Europe/Berlin
+"""
+
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.configuration.database import _parse_schema_map
+
+DB_TIMEZONE = ZoneInfo(os.getenv("DB_TIMEZONE", "UTC"))
+# Without any tenant setting, dates are read in the storage zone, which is
+# what DATE(submitted_at) used to do.
+DEFAULT_TENANT_TIMEZONE = ZoneInfo(os.getenv("TENANT_TIMEZONE", os.getenv("DB_TIMEZONE", "UTC")))
+TENANT_TIMEZONES = _parse_schema_map(os.getenv("TENANT_TIMEZONES"), ZoneInfo)
+
+
+def tenant_timezone(schema: str) -> ZoneInfo:
+    return TENANT_TIMEZONES.get(schema, DEFAULT_TENANT_TIMEZONE)
+
+
+def _stored(schema: str, day: date) -> datetime:
+    """Local midnight starting `day` for the tenant, as a stored (naive, DB zone) timestamp."""
+    local_midnight = datetime.combine(day, time.min, tzinfo=tenant_timezone(schema))
+    return local_midnight.astimezone(DB_TIMEZONE).replace(tzinfo=None)
+
+
+def local_date_range(
+    schema: str, start: Optional[date], end: Optional[date]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Stored-timestamp bounds covering the tenant's local days start..end
+    (both inclusive): filter with `col >= lower AND col < upper`. A missing
+    date leaves that side open (None).
+    """
+    lower = _stored(schema, start) if start else None
+    upper = _stored(schema, end + timedelta(days=1)) if end else None
+    return lower, upper
@@ -1,9 +1,13 @@
+import asyncio
+import sys
+
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.middleware import auth_middleware
+from app.middleware import auth_middleware, db_middleware
 from app.routes.admim_routes.user_router import user_router as user_router
 from app.routes.admim_routes.user_router import admin_router as admin_router
+from app.routes.admim_routes.metrics_router import metrics_router as metrics_router
 from app.routes.task_router import task_router as task_router
 from app.routes.form_router import form_router as form_router
 from app.routes.form_submissions_routes import (
@@ -14,15 +18,31 @@ from app.routes.form_submissions_routes import (
 from app.routes.AccessToForm_routes import AccessToForm_routes as accessToForm_routes
 from app.routes.notification_router import notification_router as notification_router
 from app.routes.external_router import external_router
-from app.configuration.database import initialize_db_pool, db_pool
+from app.routes.resumable_upload_routes import resumable_upload_router
+from app.configuration.database import (
+    close_async_db_pool,
+    close_db_pool,
+    initialize_async_db_pool,
+    initialize_db_pool,
+)
+from app.configuration.migrations import AUTO_MIGRATE, run_migrations
+from app.service.ingest_worker import start_ingest_worker, stop_ingest_worker
+from app.service.resumable_upload_service import start_upload_sweeper, stop_upload_sweeper
+from app.configuration.cache import start_cache_listener, stop_cache_listener
 # from app.routes.report_router import router as report_router
 
+if sys.platform == "win32":
+    # psycopg's async connections cannot run on the default Proactor loop
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
 # from app.routes.user_router import router as user_router
 
 app = FastAPI()
 
 # Set up middlewares (custom auth middleware, etc.)
 auth_middleware.setup_middlewares(app)
+# Added last so it wraps the auth middleware and the whole request
+db_middleware.setup_db_middleware(app)
 
 # Add CORS middleware
 app.add_middleware(
@@ -42,17 +62,25 @@ async def root():
 
 # Startup and shutdown events
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """Initialize resources on startup."""
+    if AUTO_MIGRATE:
+        run_migrations()
     initialize_db_pool()
+    await initialize_async_db_pool()
+    start_ingest_worker()
+    start_upload_sweeper()
+    start_cache_listener()
 
 
 @app.on_event("shutdown")
-def on_shutdown():
+async def on_shutdown():
     """Clean up resources on shutdown."""
-    if db_pool:
-        db_pool.closeall()
-        print("Database connection pool closed.")
+    await stop_ingest_worker()
+    await stop_upload_sweeper()
+    await stop_cache_listener()
+    close_db_pool()
+    await close_async_db_pool()
 
 
 # Main router setup
@@ -61,9 +89,11 @@ main_router.include_router(external_router)
 # main_router.include_router(user_router)
 app.include_router(main_router)
 app.include_router(admin_router)
+app.include_router(metrics_router)
 app.include_router(user_router)
 app.include_router(task_router)
 app.include_router(form_router)
+app.include_router(resumable_upload_router)
 app.include_router(form_submissions_router)
 app.include_router(flag_submission_router)
 app.include_router(accessToForm_routes)
@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi import Request, FastAPI
+from fastapi.responses import JSONResponse
+
+from app.configuration.database import (
+    begin_request_session,
+    end_request_session,
+    reset_request_session,
+)
+
+
+def setup_db_middleware(app: FastAPI):
+    # Request-scoped DB session: one connection per schema for the whole
+    # request, committed once after the route has produced its response.
+    @app.middleware("http")
+    async def DBSessionMiddleware(request: Request, call_next):
+        session, token = begin_request_session(request.scope)
+        try:
+            response = await call_next(request)
+        except BaseException:
+            # Shielded so the connections still go back to the pool when
+            # the request itself is being cancelled.
+            try:
+                await asyncio.shield(end_request_session(session, commit=False))
+            except Exception as e:
+                print(f"Error releasing request DB session: {e}")
+            raise
+        finally:
+            reset_request_session(token)
+
+        try:
+            await end_request_session(session, commit=True)
+        except Exception as e:
+            print(f"Error committing request DB session: {e}")
+            return JSONResponse(
+                status_code=500,
+                content={"detail": "Failed to save changes to the database"},
+            )
+        return response
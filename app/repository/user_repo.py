@@ -2,7 +2,8 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import JSONResponse
 
-from app.configuration.database import get_db_connection
+from app.configuration.counting import COUNT_ESTIMATED, COUNT_EXACT, estimate_count, split_page
+from app.configuration.database import get_db_connection, read_only
 
 def user_exists_by_email(email: str,db_cursor) -> bool:
     # Placeholder for actual implementation to check if user exists by email
@@ -59,7 +60,7 @@ def get_users_list(db_cursor) -> list[dict]:
     ]
 
 # Get all users except current user with pagination
-def get_all_users(db_cursor, user_type: str, current_user_id: str, page: int, limit: int) -> tuple[list[dict], int]:
+def get_all_users(db_cursor, user_type: str, current_user_id: str, page: int, limit: int, count: str = COUNT_EXACT) -> tuple[list[dict], int | None, bool]:
     base_query = """
         SELECT user_id, email, full_name, role, phone, status
         FROM users
@@ -72,16 +73,20 @@ def get_all_users(db_cursor, user_type: str, current_user_id: str, page: int, li
     elif user_type == "supervisors":
         base_query += " AND role = 'SUPERVISOR'"
 
-    # Count total
-    count_query = f"SELECT COUNT(*) FROM ({base_query}) AS subquery"
-    db_cursor.execute(count_query, params)
-    total_users = db_cursor.fetchone()[0]
+    # Count total (exact / estimated / none)
+    total_users = None
+    if count == COUNT_EXACT:
+        count_query = f"SELECT COUNT(*) FROM ({base_query}) AS subquery"
+        db_cursor.execute(count_query, params)
+        total_users = db_cursor.fetchone()[0]
+    elif count == COUNT_ESTIMATED:
+        total_users = estimate_count(db_cursor, base_query, params)
 
-    # Apply pagination
+    # Apply pagination (one extra row tells whether there is a next page)
     offset = page * limit
     paginated_query = base_query + " ORDER BY full_name ASC LIMIT %s OFFSET %s"
-    db_cursor.execute(paginated_query, params + [limit, offset])
-    users = db_cursor.fetchall()
+    db_cursor.execute(paginated_query, params + [limit + 1, offset])
+    users, has_more = split_page(db_cursor.fetchall(), limit)
 
     if user_type in ["admins", "supervisors"]:
         return (
@@ -95,7 +100,8 @@ def get_all_users(db_cursor, user_type: str, current_user_id: str, page: int, li
                     "status": user[5]
                 } for user in users
             ],
-            total_users
+            total_users,
+            has_more
         )
     else:
         return (
@@ -109,7 +115,8 @@ def get_all_users(db_cursor, user_type: str, current_user_id: str, page: int, li
                     "status": user[5]
                 } for user in users
             ],
-            total_users
+            total_users,
+            has_more
         )
     
 def get_user_by_id(user_id: str, db_cursor) -> dict | None:
@@ -131,6 +138,7 @@ def get_user_by_id(user_id: str, db_cursor) -> dict | None:
     return None
 
 
+@read_only
 def get_admin_name_by_id(schema_id:str):
     try:
         with get_db_connection(schema_id) as db_cursor:
@@ -145,10 +153,13 @@ def get_admin_name_by_id(schema_id:str):
                 return admin[0]
             else:
                 return "Admin"
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database access failed:", e)
         return "Admin"
     
+@read_only
 def get_user_by_id_service(user_id: str, schema_id: str, admin_name: str):
     try:
         with get_db_connection(schema_id) as db_cursor:
@@ -179,32 +190,24 @@ def get_user_by_id_service(user_id: str, schema_id: str, admin_name: str):
     
 #Get Admin dashboard details
 def get_admin_dashboard_details(schema_id: str) -> dict:
+    # Totals are kept by triggers in tenant_counts / submission_counts, so this
+    # is one small read however large the tenant gets. Not @read_only: the
+    # result fills the dashboard cache, which must not hold replica-lagged
+    # numbers after an invalidation.
     try:
         with get_db_connection(schema_id) as db_cursor:
-            # Total users
-            db_cursor.execute("SELECT COUNT(*) FROM users")
-            total_users = db_cursor.fetchone()[0]
-
-            # Active users
-            db_cursor.execute("SELECT COUNT(*) FROM users WHERE status = 'active'")
-            active_users = db_cursor.fetchone()[0]
-
-            # Inactive users
-            # db_cursor.execute("SELECT COUNT(*) FROM users WHERE status = 'INACTIVE'")
-            # inactive_users = db_cursor.fetchone()[0]
-            
-            #Total Tasks
-            
-            db_cursor.execute("SELECT COUNT(*) FROM task")
-            total_tasks = db_cursor.fetchone()[0]
-                
-            # Total forms
-            db_cursor.execute("SELECT COUNT(*) FROM form")
-            total_forms = db_cursor.fetchone()[0]
-
-            # Total submissions
-            db_cursor.execute("SELECT COUNT(*) FROM form_submissions")
-            total_submissions = db_cursor.fetchone()[0]
+            db_cursor.execute(
+                """
+                SELECT
+                    COALESCE(MAX(value) FILTER (WHERE name = 'users'), 0),
+                    COALESCE(MAX(value) FILTER (WHERE name = 'active_users'), 0),
+                    COALESCE(MAX(value) FILTER (WHERE name = 'tasks'), 0),
+                    COALESCE(MAX(value) FILTER (WHERE name = 'forms'), 0),
+                    (SELECT COALESCE(SUM(submissions), 0)::bigint FROM submission_counts)
+                FROM tenant_counts
+                """
+            )
+            total_users, active_users, total_tasks, total_forms, total_submissions = db_cursor.fetchone()
 
             return {
                 "total_users": total_users,
@@ -213,42 +216,31 @@ def get_admin_dashboard_details(schema_id: str) -> dict:
                 "total_forms": total_forms,
                 "total_submissions": total_submissions
             }
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database access failed:", e)
         raise HTTPException(status_code=500, detail="Internal server error while retrieving dashboard details")
 
 
-# Get User dashboard details
+# Get User dashboard details (from the primary, like the admin one: it fills the cache)
 def get_user_dashboard_details(schema_id: str, user_id: str) -> dict:
     try:
         with get_db_connection(schema_id) as db_cursor:
-            # Total submissions by user
-            db_cursor.execute(
-                "SELECT COUNT(*) FROM form_submissions WHERE submitted_by = %s",
-                (user_id,)
-            )
-            total_submissions = db_cursor.fetchone()[0]
-
-            # Flagged submissions by user
-            db_cursor.execute(
-                "SELECT COUNT(*) FROM form_submissions WHERE submitted_by = %s AND flagged = 'raised'",
-                (user_id,)
-            )
-            flagged_submissions = db_cursor.fetchone()[0]
-
-            # Approved submissions by user
+            # All four totals from the user's submission_counts rows
             db_cursor.execute(
-                "SELECT COUNT(*) FROM form_submissions WHERE submitted_by = %s AND flagged = 'approved'",
+                """
+                SELECT
+                    COALESCE(SUM(submissions), 0)::bigint,
+                    COALESCE(SUM(submissions) FILTER (WHERE flagged = 'raised'), 0)::bigint,
+                    COALESCE(SUM(submissions) FILTER (WHERE flagged = 'approved'), 0)::bigint,
+                    COALESCE(SUM(submissions) FILTER (WHERE flagged = 'rejected'), 0)::bigint
+                FROM submission_counts
+                WHERE submitted_by = %s
+                """,
                 (user_id,)
             )
-            approved_submissions = db_cursor.fetchone()[0]
-
-            #Rejected submissions by user
-            db_cursor.execute(
-                "SELECT COUNT(*) FROM form_submissions WHERE submitted_by = %s AND flagged = 'rejected'",
-                (user_id,)
-            )
-            rejected_submissions = db_cursor.fetchone()[0]
+            total_submissions, flagged_submissions, approved_submissions, rejected_submissions = db_cursor.fetchone()
 
             return {
                 "total_submissions": total_submissions,
@@ -257,6 +249,8 @@ def get_user_dashboard_details(schema_id: str, user_id: str) -> dict:
                 "rejected_submissions": rejected_submissions
             }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("Database access failed:", e)
         raise HTTPException(
@@ -27,6 +27,8 @@ def create_form_access(access_data: FormAccessCreate, request: Request):
     service = FormAccessService(schema_id)
     try:
         return service.create_access(access_data, created_by)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -50,6 +52,8 @@ def delete_form_access(form_id: str, request: Request, user_id: Optional[str] =
     service = FormAccessService(schema_id)
     try:
         return service.delete_access(form_id, user_id, deleted_by)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -67,6 +71,8 @@ def get_forms(request: Request, form_id: str = None):
     service = FormAccessService(schema_id)
     try:
         return service.get_form_with_access(form_id)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -106,6 +112,8 @@ def get_my_forms(
             "total_pages": total_pages,
             "forms": forms,
         }
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
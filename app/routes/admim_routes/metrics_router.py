@@ -0,0 +1,51 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.configuration import metrics, query_stats
+
+metrics_router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+def _require_admin(request: Request):
+    user_payload = request.state.user
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if user_payload.get("role") != "ADMIN":
+        raise HTTPException(status_code=403, detail="User is not allowed to access this resource")
+
+
+# Pool and query metrics in Prometheus text format
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    _require_admin(request)
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+# Per-statement aggregates, most expensive first
+@metrics_router.get("/query-stats")
+async def get_query_stats(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    sort: str = Query("total", pattern="^(total|mean|p99|calls|rows)$"),
+    route: Optional[str] = Query(None, description="Route template, e.g. /api/filter/submissions"),
+):
+    _require_admin(request)
+    return JSONResponse(
+        status_code=200,
+        content={
+            "slow_query_ms": query_stats.SLOW_QUERY_MS,
+            "statements": query_stats.snapshot(limit=limit, sort=sort, route=route),
+        },
+    )
+
+
+@metrics_router.delete("/query-stats")
+async def reset_query_stats(request: Request):
+    _require_admin(request)
+    query_stats.reset()
+    return JSONResponse(status_code=200, content={"message": "Query statistics cleared"})
@@ -2,6 +2,8 @@ from typing import List
 from fastapi import APIRouter,Depends,HTTPException, Request
 from fastapi.responses import JSONResponse
 from app.Models.user_model import UserResponse, UsersListResponse
+from app.configuration.cache import ADMIN_DASHBOARD, USER_DASHBOARD, cached_dashboard, invalidate_dashboards
+from app.configuration.counting import total_pages
 from app.repository import user_repo
 from app.repository.user_repo import get_admin_dashboard_details, get_admin_name_by_id, get_all_users, get_user_by_id_service, get_user_dashboard_details, get_users_list, user_exists_by_email, user_exists_by_phone
 from app.service.internal_service import create_user, delete_user_in_sentry, update_user_in_sentry, userAlreadyExists,create_user_in_sentry
@@ -26,7 +28,7 @@ class UserUpdate(BaseModel):
     
 # Create user endpoint    
 @user_router.post("/create-user")
-async def create_user(request: Request, payload: UserCreate):
+def create_user(request: Request, payload: UserCreate):
     user_payload = request.state.user  # Set by AuthMiddleware
 
     if not user_payload:
@@ -95,6 +97,9 @@ async def create_user(request: Request, payload: UserCreate):
                 INSERT INTO users (user_id, email, full_name, role, phone)
                 VALUES (%s, %s, %s, %s, %s)
             """, (user_id, email, name, role, phone))
+        invalidate_dashboards(schema_id, user_id)
+    except HTTPException as http_err:
+        raise http_err
     except Exception as e:
         print("DB insert failed:", e)
         raise HTTPException(status_code=500, detail="User created in Sentry but failed in tenant DB")
@@ -113,7 +118,7 @@ async def create_user(request: Request, payload: UserCreate):
 
 #Get User-list
 @user_router.get("/list", response_model=List[UsersListResponse])
-async def get_user_list(request: Request):
+def get_user_list(request: Request):
     user_payload = request.state.user
     if not user_payload:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -126,6 +131,8 @@ async def get_user_list(request: Request):
         with get_db_connection(schema_id) as db_cursor:
             users=get_users_list(db_cursor)
             return users            
+    except HTTPException as http_err:
+        raise http_err
     except Exception as e:
         print("Database access failed:", e)
         raise HTTPException(status_code=500, detail="Internal server error while retrieving users")  
@@ -133,7 +140,7 @@ async def get_user_list(request: Request):
 
 #Get the user dashboard details
 @user_router.get("/dashboard")
-async def get_user_dashboard(request: Request):
+def get_user_dashboard(request: Request):
     user_payload = request.state.user
     if not user_payload:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -141,7 +148,9 @@ async def get_user_dashboard(request: Request):
     user_id = user_payload.get("sub")
     if not schema_id or not user_id:
         raise HTTPException(status_code=400, detail="Schema ID or User ID missing in token")
-    user_dashboard_data = get_user_dashboard_details(schema_id, user_id)
+    user_dashboard_data = cached_dashboard(
+        schema_id, user_id, USER_DASHBOARD, lambda: get_user_dashboard_details(schema_id, user_id)
+    )
     return JSONResponse(
         status_code=200,
         content={
@@ -153,17 +162,18 @@ async def get_user_dashboard(request: Request):
 
 #Get All users For particular schema
 @user_router.post("/")
-async def get_auth(request: Request):
+def get_auth(request: Request):
     user_router = request.state.user
     return {"user": user_router}
 
 # Get all users endpoint in admin side
 @user_router.get("/")
-async def get_all_users_endpoint(
+def get_all_users_endpoint(
     request: Request,
     user_type: str = Query("all", enum=["all", "admins", "supervisors"]),
     page: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    count: str = Query("exact", enum=["exact", "estimated", "none"]),
 ):
     user_payload = request.state.user  # Set by AuthMiddleware
 
@@ -181,25 +191,29 @@ async def get_all_users_endpoint(
 
     try:
         with get_db_connection(schema_id) as db_cursor:
-            users, total_users = get_all_users(db_cursor, user_type, current_user_id, page, limit)
+            users, total_users, has_more = get_all_users(db_cursor, user_type, current_user_id, page, limit, count)
             return JSONResponse(
                 status_code=200,
                 content={
                     "detail": "Users retrieved successfully",
                     "page": page,
                     "limit": limit,
+                    "count": count,
                     "total_users": total_users,
-                    "total_pages": (total_users + limit - 1) // limit,
+                    "total_pages": total_pages(total_users, limit),
+                    "has_more": has_more,
                     "users": users
                 }
             )
+    except HTTPException as http_err:
+        raise http_err
     except Exception as e:
         print("Database access failed:", e)
         raise HTTPException(status_code=500, detail="Internal server error while retrieving users")
     
 # User update endpoint admin an the user himself
 @user_router.put("/{user_id}")
-async def update_user_endpoint(request: Request, user_id: str, payload: UserUpdate):
+def update_user_endpoint(request: Request, user_id: str, payload: UserUpdate):
     user_payload = request.state.user  # Set by AuthMiddleware
 
     if not user_payload:
@@ -286,6 +300,10 @@ async def update_user_endpoint(request: Request, user_id: str, payload: UserUpda
             query += " WHERE user_id = %s"
             params.append(user_id)
             db_cursor.execute(query, params)
+        if status:
+            invalidate_dashboards(schema_id, user_id)
+    except HTTPException as http_err:
+        raise http_err
     except Exception as e:
         print("DB update failed:", e)
         raise HTTPException(status_code=500, detail="User updated in Sentry but failed in tenant DB")
@@ -302,7 +320,7 @@ async def update_user_endpoint(request: Request, user_id: str, payload: UserUpda
 
 # User delete endpoint admin only
 @user_router.delete("/{user_id}")
-async def delete_user_endpoint(request: Request, user_id: str):
+def delete_user_endpoint(request: Request, user_id: str):
     user_payload = request.state.user  # Set by AuthMiddleware
 
     if not user_payload:
@@ -339,6 +357,9 @@ async def delete_user_endpoint(request: Request, user_id: str):
     try:
         with get_db_connection(schema_id) as db_cursor:
             db_cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+        invalidate_dashboards(schema_id, user_id)
+    except HTTPException as http_err:
+        raise http_err
     except Exception as e:
         print("DB delete failed:", e)
         raise HTTPException(status_code=500, detail="User deleted in Sentry but failed in tenant DB")
@@ -350,7 +371,7 @@ async def delete_user_endpoint(request: Request, user_id: str):
 
 # get user by id endpoint
 @user_router.get("/{user_id}", response_model=UserResponse)
-async def get_user_by_userid(request: Request, user_id: str):
+def get_user_by_userid(request: Request, user_id: str):
     user_payload = request.state.user  # From AuthMiddleware
     current_role = user_payload.get("role")
     current_user_id = user_payload.get("sub")
@@ -373,7 +394,7 @@ async def get_user_by_userid(request: Request, user_id: str):
     
 # Get Admin Dashboard data
 @admin_router.get("/dashboard")
-async def get_admin_dashboard_data(request: Request):
+def get_admin_dashboard_data(request: Request):
     user_payload = request.state.user  # From AuthMiddleware
     if not user_payload:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -382,7 +403,7 @@ async def get_admin_dashboard_data(request: Request):
     schema_id = user_payload.get("schema_id")
     if not schema_id:
         raise HTTPException(status_code=400, detail="Schema ID missing in token")
-    dashboard_data=get_admin_dashboard_details(schema_id)
+    dashboard_data=cached_dashboard(schema_id, None, ADMIN_DASHBOARD, lambda: get_admin_dashboard_details(schema_id))
     return JSONResponse(
         status_code=200,
         content={"message": "Admin dashboard data retrieved successfully", "data": dashboard_data}
@@ -13,7 +13,9 @@ from typing import Optional
 
 from fastapi import Path
 
+from app.configuration.cache import invalidate_dashboards
 from app.configuration.database import get_db_connection
+from app.configuration.migrations import run_migrations
 from typing import Literal
 
 external_router = APIRouter(prefix="/external", tags=["tenants"])
@@ -66,6 +68,9 @@ async def create_tenant(request: Request):
         subprocess.run(psql_cmd, check=True, capture_output=True, text=True)
         # subprocess.run(["psql", DB_URL, "-f", file_path], check=True)
 
+        # Record the template's migrations for the new schema
+        run_migrations([new_schema])
+
         # Step 5: Dump newly created schema (optional if needed)
         final_dump_file = f"tmp/{new_schema}_final.sql"
         subprocess.run(
@@ -111,7 +116,7 @@ class AdminUpdateRequest(BaseModel):
     status: Literal["active", "inactive"]
 
 @external_router.post("/create-admin")
-async def create_admin(request: Request, body: AdminCreateRequest):
+def create_admin(request: Request, body: AdminCreateRequest):
     """
     Creates a new admin user in the schema specified in the request body,
     after validating the requester has 'superadmin' privileges from their JWT.
@@ -159,14 +164,16 @@ async def create_admin(request: Request, body: AdminCreateRequest):
                     status_code=500, detail="Failed to create user in the database"
                 )
 
-            # On success, return a JSON response. FastAPI handles the conversion.
-            return {
-                "message": "User created successfully",
-                "user_id": user_id,
-                "name": body.full_name,
-                "email": body.email,
-                "role": body.role,
-            }
+        invalidate_dashboards(schema, user_id)
+
+        # On success, return a JSON response. FastAPI handles the conversion.
+        return {
+            "message": "User created successfully",
+            "user_id": user_id,
+            "name": body.full_name,
+            "email": body.email,
+            "role": body.role,
+        }
 
     except HTTPException:
         # Re-raise HTTPExceptions directly so FastAPI can handle them.
@@ -181,7 +188,7 @@ async def create_admin(request: Request, body: AdminCreateRequest):
     
 
 @external_router.put("/update-admin/{user_id}")
-async def update_admin(user_id: str, body: AdminUpdateRequest):
+def update_admin(user_id: str, body: AdminUpdateRequest):
     schema = body.schema_id
     full_name = body.full_name
     status = body.status
@@ -200,6 +207,7 @@ async def update_admin(user_id: str, body: AdminUpdateRequest):
 
             if db_cursor.rowcount == 0:
                 raise HTTPException(status_code=404, detail="User not found")
+        invalidate_dashboards(schema, user_id)
 
         return {
             "message": "Admin updated successfully",
@@ -210,6 +218,8 @@ async def update_admin(user_id: str, body: AdminUpdateRequest):
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Failed to update user_id {user_id} in schema {schema}: {e}")
         raise HTTPException(status_code=500, detail="Failed to update admin")
@@ -220,7 +230,7 @@ async def update_admin(user_id: str, body: AdminUpdateRequest):
 ##Delete User
 
 @external_router.delete("/delete-admin/{user_id}")
-async def delete_admin(user_id: str, schema_id: str):
+def delete_admin(user_id: str, schema_id: str):
     """
     Deletes an admin from the tenant schema.
     Query param: ?schema_id=kapil
@@ -236,7 +246,10 @@ async def delete_admin(user_id: str, schema_id: str):
             """, (user_id,))
             if db_cursor.rowcount == 0:
                 raise HTTPException(status_code=404, detail="User not found")
+        invalidate_dashboards(schema_id, user_id)
         return {"message": "Admin deleted successfully", "user_id": user_id}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[ERROR] Failed to delete admin in schema {schema_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete admin")
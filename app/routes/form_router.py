@@ -126,6 +126,8 @@ def get_form(form_id: str, request: Request):
     service = FormService(schema_id)
     try:
         return service.get_form(form_id)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -146,6 +148,8 @@ def get_form(form_id: str, request: Request):
     service = FormService(schema_id)
     try:
         return service.get_form_fields(form_id)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -238,6 +242,8 @@ def delete_form(form_id: str, request: Request):
         return {"message": "Form deleted successfully"}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -261,6 +267,8 @@ def delete_form_field(form_id: str, field_id: str, request: Request):
     try:
         service.delete_form_field(form_id, field_id)
         return {"message": "Field deleted successfully"}
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -287,5 +295,7 @@ def update_form_status(form_id: str, request: Request):
     try:
         result = service.update_form_status(form_id,updated_by=admin_name)
         return result
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
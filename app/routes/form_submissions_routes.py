@@ -1,16 +1,25 @@
 import json
 import logging
+import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Request, UploadFile
 from pydantic import BaseModel
 
-from app.Models.form_submittions import ExportRequest, FlagRequest, FormBySubmissionResponse, FormSubmissionRequest, FormSubmissionResponse, FormUpdateRequest, FormUpdateResponse, PresignedUrlRequest, PresignedUrlResponse
-from app.configuration.s3service import S3Service
+from app.Models.form_submittions import BatchSubmissionRequest, BatchSubmissionResponse, ExportRequest, FinalizeSubmissionRequest, FlagRequest, FormBySubmissionResponse, FormSubmissionRequest, FormSubmissionResponse, FormUpdateRequest, FormUpdateResponse, IngestStatusResponse, PresignedUrlRequest, PresignedUrlResponse, QueuedSubmissionResponse, SubmissionUploadUrlRequest, SubmissionUploadUrlResponse
+from app.configuration.s3service import get_s3_service
 from app.service.FormService import FormService
 from app.service.form_submittions_service import FormSubmissions
+from app.service.idempotency_service import IdempotencyService, request_fingerprint
+from app.service.ingest_worker import notify_enqueued
 
 logger = logging.getLogger(__name__)
 
+BATCH_MAX_SUBMISSIONS = int(os.getenv("BATCH_MAX_SUBMISSIONS", "500"))
+
+
+def _files_fingerprint(files: Optional[List[UploadFile]]):
+    return [(file.filename, file.content_type, file.size) for file in files or []]
+
 form_submissions_router = APIRouter(prefix="/api/forms/submissions", tags=["Tasks"])
 
 flag_submission_router = APIRouter(prefix="/api", tags=["Flaged Submissions"])
@@ -22,6 +31,7 @@ async def submit_form(
     request: Request,
     form_data: str = Form(...),  # JSON as string in multipart requests
     files: Optional[List[UploadFile]] = File(None),  # Expected files field
+    idempotency_key: Optional[str] = Header(None),
 ):
     form = await request.form()
     logger.debug(f"Received form fields: {form.keys()}")
@@ -55,15 +65,22 @@ async def submit_form(
         raise HTTPException(status_code=422, detail=f"Invalid form_data JSON: {str(e)}")
 
     service = FormSubmissions(schema_id)
-    s3 = S3Service()
+    s3 = get_s3_service()
 
     try:
-        return await service.submit_form_with_files(
-            form_id=str(parsed_data.form_id),
-            submitted_by=submitted_by,
-            field_values=parsed_data.field_values,
-            files=files,
-            s3=s3,
+        return await IdempotencyService(schema_id).run(
+            idempotency_key,
+            submitted_by,
+            "submit-form",
+            request_fingerprint(form_data_dict, _files_fingerprint(files)),
+            lambda: service.submit_form_with_files(
+                form_id=str(parsed_data.form_id),
+                submitted_by=submitted_by,
+                field_values=parsed_data.field_values,
+                files=files,
+                s3=s3,
+            ),
+            response_model=FormSubmissionResponse,
         )
     except HTTPException as he:
         raise he
@@ -72,6 +89,181 @@ async def submit_form(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# Write-behind variant of submit-form: validated and queued, then written by
+# the ingest worker; poll /ingest/{submission_id} for when it lands.
+@form_submissions_router.post("/submit-form/queued", response_model=QueuedSubmissionResponse, status_code=202)
+async def submit_form_queued(
+    request: Request,
+    form_data: str = Form(...),  # JSON as string in multipart requests
+    files: Optional[List[UploadFile]] = File(None),
+    idempotency_key: Optional[str] = Header(None),
+):
+    user_payload = request.state.user
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    schema_id = user_payload.get("schema_id")
+    submitted_by = user_payload.get("sub")
+
+    if not schema_id:
+        raise HTTPException(status_code=400, detail="Missing schema_id in token")
+
+    try:
+        form_data_dict = json.loads(form_data)
+        parsed_data = FormSubmissionRequest(**form_data_dict)
+    except Exception as e:
+        logger.error(f"Invalid form_data JSON: {str(e)}")
+        raise HTTPException(status_code=422, detail=f"Invalid form_data JSON: {str(e)}")
+
+    service = FormSubmissions(schema_id)
+    s3 = get_s3_service()
+
+    try:
+        result = await IdempotencyService(schema_id).run(
+            idempotency_key,
+            submitted_by,
+            "submit-form-queued",
+            request_fingerprint(form_data_dict, _files_fingerprint(files)),
+            lambda: service.enqueue_submission(
+                form_id=str(parsed_data.form_id),
+                submitted_by=submitted_by,
+                field_values=parsed_data.field_values,
+                files=files,
+                s3=s3,
+            ),
+            response_model=QueuedSubmissionResponse,
+            status_code=202,
+        )
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error in submit_form_queued: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    notify_enqueued(schema_id)
+    return result
+
+
+@form_submissions_router.get("/ingest/{submission_id}", response_model=IngestStatusResponse)
+async def get_ingest_status(submission_id: str, request: Request):
+    user_payload = request.state.user
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    schema_id = user_payload.get("schema_id")
+    user_id = user_payload.get("sub")
+
+    if not schema_id:
+        raise HTTPException(status_code=400, detail="Missing schema_id in token")
+
+    service = FormSubmissions(schema_id)
+    try:
+        return await service.get_ingest_status(submission_id, user_id)
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error fetching ingest status for {submission_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Many submissions in one request, e.g. replayed by an offline client
+@form_submissions_router.post("/submit-batch", response_model=BatchSubmissionResponse)
+async def submit_batch(
+    request: Request,
+    request_body: BatchSubmissionRequest,
+    idempotency_key: Optional[str] = Header(None),
+):
+    user_payload = request.state.user
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    schema_id = user_payload.get("schema_id")
+    submitted_by = user_payload.get("sub")
+
+    if not schema_id:
+        raise HTTPException(status_code=400, detail="Missing schema_id in token")
+    if not request_body.submissions:
+        raise HTTPException(status_code=400, detail="No submissions in batch")
+    if len(request_body.submissions) > BATCH_MAX_SUBMISSIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_SUBMISSIONS} submissions per batch")
+
+    service = FormSubmissions(schema_id)
+    needs_storage = any(item.files for item in request_body.submissions)
+
+    async def run_batch():
+        results = await service.submit_batch(
+            submitted_by=submitted_by,
+            items=request_body.submissions,
+            s3=get_s3_service() if needs_storage else None,
+        )
+        created = sum(1 for result in results if result["status"] == "created")
+        return BatchSubmissionResponse(created=created, failed=len(results) - created, results=results)
+
+    try:
+        return await IdempotencyService(schema_id).run(
+            idempotency_key,
+            submitted_by,
+            "submit-batch",
+            request_fingerprint(request_body.model_dump(mode="json")),
+            run_batch,
+            response_model=BatchSubmissionResponse,
+        )
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error in submit_batch: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Direct-to-storage flow: get presigned PUT URLs, upload each file straight
+# to the bucket, then finalize with the returned keys.
+@form_submissions_router.post("/upload-urls", response_model=SubmissionUploadUrlResponse)
+async def get_submission_upload_urls(request: Request, request_body: SubmissionUploadUrlRequest):
+    user_payload = request.state.user
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    schema_id = user_payload.get("schema_id")
+    if not schema_id:
+        raise HTTPException(status_code=400, detail="Missing schema_id in token")
+
+    service = FormSubmissions(schema_id)
+    try:
+        uploads = service.create_upload_urls(request_body.files, get_s3_service(), request_body.expiryHours)
+    except Exception as e:
+        logger.error(f"Error generating submission upload URLs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return SubmissionUploadUrlResponse(uploads=uploads, expiryHours=request_body.expiryHours)
+
+
+@form_submissions_router.post("/submit-form/finalize", response_model=FormSubmissionResponse)
+async def finalize_submission(request: Request, request_body: FinalizeSubmissionRequest):
+    user_payload = request.state.user
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    schema_id = user_payload.get("schema_id")
+    submitted_by = user_payload.get("sub")
+
+    if not schema_id:
+        raise HTTPException(status_code=400, detail="Missing schema_id in token")
+
+    service = FormSubmissions(schema_id)
+    try:
+        return await service.finalize_submission(
+            form_id=str(request_body.form_id),
+            submitted_by=submitted_by,
+            field_values=request_body.field_values,
+            files=request_body.files,
+            s3=get_s3_service(),
+        )
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error in finalize_submission: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # Update form fields after submission
 @form_submissions_router.put("/update/{submission_id}", response_model=FormUpdateResponse)
 async def update_form(
@@ -79,6 +271,7 @@ async def update_form(
     request: Request,
     form_data: str = Form(...),  # JSON as string in multipart requests
     files: Optional[List[UploadFile]] = File(None),
+    idempotency_key: Optional[str] = Header(None),
 ):
     user_payload = request.state.user
     if not user_payload:
@@ -100,16 +293,23 @@ async def update_form(
         raise HTTPException(status_code=422, detail=f"Invalid form_data JSON")
 
     service = FormSubmissions(schema_id)
-    s3 = S3Service()
+    s3 = get_s3_service()
     try:
-        return await service.update_form_with_files(
-            submission_id=submission_id,
-            form_id=str(parsed_data.form_id),
-            submitted_by=submitted_by,
-            field_values=parsed_data.field_values or [],  # ✅ safe default
-            files=files,
-            s3=s3,
-            parsed_data=parsed_data,
+        return await IdempotencyService(schema_id).run(
+            idempotency_key,
+            submitted_by,
+            "update",
+            request_fingerprint(submission_id, form_data_dict, _files_fingerprint(files)),
+            lambda: service.update_form_with_files(
+                submission_id=submission_id,
+                form_id=str(parsed_data.form_id),
+                submitted_by=submitted_by,
+                field_values=parsed_data.field_values or [],  # ✅ safe default
+                files=files,
+                s3=s3,
+                parsed_data=parsed_data,
+            ),
+            response_model=FormUpdateResponse,
         )
     except HTTPException as he:
         raise he
@@ -119,7 +319,7 @@ async def update_form(
 
 
 @form_submissions_router.get("/get-form-data/{submission_id}", response_model=FormBySubmissionResponse)
-async def get_form_submission(submission_id: str, request: Request):
+async def get_form_submission(submission_id: str, request: Request, include_file_urls: bool = False):
     user_payload = request.state.user
     if not user_payload:
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -132,7 +332,12 @@ async def get_form_submission(submission_id: str, request: Request):
 
     service = FormSubmissions(schema_id)
     try:
-        submission = service.get_form_by_submission_id(submission_id, user_id)
+        submission = await service.get_form_by_submission_id(
+            submission_id,
+            user_id,
+            include_file_urls=include_file_urls,
+            s3=get_s3_service() if include_file_urls else None,
+        )
         return submission
     except HTTPException:
         raise
@@ -155,7 +360,9 @@ async def get_all_submissions(
     start_date: Optional[str] = None,     # dd-mm-yyyy
     end_date: Optional[str] = None,       # dd-mm-yyyy
     page: int = 0,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None,         # next_cursor from the previous page; replaces page
+    count: str = "exact",                 # exact / estimated / none
 ):
     user_payload = request.state.user
     if not user_payload:
@@ -178,7 +385,7 @@ async def get_all_submissions(
     service = FormSubmissions(schema_id)
 
     try:
-        submissions, total_count = await service.get_all_submissions(
+        result = await service.get_all_submissions(
             form_id=form_id,
             task_id=task_id,
             submitted_by=submitted_by,
@@ -187,14 +394,14 @@ async def get_all_submissions(
             end_date=end_date,
             page=page,
             limit=limit,
-            is_admin=(role.lower() == "admin")  # pass admin flag
+            is_admin=(role.lower() == "admin"),  # pass admin flag
+            cursor=cursor,
+            count=count,
         )
         return {
-            "page": page,
+            "page": None if cursor else page,  # a cursor page has no page number
             "limit": limit,
-            "total_submissions": total_count,
-            "total_pages": (total_count + limit - 1) // limit,
-            "submissions": submissions
+            **result,
         }
     except HTTPException as he:
         raise he
@@ -300,7 +507,8 @@ async def get_submissions_by_user(
 async def flag_submission(
     submission_id: str,
     request: Request,
-    body: FlagRequest  # 'raised', 'approved', 'rejected'
+    body: FlagRequest,  # 'raised', 'approved', 'rejected'
+    idempotency_key: Optional[str] = Header(None),
 ):
     flag_status = body.flag_status.lower()
     user_payload = request.state.user
@@ -322,11 +530,17 @@ async def flag_submission(
     service = FormSubmissions(schema_id)
 
     try:
-        result = await service.flag_submission(
-            submission_id=submission_id,
-            flagged_by=user_id,
-            flag_status=flag_status,
-            is_admin=(role.lower() == "admin"),
+        result = await IdempotencyService(schema_id).run(
+            idempotency_key,
+            user_id,
+            "flag",
+            request_fingerprint(submission_id, flag_status),
+            lambda: service.flag_submission(
+                submission_id=submission_id,
+                flagged_by=user_id,
+                flag_status=flag_status,
+                is_admin=(role.lower() == "admin"),
+            ),
         )
         return result
     except HTTPException as he:
@@ -352,7 +566,7 @@ async def generate_upload_presigned_urls(
         raise HTTPException(status_code=403, detail="Unauthorized user")
 
     try:
-        s3 = S3Service()
+        s3 = get_s3_service()
         presigned_urls = {}
 
         # Handle folder logic
@@ -422,7 +636,10 @@ async def export_submissions(
             end_date=export_request.end_date,
             page=export_request.page,
             limit=export_request.limit,
-            is_admin=(role.lower() == "admin")
+            is_admin=(role.lower() == "admin"),
+            include_file_urls=export_request.include_file_urls,
+            s3=get_s3_service() if export_request.include_file_urls else None,
+            count=export_request.count,
         )
 
         submissions = submissions_response["submissions"]
@@ -466,7 +683,8 @@ async def export_submissions(
                 "submitted_at": submission["submitted_at"],
                 "flagged": submission["flagged"],
                 "field_values": [
-                    {"field_name": f["field_name"], "value": f["value"]}
+                    {"field_name": f["field_name"], "field_type": f["field_type"], "value": f["value"],
+                     **({"file_urls": f["file_urls"]} if "file_urls" in f else {})}
                     for f in submission["field_values"]
                 ]
             })
@@ -475,8 +693,10 @@ async def export_submissions(
         return {
             "page": submissions_response["page"],
             "limit": submissions_response["limit"],
+            "count": submissions_response["count"],
             "total_submissions": submissions_response["total_submissions"],
             "total_pages": submissions_response["total_pages"],
+            "has_more": submissions_response["has_more"],
             "tasks": tasks_result
         }
 
@@ -28,6 +28,8 @@ def get_unread_count(request: Request):
     service = NotificationService(schema_id)
     try:
         return service.get_unread_count(user_id)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -46,6 +48,8 @@ def mark_as_read(request_data: MarkReadRequest, request: Request):
     service = NotificationService(schema_id)
     try:
         return service.mark_as_read(str(request_data.notification_id), str(user_id))
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -57,6 +61,7 @@ def list_notifications(
     status: Optional[str] = None,  # can be "read", "unread", or None
     page: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    count: str = Query("exact", enum=["exact", "estimated", "none"]),
 ):
     user_payload = request.state.user
     if not user_payload:
@@ -73,4 +78,4 @@ def list_notifications(
         raise HTTPException(status_code=400, detail="Invalid status filter")
 
     service = NotificationService(schema_id)
-    return service.list_notifications(str(user_id), role, page, limit, status)
\ No newline at end of file
+    return service.list_notifications(str(user_id), role, page, limit, status, count)
\ No newline at end of file
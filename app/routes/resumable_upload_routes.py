@@ -0,0 +1,113 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from starlette.requests import ClientDisconnect
+
+from app.Models.form_submittions import (
+    ResumableUploadCompleteResponse,
+    ResumableUploadCreateRequest,
+    ResumableUploadResponse,
+)
+from app.configuration.s3service import get_s3_service
+from app.service.resumable_upload_service import MAX_CHUNK_SIZE, ResumableUploadService
+
+logger = logging.getLogger(__name__)
+
+# Resumable submission uploads (tus-like):
+#   POST   /uploads               -> create; returns upload_id and key
+#   PATCH  /uploads/{id}          -> raw bytes at Upload-Offset; returns the new Upload-Offset
+#   HEAD   /uploads/{id}          -> Upload-Offset / Upload-Length, to resume after a drop
+#   POST   /uploads/{id}/complete -> assemble the object; pass its key to submit-form/finalize
+#   DELETE /uploads/{id}          -> abandon
+resumable_upload_router = APIRouter(prefix="/api/forms/submissions/uploads", tags=["Tasks"])
+
+
+def _get_user(request: Request):
+    user_payload = request.state.user
+    if not user_payload:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    schema_id = user_payload.get("schema_id")
+    if not schema_id:
+        raise HTTPException(status_code=400, detail="Missing schema_id in token")
+    return schema_id, user_payload.get("sub")
+
+
+@resumable_upload_router.post("", response_model=ResumableUploadResponse, status_code=201)
+async def create_upload(request: Request, response: Response, request_body: ResumableUploadCreateRequest):
+    schema_id, user_id = _get_user(request)
+    service = ResumableUploadService(schema_id)
+    try:
+        upload = await service.create_upload(
+            user_id, request_body.file_name, request_body.size, request_body.content_type, get_s3_service()
+        )
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error creating resumable upload: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["Location"] = f"{resumable_upload_router.prefix}/{upload['upload_id']}"
+    return upload
+
+
+@resumable_upload_router.patch("/{upload_id}", status_code=204)
+async def append_chunk(upload_id: str, request: Request, upload_offset: Optional[int] = Header(None)):
+    schema_id, user_id = _get_user(request)
+    if upload_offset is None:
+        raise HTTPException(status_code=400, detail="Missing Upload-Offset header")
+
+    # Keep whatever arrived before a dropped connection; the client resumes
+    # from the offset HEAD reports.
+    data = bytearray()
+    try:
+        async for piece in request.stream():
+            data += piece
+            if len(data) > MAX_CHUNK_SIZE:
+                raise HTTPException(status_code=413, detail=f"Chunk larger than {MAX_CHUNK_SIZE} bytes")
+    except ClientDisconnect:
+        logger.debug(f"Client disconnected during PATCH of upload {upload_id} after {len(data)} bytes")
+
+    service = ResumableUploadService(schema_id)
+    try:
+        offset = await service.append_chunk(upload_id, user_id, upload_offset, bytes(data), get_s3_service())
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error appending to upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(status_code=204, headers={"Upload-Offset": str(offset)})
+
+
+@resumable_upload_router.head("/{upload_id}")
+async def get_upload_offset(upload_id: str, request: Request):
+    schema_id, user_id = _get_user(request)
+    upload = await ResumableUploadService(schema_id).get_upload(upload_id, user_id)
+    return Response(
+        status_code=200,
+        headers={
+            "Upload-Offset": str(upload["offset"]),
+            "Upload-Length": str(upload["size"]),
+            "Upload-Status": upload["status"],
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@resumable_upload_router.post("/{upload_id}/complete", response_model=ResumableUploadCompleteResponse)
+async def complete_upload(upload_id: str, request: Request):
+    schema_id, user_id = _get_user(request)
+    service = ResumableUploadService(schema_id)
+    try:
+        return await service.complete_upload(upload_id, user_id, get_s3_service())
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error completing upload {upload_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@resumable_upload_router.delete("/{upload_id}", status_code=204)
+async def abort_upload(upload_id: str, request: Request):
+    schema_id, user_id = _get_user(request)
+    await ResumableUploadService(schema_id).abort_upload(upload_id, user_id, get_s3_service())
+    return Response(status_code=204)
@@ -127,7 +127,7 @@ def get_task(task_id: uuid.UUID, request: Request):
 
 # update task information
 @task_router.put("/{task_id}", response_model=dict)
-async def update_task(
+def update_task(
     task_id: uuid.UUID,
     task_data: TaskUpdate,
     request: Request,
@@ -54,6 +54,13 @@ CREATE TABLE form_submissions (
     flagged flag_status DEFAULT 'none',
 );
 
+-- keyset pagination, newest first (migration 0006)
+CREATE INDEX form_submissions_submitted_at_id_idx ON form_submissions (submitted_at DESC, submission_id DESC);
+CREATE INDEX form_submissions_submitted_by_submitted_at_idx ON form_submissions (submitted_by, submitted_at DESC, submission_id DESC);
+CREATE INDEX form_submissions_form_id_submitted_at_idx ON form_submissions (form_id, submitted_at DESC, submission_id DESC);
+-- flag filter with a date range (migration 0008)
+CREATE INDEX form_submissions_flagged_submitted_at_idx ON form_submissions (flagged, submitted_at DESC, submission_id DESC);
+
 
 
 CREATE TABLE form_field_values (
@@ -61,10 +68,264 @@ CREATE TABLE form_field_values (
     submission_id UUID REFERENCES form_submissions(submission_id),
     field_id UUID REFERENCES form_fields(field_id),
     value_text TEXT,
-    -- value_json JSONB,
+    value_json JSONB,  -- value_text as typed JSON, set by trigger (migration 0005)
     created_at TIMESTAMP DEFAULT now()
 );
 
+-- one value per field; update_form_with_files upserts on it (migration 0001)
+CREATE UNIQUE INDEX form_field_values_submission_field_key ON form_field_values (submission_id, field_id);
+
+-- value_json follows value_text: JSON as written, anything else as a JSON string (migration 0005)
+CREATE FUNCTION parse_field_value(value TEXT) RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF value IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF value !~ '^\s*([\[{"0-9-]|(true|false|null)\s*$)' THEN
+        RETURN to_jsonb(value);
+    END IF;
+    BEGIN
+        RETURN value::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN to_jsonb(value);
+    END;
+END;
+$$;
+
+CREATE FUNCTION form_field_values_set_value_json() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.value_json := parse_field_value(NEW.value_text);
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER form_field_values_value_json
+    BEFORE INSERT OR UPDATE OF value_text ON form_field_values
+    FOR EACH ROW EXECUTE FUNCTION form_field_values_set_value_json();
+
+-- resumable submission uploads (migration 0002)
+CREATE TABLE resumable_uploads (
+    upload_id UUID PRIMARY KEY,
+    object_key TEXT NOT NULL,
+    s3_upload_id TEXT NOT NULL,
+    file_name TEXT,
+    content_type TEXT,
+    total_size BIGINT NOT NULL CHECK (total_size >= 0),
+    received BIGINT NOT NULL DEFAULT 0,
+    flushed BIGINT NOT NULL DEFAULT 0,
+    parts JSONB NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'completed', 'aborted')),
+    created_by UUID,
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+CREATE TABLE resumable_upload_chunks (
+    upload_id UUID NOT NULL REFERENCES resumable_uploads(upload_id) ON DELETE CASCADE,
+    chunk_offset BIGINT NOT NULL,
+    data BYTEA NOT NULL,
+    PRIMARY KEY (upload_id, chunk_offset)
+);
+
+-- open uploads, for the expiry sweep (migration 0011)
+CREATE INDEX resumable_uploads_open_updated_at_idx ON resumable_uploads (updated_at) WHERE status = 'open';
+
+-- Idempotency-Key records for submission writes (migration 0003)
+CREATE TABLE idempotency_keys (
+    user_id UUID NOT NULL,
+    endpoint TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'in_progress' CHECK (status IN ('in_progress', 'completed')),
+    response_status INT,
+    response_body JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, endpoint, idempotency_key)
+);
+CREATE INDEX idempotency_keys_expires_at_idx ON idempotency_keys (expires_at);
+
+-- write-behind submission queue, drained by the ingest worker (migration 0004)
+CREATE TABLE submission_ingest_queue (
+    submission_id UUID PRIMARY KEY,
+    form_id UUID NOT NULL,
+    submitted_by UUID NOT NULL,
+    field_values JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'materialized', 'failed')),
+    error TEXT,
+    enqueued_at TIMESTAMP NOT NULL DEFAULT now(),
+    materialized_at TIMESTAMP,
+    attempts INT NOT NULL DEFAULT 0,  -- transient failures so far (migration 0010)
+    next_attempt_at TIMESTAMP  -- not retried before this (migration 0010)
+);
+CREATE INDEX submission_ingest_queue_pending_idx ON submission_ingest_queue (enqueued_at) WHERE status = 'pending';
+CREATE INDEX submission_ingest_queue_materialized_at_idx ON submission_ingest_queue (materialized_at) WHERE status = 'materialized';
+
+-- submission totals per (form, submitter, flag), maintained by triggers (migration 0007)
+CREATE TABLE submission_counts (
+    form_id UUID NOT NULL,
+    submitted_by UUID NOT NULL,
+    flagged TEXT NOT NULL,
+    submissions BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (form_id, submitted_by, flagged)
+);
+CREATE INDEX submission_counts_submitted_by_idx ON submission_counts (submitted_by);
+
+-- One upsert per statement, however many rows it touched. Transition
+-- tables are only visible to the trigger that declares them, hence a
+-- branch per operation.
+CREATE FUNCTION submission_counts_apply() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO submission_counts AS c (form_id, submitted_by, flagged, submissions)
+        SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(flagged::text, ''), count(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (form_id, submitted_by, flagged) DO UPDATE SET submissions = c.submissions + EXCLUDED.submissions;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO submission_counts AS c (form_id, submitted_by, flagged, submissions)
+        SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(flagged::text, ''), -count(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (form_id, submitted_by, flagged) DO UPDATE SET submissions = c.submissions + EXCLUDED.submissions;
+    ELSE
+        INSERT INTO submission_counts AS c (form_id, submitted_by, flagged, submissions)
+        SELECT form_id, submitted_by, flagged, sum(delta)
+        FROM (
+            SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000') AS form_id,
+                   COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000') AS submitted_by,
+                   COALESCE(flagged::text, '') AS flagged, -1 AS delta
+            FROM old_rows
+            UNION ALL
+            SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000'),
+                   COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000'),
+                   COALESCE(flagged::text, ''), 1
+            FROM new_rows
+        ) deltas
+        GROUP BY 1, 2, 3
+        HAVING sum(delta) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (form_id, submitted_by, flagged) DO UPDATE SET submissions = c.submissions + EXCLUDED.submissions;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER submission_counts_insert
+    AFTER INSERT ON form_submissions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION submission_counts_apply();
+
+CREATE TRIGGER submission_counts_update
+    AFTER UPDATE ON form_submissions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION submission_counts_apply();
+
+CREATE TRIGGER submission_counts_delete
+    AFTER DELETE ON form_submissions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION submission_counts_apply();
+
+-- tenant-wide dashboard totals, maintained by triggers (migration 0009)
+CREATE TABLE tenant_counts (
+    name TEXT PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+-- task / form: TG_ARGV[0] is the counter the table feeds.
+CREATE FUNCTION tenant_counts_rows() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    delta BIGINT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT count(*) INTO delta FROM new_rows;
+    ELSE
+        SELECT -count(*) INTO delta FROM old_rows;
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO tenant_counts AS c (name, value) VALUES (TG_ARGV[0], delta)
+        ON CONFLICT (name) DO UPDATE SET value = c.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- users: the total, plus active_users, which also moves when status changes.
+-- Updates that leave every status as it was write nothing.
+CREATE FUNCTION tenant_counts_users() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    total_delta BIGINT := 0;
+    active_delta BIGINT := 0;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT count(*), count(*) FILTER (WHERE status = 'active')
+        INTO total_delta, active_delta
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT -count(*), -count(*) FILTER (WHERE status = 'active')
+        INTO total_delta, active_delta
+        FROM old_rows;
+    ELSE
+        SELECT (SELECT count(*) FILTER (WHERE status = 'active') FROM new_rows)
+             - (SELECT count(*) FILTER (WHERE status = 'active') FROM old_rows)
+        INTO active_delta;
+    END IF;
+    INSERT INTO tenant_counts AS c (name, value)
+    SELECT name, value
+    FROM (VALUES ('active_users', active_delta), ('users', total_delta)) AS d (name, value)
+    WHERE value <> 0
+    ORDER BY name
+    ON CONFLICT (name) DO UPDATE SET value = c.value + EXCLUDED.value;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER tenant_counts_insert
+    AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_users();
+
+CREATE TRIGGER tenant_counts_update
+    AFTER UPDATE ON users
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_users();
+
+CREATE TRIGGER tenant_counts_delete
+    AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_users();
+
+CREATE TRIGGER tenant_counts_insert
+    AFTER INSERT ON task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('tasks');
+
+CREATE TRIGGER tenant_counts_delete
+    AFTER DELETE ON task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('tasks');
+
+CREATE TRIGGER tenant_counts_insert
+    AFTER INSERT ON form
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('forms');
+
+CREATE TRIGGER tenant_counts_delete
+    AFTER DELETE ON form
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('forms');
+
 
 
 -- Enum type inside template_schema
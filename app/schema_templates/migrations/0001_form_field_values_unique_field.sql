@@ -0,0 +1,20 @@
+-- One value row per (submission, field) so updates can upsert with
+-- ON CONFLICT (submission_id, field_id). Older code could insert the same
+-- field twice; keep the newest row of each pair before adding the index.
+DELETE FROM form_field_values
+WHERE id IN (
+    SELECT id
+    FROM (
+        SELECT id,
+               row_number() OVER (
+                   PARTITION BY submission_id, field_id
+                   ORDER BY created_at DESC NULLS LAST, id DESC
+               ) AS rn
+        FROM form_field_values
+        WHERE submission_id IS NOT NULL AND field_id IS NOT NULL
+    ) ranked
+    WHERE rn > 1
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS form_field_values_submission_field_key
+    ON form_field_values (submission_id, field_id);
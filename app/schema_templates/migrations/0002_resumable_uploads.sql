@@ -0,0 +1,25 @@
+-- Resumable (tus-like) submission uploads. Each row is one S3 multipart
+-- upload; bytes received but not yet sent to S3 as a part (S3 parts must be
+-- at least 5 MiB) wait in resumable_upload_chunks.
+CREATE TABLE IF NOT EXISTS resumable_uploads (
+    upload_id UUID PRIMARY KEY,
+    object_key TEXT NOT NULL,
+    s3_upload_id TEXT NOT NULL,
+    file_name TEXT,
+    content_type TEXT,
+    total_size BIGINT NOT NULL CHECK (total_size >= 0),
+    received BIGINT NOT NULL DEFAULT 0,  -- bytes accepted; the client resumes from here
+    flushed BIGINT NOT NULL DEFAULT 0,   -- bytes already in S3 parts
+    parts JSONB NOT NULL DEFAULT '[]',   -- [{"PartNumber": n, "ETag": "..."}]
+    status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'completed', 'aborted')),
+    created_by UUID,
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS resumable_upload_chunks (
+    upload_id UUID NOT NULL REFERENCES resumable_uploads(upload_id) ON DELETE CASCADE,
+    chunk_offset BIGINT NOT NULL,
+    data BYTEA NOT NULL,
+    PRIMARY KEY (upload_id, chunk_offset)
+);
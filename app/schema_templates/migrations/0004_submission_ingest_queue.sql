@@ -0,0 +1,19 @@
+-- Write-behind submissions: submit-form/queued stores the validated payload
+-- here and returns 202; the ingest worker moves pending rows into
+-- form_submissions / form_field_values in batches. Materialized rows are
+-- kept for a while so clients can poll their status.
+CREATE TABLE IF NOT EXISTS submission_ingest_queue (
+    submission_id UUID PRIMARY KEY,
+    form_id UUID NOT NULL,
+    submitted_by UUID NOT NULL,
+    field_values JSONB NOT NULL,  -- [{"field_id", "value"}], as written to form_field_values
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'materialized', 'failed')),
+    error TEXT,
+    enqueued_at TIMESTAMP NOT NULL DEFAULT now(),
+    materialized_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS submission_ingest_queue_pending_idx
+    ON submission_ingest_queue (enqueued_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS submission_ingest_queue_materialized_at_idx
+    ON submission_ingest_queue (materialized_at) WHERE status = 'materialized';
@@ -0,0 +1,41 @@
+-- Typed field values. value_json holds the value as JSON: arrays and
+-- numbers as such, anything that is not valid JSON as a JSON string, which
+-- is what the read paths used to work out with json.loads on every row.
+-- value_text stays the written column; a trigger keeps value_json in step,
+-- so every writer gets it without change and reads need no parsing.
+ALTER TABLE form_field_values ADD COLUMN IF NOT EXISTS value_json JSONB;
+
+CREATE OR REPLACE FUNCTION parse_field_value(value TEXT) RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF value IS NULL THEN
+        RETURN NULL;
+    END IF;
+    -- plain text never reaches the (subtransaction-backed) exception block
+    IF value !~ '^\s*([\[{"0-9-]|(true|false|null)\s*$)' THEN
+        RETURN to_jsonb(value);
+    END IF;
+    BEGIN
+        RETURN value::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN to_jsonb(value);
+    END;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION form_field_values_set_value_json() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.value_json := parse_field_value(NEW.value_text);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS form_field_values_value_json ON form_field_values;
+CREATE TRIGGER form_field_values_value_json
+    BEFORE INSERT OR UPDATE OF value_text ON form_field_values
+    FOR EACH ROW EXECUTE FUNCTION form_field_values_set_value_json();
+
+UPDATE form_field_values
+SET value_json = parse_field_value(value_text)
+WHERE value_json IS NULL AND value_text IS NOT NULL;
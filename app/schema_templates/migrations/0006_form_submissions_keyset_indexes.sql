@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- Keyset pagination on /api/filter/submissions walks (submitted_at,
+-- submission_id) newest first. These let each page start at the cursor
+-- instead of skipping every earlier row: one for admins with no filter,
+-- and one each for the submitted_by (every non-admin) and form_id filters.
+-- Built CONCURRENTLY so writes continue on large tenants.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS form_submissions_submitted_at_id_idx
+    ON form_submissions (submitted_at DESC, submission_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS form_submissions_submitted_by_submitted_at_idx
+    ON form_submissions (submitted_by, submitted_at DESC, submission_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS form_submissions_form_id_submitted_at_idx
+    ON form_submissions (form_id, submitted_at DESC, submission_id DESC);
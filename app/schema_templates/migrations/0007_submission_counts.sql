@@ -0,0 +1,87 @@
+-- Submission totals per (form, submitter, flag), kept exact by statement
+-- triggers on form_submissions, so listings and dashboards can report a
+-- total without counting rows. A NULL form_id / submitted_by / flagged is
+-- kept under the zero UUID / '' so those rows still add up in the totals.
+CREATE TABLE IF NOT EXISTS submission_counts (
+    form_id UUID NOT NULL,
+    submitted_by UUID NOT NULL,
+    flagged TEXT NOT NULL,
+    submissions BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (form_id, submitted_by, flagged)
+);
+CREATE INDEX IF NOT EXISTS submission_counts_submitted_by_idx ON submission_counts (submitted_by);
+
+-- One upsert per statement, however many rows it touched. Transition
+-- tables are only visible to the trigger that declares them, hence a
+-- branch per operation.
+CREATE OR REPLACE FUNCTION submission_counts_apply() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO submission_counts AS c (form_id, submitted_by, flagged, submissions)
+        SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(flagged::text, ''), count(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (form_id, submitted_by, flagged) DO UPDATE SET submissions = c.submissions + EXCLUDED.submissions;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO submission_counts AS c (form_id, submitted_by, flagged, submissions)
+        SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000'),
+               COALESCE(flagged::text, ''), -count(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (form_id, submitted_by, flagged) DO UPDATE SET submissions = c.submissions + EXCLUDED.submissions;
+    ELSE
+        INSERT INTO submission_counts AS c (form_id, submitted_by, flagged, submissions)
+        SELECT form_id, submitted_by, flagged, sum(delta)
+        FROM (
+            SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000') AS form_id,
+                   COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000') AS submitted_by,
+                   COALESCE(flagged::text, '') AS flagged, -1 AS delta
+            FROM old_rows
+            UNION ALL
+            SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000'),
+                   COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000'),
+                   COALESCE(flagged::text, ''), 1
+            FROM new_rows
+        ) deltas
+        GROUP BY 1, 2, 3
+        HAVING sum(delta) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (form_id, submitted_by, flagged) DO UPDATE SET submissions = c.submissions + EXCLUDED.submissions;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS submission_counts_insert ON form_submissions;
+CREATE TRIGGER submission_counts_insert
+    AFTER INSERT ON form_submissions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION submission_counts_apply();
+
+DROP TRIGGER IF EXISTS submission_counts_update ON form_submissions;
+CREATE TRIGGER submission_counts_update
+    AFTER UPDATE ON form_submissions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION submission_counts_apply();
+
+DROP TRIGGER IF EXISTS submission_counts_delete ON form_submissions;
+CREATE TRIGGER submission_counts_delete
+    AFTER DELETE ON form_submissions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION submission_counts_apply();
+
+-- The triggers above already lock out concurrent writers until this
+-- migration commits, so the backfill sees every row exactly once.
+DELETE FROM submission_counts;
+INSERT INTO submission_counts (form_id, submitted_by, flagged, submissions)
+SELECT COALESCE(form_id, '00000000-0000-0000-0000-000000000000'),
+       COALESCE(submitted_by, '00000000-0000-0000-0000-000000000000'),
+       COALESCE(flagged::text, ''), count(*)
+FROM form_submissions
+GROUP BY 1, 2, 3;
@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- Date-range filters on submissions compare submitted_at directly (half-open
+-- ranges instead of DATE(submitted_at)), so they can use indexes led by the
+-- equality filters. Built CONCURRENTLY so writes continue on large tenants.
+-- (form_id, submitted_at), (submitted_by, submitted_at) and plain
+-- submitted_at are already served by the keyset indexes of migration 0006,
+-- and form_field_values(submission_id) by the unique (submission_id,
+-- field_id) index of migration 0001; only the flag filter lacks one.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS form_submissions_flagged_submitted_at_idx
+    ON form_submissions (flagged, submitted_at DESC, submission_id DESC);
@@ -0,0 +1,112 @@
+-- Tenant-wide totals for the admin dashboard (users, active_users, tasks,
+-- forms), kept exact by statement triggers. Submission totals come from
+-- submission_counts (migration 0007), which already covers them per user
+-- and flag without a single row every submission insert would contend on.
+CREATE TABLE IF NOT EXISTS tenant_counts (
+    name TEXT PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+
+-- task / form: TG_ARGV[0] is the counter the table feeds.
+CREATE OR REPLACE FUNCTION tenant_counts_rows() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    delta BIGINT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT count(*) INTO delta FROM new_rows;
+    ELSE
+        SELECT -count(*) INTO delta FROM old_rows;
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO tenant_counts AS c (name, value) VALUES (TG_ARGV[0], delta)
+        ON CONFLICT (name) DO UPDATE SET value = c.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- users: the total, plus active_users, which also moves when status changes.
+-- Updates that leave every status as it was write nothing.
+CREATE OR REPLACE FUNCTION tenant_counts_users() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    total_delta BIGINT := 0;
+    active_delta BIGINT := 0;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT count(*), count(*) FILTER (WHERE status = 'active')
+        INTO total_delta, active_delta
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT -count(*), -count(*) FILTER (WHERE status = 'active')
+        INTO total_delta, active_delta
+        FROM old_rows;
+    ELSE
+        SELECT (SELECT count(*) FILTER (WHERE status = 'active') FROM new_rows)
+             - (SELECT count(*) FILTER (WHERE status = 'active') FROM old_rows)
+        INTO active_delta;
+    END IF;
+    INSERT INTO tenant_counts AS c (name, value)
+    SELECT name, value
+    FROM (VALUES ('active_users', active_delta), ('users', total_delta)) AS d (name, value)
+    WHERE value <> 0
+    ORDER BY name
+    ON CONFLICT (name) DO UPDATE SET value = c.value + EXCLUDED.value;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS tenant_counts_insert ON users;
+CREATE TRIGGER tenant_counts_insert
+    AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_users();
+
+DROP TRIGGER IF EXISTS tenant_counts_update ON users;
+CREATE TRIGGER tenant_counts_update
+    AFTER UPDATE ON users
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_users();
+
+DROP TRIGGER IF EXISTS tenant_counts_delete ON users;
+CREATE TRIGGER tenant_counts_delete
+    AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_users();
+
+DROP TRIGGER IF EXISTS tenant_counts_insert ON task;
+CREATE TRIGGER tenant_counts_insert
+    AFTER INSERT ON task
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('tasks');
+
+DROP TRIGGER IF EXISTS tenant_counts_delete ON task;
+CREATE TRIGGER tenant_counts_delete
+    AFTER DELETE ON task
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('tasks');
+
+DROP TRIGGER IF EXISTS tenant_counts_insert ON form;
+CREATE TRIGGER tenant_counts_insert
+    AFTER INSERT ON form
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('forms');
+
+DROP TRIGGER IF EXISTS tenant_counts_delete ON form;
+CREATE TRIGGER tenant_counts_delete
+    AFTER DELETE ON form
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION tenant_counts_rows('forms');
+
+-- As in 0007, creating the triggers locks out writers to these tables until
+-- this migration commits, so the backfill cannot miss or double-count a row.
+DELETE FROM tenant_counts;
+INSERT INTO tenant_counts (name, value)
+SELECT 'users', count(*) FROM users
+UNION ALL
+SELECT 'active_users', count(*) FROM users WHERE status = 'active'
+UNION ALL
+SELECT 'tasks', count(*) FROM task
+UNION ALL
+SELECT 'forms', count(*) FROM form;
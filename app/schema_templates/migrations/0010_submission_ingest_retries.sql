@@ -0,0 +1,5 @@
+-- Queued submissions that hit a transient error (pool timeout, lost
+-- connection, deadlock) stay pending and are retried with backoff; only
+-- rows the database rejects as data are marked failed.
+ALTER TABLE submission_ingest_queue ADD COLUMN IF NOT EXISTS attempts INT NOT NULL DEFAULT 0;
+ALTER TABLE submission_ingest_queue ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP;
@@ -0,0 +1,4 @@
+-- Lets the upload sweep find uploads left open past their expiry without
+-- scanning every completed one.
+CREATE INDEX IF NOT EXISTS resumable_uploads_open_updated_at_idx
+    ON resumable_uploads (updated_at) WHERE status = 'open';
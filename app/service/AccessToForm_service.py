@@ -5,7 +5,7 @@ from typing import Any, Dict, List, Optional
 from fastapi import HTTPException
 
 from app.Models.AccessToForm import FormAccessCreate, FormAccessResponse
-from app.configuration.database import get_db_connection
+from app.configuration.database import get_db_connection, read_only
 
 
 class FormAccessService:
@@ -370,6 +370,7 @@ class FormAccessService:
         }
 
     # get api
+    @read_only
     def get_form_with_access(self, form_id: str = None):
         with get_db_connection(self.schema_id) as cursor:
             if form_id:
@@ -449,6 +450,7 @@ class FormAccessService:
     # get assigned form to user or supervisour
 
     # get assigned forms for user/supervisor with pagination
+    @read_only
     def get_forms_for_user(self, user_id: str, page: int, limit: int):
         forms = []
         offset = page * limit
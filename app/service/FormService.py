@@ -13,7 +13,8 @@ from app.Models.form_model import (
     FormResponseWithFields,
     GetAllFormsResponse,
 )
-from app.configuration.database import get_db_connection
+from app.configuration.cache import invalidate_dashboards
+from app.configuration.database import get_db_connection, read_only
 from app.repository.user_repo import get_user_by_id
 
 
@@ -24,6 +25,7 @@ class FormService:
     def create_form(self, form_data: FormCreate) -> FormResponse:
         form_id = uuid.uuid4()
         created_at = datetime.now()
+        creator_id = form_data.created_by
         task_id = form_data.task_id
         if task_id:
             # Verify task exists
@@ -84,6 +86,7 @@ class FormService:
                 )
 
                 fields.append(field)
+        invalidate_dashboards(self.schema_id, creator_id)
 
         return FormResponse(
             form_id=form_id,
@@ -182,6 +185,7 @@ class FormService:
         )
 
     # Get form with fields
+    @read_only
     def get_form(self, form_id: str) -> FormResponseWithFields:
         with get_db_connection(self.schema_id) as cursor:
             # Fetch form details
@@ -237,6 +241,7 @@ class FormService:
         )
 
     # Get form fields only
+    @read_only
     def get_form_fields(self, form_id: str) -> FormFieldsResponse:
         with get_db_connection(self.schema_id) as cursor:
             # Fetch form details
@@ -311,6 +316,7 @@ class FormService:
             deleted = cursor.fetchone()
             if not deleted:
                 raise ValueError("Form deletion failed")
+        invalidate_dashboards(self.schema_id)
         return True
 
     # Delete specific field
@@ -370,6 +376,7 @@ class FormService:
     #     ]
     #     return form_list
     # ✅ For Admin – Get all forms under a task
+    @read_only
     def get_forms_list_by_task_admin(self, task_id: str) -> List[Dict[str, Any]]:
         with get_db_connection(self.schema_id) as cursor:
             cursor.execute("SELECT 1 FROM task WHERE task_id = %s", (task_id,))
@@ -393,6 +400,7 @@ class FormService:
         ]
 
     # ✅ For Non-Admin – Get only forms assigned to the user inside the given task
+    @read_only
     def get_forms_list_by_task_for_user(self, task_id: str, user_id: str) -> List[Dict[str, Any]]:
         with get_db_connection(self.schema_id) as cursor:
             cursor.execute("SELECT 1 FROM task WHERE task_id = %s", (task_id,))
@@ -470,6 +478,7 @@ class FormService:
     #     }
 
     # Get forms by task with pagination (admin: all, user: only assigned)
+    @read_only
     def get_forms_by_task(self, task_id: str, user_id: str, role: str, page: int = 1, limit: int = 10) -> dict:
         offset = (page - 1) * limit if page > 0 else 0
 
@@ -3,13 +3,15 @@ from typing import Any, Dict, Optional
 
 from fastapi import HTTPException
 from app.Models.notification import NotificationCountResponse
-from app.configuration.database import get_db_connection
+from app.configuration.counting import COUNT_ESTIMATED, COUNT_EXACT, check_count_strategy, estimate_count, split_page
+from app.configuration.database import get_db_connection, read_only
 
 
 class NotificationService:
     def __init__(self, schema_id: str):
         self.schema_id = schema_id
 
+    @read_only
     def get_unread_count(self, user_id: str) -> NotificationCountResponse:
         with get_db_connection(self.schema_id) as cursor:
             # Now count distinct notifications
@@ -58,6 +60,7 @@ class NotificationService:
                 cursor.close()
 
     # ✅ Get all notifications (read/unread/all) with pagination
+    @read_only
     def list_notifications(
         self,
         user_id: str,
@@ -65,7 +68,9 @@ class NotificationService:
         page: int,
         limit: int,
         status: str = None,
+        count: str = COUNT_EXACT,
     ):
+        count = check_count_strategy(count)
         offset = page * limit
 
         with get_db_connection(self.schema_id) as cursor:
@@ -88,16 +93,20 @@ class NotificationService:
                 elif status == "unread":
                     base_query += " AND n.is_read = false"
 
-                # ✅ Count total
-                count_query = f"SELECT COUNT(*) FROM ({base_query}) AS total"
-                cursor.execute(count_query, tuple(params))
-                total_count = cursor.fetchone()[0]
+                # ✅ Count total (exact / estimated / none)
+                total_count = None
+                if count == COUNT_EXACT:
+                    count_query = f"SELECT COUNT(*) FROM ({base_query}) AS total"
+                    cursor.execute(count_query, tuple(params))
+                    total_count = cursor.fetchone()[0]
+                elif count == COUNT_ESTIMATED:
+                    total_count = estimate_count(cursor, base_query, params)
 
-                # ✅ Apply pagination
+                # ✅ Apply pagination (one extra row tells whether there is a next page)
                 base_query += " ORDER BY n.created_at DESC LIMIT %s OFFSET %s"
-                params.extend([limit, offset])
+                params.extend([limit + 1, offset])
                 cursor.execute(base_query, tuple(params))
-                rows = cursor.fetchall()
+                rows, has_more = split_page(cursor.fetchall(), limit)
 
                 notifications = [
                     {
@@ -114,20 +123,26 @@ class NotificationService:
                     for row in rows
                 ]
 
-                total_pages = ceil(total_count / limit) if total_count > 0 else 1
+                total_pages = None
+                if total_count is not None:
+                    total_pages = ceil(total_count / limit) if total_count > 0 else 1
 
                 return {
                     "notifications": notifications,
                     "pagination": {
+                        "count": count,
                         "total_notifications": total_count,
                         "current_page": page,
                         "limit": limit,
                         "total_pages": total_pages,
-                        "next_page": page + 1 if (page + 1) < total_pages else None,
+                        "has_more": has_more,
+                        "next_page": page + 1 if has_more else None,
                         "previous_page": page - 1 if page > 0 else None,
                     },
                 }
 
+            except HTTPException:
+                raise
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
             finally:
@@ -1,4 +1,6 @@
 import asyncio
+import base64
+import binascii
 from datetime import datetime
 import json
 import logging
@@ -9,11 +11,34 @@ from datetime import datetime
 
 from fastapi import HTTPException, UploadFile
 
-from app.Models.form_submittions import FieldValue, FormSubmissionRequest, FormSubmissionResponse, FormUpdateRequest
-from app.configuration.database import get_db_connection
-from app.configuration.s3service import S3Service
+from app.Models.form_submittions import FieldValue, FormSubmissionRequest, FormSubmissionResponse, FormUpdateRequest, BatchSubmissionItem, UploadedFileRef, UploadUrlRequestItem
+from app.configuration.cache import invalidate_dashboards
+from app.configuration.counting import COUNT_ESTIMATED, COUNT_EXACT, COUNT_NONE, check_count_strategy, estimate_count_async, split_page, total_pages
+from app.configuration.database import get_async_db_connection, outside_request_session, read_only
+from app.configuration.s3service import S3Service, UploadedObject
+from app.configuration.timezones import local_date_range
+from app.service.idempotency_service import record_write
 logger = logging.getLogger(__name__)
 
+# form_fields.field_type values whose stored value is an object key
+FILE_FIELD_TYPES = ("file", "files")
+
+
+def encode_cursor(submitted_at: datetime, submission_id) -> str:
+    """Opaque keyset cursor for the row a page ended on."""
+    raw = json.dumps([submitted_at.isoformat(), str(submission_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(submitted_at, submission_id) from encode_cursor; 400 if it was tampered with."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        submitted_at, submission_id = json.loads(raw)
+        return datetime.fromisoformat(submitted_at), str(UUID(submission_id))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 class FormSubmissions:
     def __init__(self, schema_id: str):
         self.schema_id = schema_id
@@ -127,6 +152,87 @@ class FormSubmissions:
     #         "submission_id": submission_id,
     #         "submitted_at": submitted_at,
     #     }
+    async def _upload_files(self, s3: S3Service, files: List[UploadFile]) -> list:
+        """
+        Upload files concurrently, before any DB connection is taken. If one
+        fails, the ones that did upload are deleted again.
+        """
+        folder = f"{self.schema_id}/submissions"
+        results = await asyncio.gather(*(s3.upload_file(file, folder) for file in files), return_exceptions=True)
+        failed = next((r for r in results if isinstance(r, BaseException)), None)
+        if failed is not None:
+            await self._discard_uploads(s3, [r for r in results if not isinstance(r, BaseException)])
+            raise HTTPException(status_code=400, detail=f"File upload failed: {str(failed)}")
+        return results
+
+    async def _discard_uploads(self, s3: S3Service, uploaded: List[UploadedObject]):
+        """Best-effort delete of objects whose submission write never committed."""
+        if not uploaded:
+            return
+        keys = [obj.key for obj in uploaded]
+        try:
+            not_deleted = await asyncio.to_thread(s3.delete_objects, keys)
+        except Exception as e:
+            logger.error(f"Could not delete orphaned uploads {keys}: {str(e)}")
+            return
+        if not_deleted:
+            logger.error(f"Could not delete orphaned uploads {not_deleted}")
+
+    def _merge_field_values(self, field_values: List[FieldValue], file_map: dict) -> List[dict]:
+        """
+        Merge stored file keys into field_values. One value per field; a
+        repeated field_id keeps the last value sent.
+        """
+        merged = {}
+        for fv in field_values:
+            fid = str(fv.field_id)
+            if fid in file_map:
+                merged[fid] = file_map[fid]
+            elif isinstance(fv.value, list):
+                merged[fid] = json.dumps(fv.value)
+            else:
+                merged[fid] = str(fv.value) if fv.value is not None else None
+        for fid, value in file_map.items():
+            merged.setdefault(fid, value)
+        return [{"field_id": fid, "value": value} for fid, value in merged.items()]
+
+    async def _insert_submission(self, form_id: str, submitted_by: str, final_field_values: List[dict]):
+        """
+        Write the submission and its values in one short transaction, committed
+        before returning. Returns (submission_id, submitted_at).
+        """
+        submission_id = str(uuid.uuid4())
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                # Header and every field value in one round trip: the values are
+                # passed as parallel arrays and unnested into a single INSERT.
+                await cursor.execute(
+                    """
+                    WITH submission AS (
+                        INSERT INTO form_submissions (submission_id, form_id, submitted_by, submitted_at)
+                        VALUES (%s, %s, %s, NOW())
+                        RETURNING submission_id, submitted_at
+                    ), field_rows AS (
+                        INSERT INTO form_field_values (id, submission_id, field_id, value_text)
+                        SELECT v.id, submission.submission_id, v.field_id, v.value_text
+                        FROM submission, unnest(%s::uuid[], %s::uuid[], %s::text[]) AS v(id, field_id, value_text)
+                    )
+                    SELECT submitted_at FROM submission
+                    """,
+                    (
+                        submission_id,
+                        str(form_id),
+                        str(submitted_by),
+                        [str(uuid.uuid4()) for _ in final_field_values],
+                        [fv["field_id"] for fv in final_field_values],
+                        [fv["value"] for fv in final_field_values],
+                    ),
+                )
+                submitted_at = (await cursor.fetchone())[0]
+                await record_write(cursor, self.schema_id)
+            invalidate_dashboards(self.schema_id, submitted_by)
+        return submission_id, submitted_at
+
     async def submit_form_with_files(
     self,
     form_id: str,
@@ -137,64 +243,30 @@ class FormSubmissions:
 ):
         """
         Save form submission and handle file uploads (one file per field if provided).
+
+        Files are uploaded first with no connection held; the rows are then
+        written in one short transaction that commits before returning. If
+        that write fails the uploaded objects are deleted.
         """
-        with get_db_connection(self.schema_id) as cursor:
-            file_map = {}
-
-            if files:
-                # Upload all files concurrently
-                upload_tasks = [s3.upload_file(file) for file in files]
-                uploaded_urls = await asyncio.gather(*upload_tasks, return_exceptions=True)
-
-                # Assign URLs to field_ids (match by order)
-                for fv, url in zip(field_values, uploaded_urls):
-                    if isinstance(url, Exception):
-                        raise HTTPException(status_code=400, detail=f"File upload failed: {str(url)}")
-                    file_map[str(fv.field_id)] = url
-
-                logger.debug(f"File map: {file_map}")
-
-            # Merge file URLs into field_values
-            final_field_values = []
-            for fv in field_values:
-                fid = str(fv.field_id)
-                if fid in file_map:
-                    final_field_values.append({
-                        "field_id": fid,
-                        "value": file_map[fid]
-                    })
-                elif isinstance(fv.value, list):
-                    final_field_values.append({
-                        "field_id": fid,
-                        "value": json.dumps(fv.value)
-                    })
-                else:
-                    final_field_values.append({
-                        "field_id": fid,
-                        "value": str(fv.value) if fv.value is not None else None
-                    })
-
-            logger.debug(f"Final field values: {final_field_values}")
-
-            submission_id = str(uuid.uuid4())
-            cursor.execute(
-                """
-                INSERT INTO form_submissions (submission_id, form_id, submitted_by, submitted_at)
-                VALUES (%s, %s, %s, NOW())
-                RETURNING submitted_at
-                """,
-                (submission_id, str(form_id), str(submitted_by)),
-            )
-            submitted_at = cursor.fetchone()[0]
+        file_map = {}
+        uploaded = []
+        if files:
+            uploaded = await self._upload_files(s3, files)
 
-            for fv in final_field_values:
-                cursor.execute(
-                    """
-                    INSERT INTO form_field_values (id, submission_id, field_id, value_text)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (str(uuid.uuid4()), str(submission_id), fv["field_id"], fv["value"]),
-                )
+            # Assign object keys to field_ids (match by order)
+            for fv, obj in zip(field_values, uploaded):
+                file_map[str(fv.field_id)] = obj.key
+
+            logger.debug(f"File map: {file_map}")
+
+        final_field_values = self._merge_field_values(field_values, file_map)
+        logger.debug(f"Final field values: {final_field_values}")
+
+        try:
+            submission_id, submitted_at = await self._insert_submission(form_id, submitted_by, final_field_values)
+        except BaseException:
+            await self._discard_uploads(s3, uploaded)
+            raise
 
         return {
             "message": "Form submitted successfully",
@@ -217,86 +289,437 @@ class FormSubmissions:
         """
         Partially update form submission field values (and files if provided).
         Keeps old values if not overwritten.
+
+        Same two phases as submit_form_with_files: upload with no connection
+        held, then one short transaction; uploads are deleted if it fails.
         """
-        with get_db_connection(self.schema_id) as cursor:
-            # Ensure submission exists
-            cursor.execute(
-                "SELECT submission_id,flagged FROM form_submissions WHERE submission_id = %s AND form_id = %s AND flagged='approved'",
-                (submission_id, form_id),
-            )
-            existing = cursor.fetchone()
-            # print("this fatched data",existing)
-            if not existing:
-                raise HTTPException(status_code=403, detail="Form cannot be edited unless admin approves it")
-             
-
-            # Process files
-            file_map = {}
-            if files and parsed_data and parsed_data.file_mappings:
-                upload_tasks = [s3.upload_file(files[mapping.file_index]) for mapping in parsed_data.file_mappings]
-                uploaded_urls = await asyncio.gather(*upload_tasks, return_exceptions=True)
-
-                for mapping, url in zip(parsed_data.file_mappings, uploaded_urls):
-                    if isinstance(url, Exception):
-                        raise HTTPException(status_code=400, detail=f"File upload failed: {str(url)}")
-                    field_id = str(mapping.field_id)
-                    if field_id not in file_map:
-                        file_map[field_id] = []
-                    file_map[field_id].append(url)
-
-            # Build new values
-            updates = {}
-            for fv in field_values:
-                fid = str(fv.field_id)
-                if fid in file_map:
-                    updates[fid] = json.dumps(file_map[fid])
-                elif isinstance(fv.value, list):
-                    updates[fid] = json.dumps(fv.value)
-                else:
-                    updates[fid] = str(fv.value) if fv.value is not None else None
-
-            # Apply updates
-            for field_id, new_value in updates.items():
-                cursor.execute(
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                # Ensure submission exists before spending time on uploads
+                await cursor.execute(
+                    "SELECT submission_id,flagged FROM form_submissions WHERE submission_id = %s AND form_id = %s AND flagged='approved'",
+                    (submission_id, form_id),
+                )
+                existing = await cursor.fetchone()
+        # print("this fatched data",existing)
+        if not existing:
+            raise HTTPException(status_code=403, detail="Form cannot be edited unless admin approves it")
+
+        # Process files
+        file_map = {}
+        uploaded = []
+        if files and parsed_data and parsed_data.file_mappings:
+            uploaded = await self._upload_files(s3, [files[mapping.file_index] for mapping in parsed_data.file_mappings])
+
+            for mapping, obj in zip(parsed_data.file_mappings, uploaded):
+                field_id = str(mapping.field_id)
+                if field_id not in file_map:
+                    file_map[field_id] = []
+                file_map[field_id].append(obj.key)
+
+        # Build new values
+        updates = {}
+        for fv in field_values:
+            fid = str(fv.field_id)
+            if fid in file_map:
+                updates[fid] = json.dumps(file_map[fid])
+            elif isinstance(fv.value, list):
+                updates[fid] = json.dumps(fv.value)
+            else:
+                updates[fid] = str(fv.value) if fv.value is not None else None
+
+        try:
+            with outside_request_session():
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    # Upsert every value and reset the status in one statement. The
+                    # approval is re-checked under a row lock so a concurrent
+                    # re-flag cannot slip in between the check above and the write.
+                    await cursor.execute(
+                        """
+                        WITH target AS (
+                            SELECT submission_id
+                            FROM form_submissions
+                            WHERE submission_id = %s AND form_id = %s AND flagged = 'approved'
+                            FOR UPDATE
+                        ), upserted AS (
+                            INSERT INTO form_field_values (id, submission_id, field_id, value_text)
+                            SELECT v.id, target.submission_id, v.field_id, v.value_text
+                            FROM target, unnest(%s::uuid[], %s::uuid[], %s::text[]) AS v(id, field_id, value_text)
+                            ON CONFLICT (submission_id, field_id) DO UPDATE SET value_text = EXCLUDED.value_text
+                        ), reset AS (
+                            UPDATE form_submissions fs
+                            SET submitted_at = NOW(),
+                                flagged = 'none'
+                            FROM target
+                            WHERE fs.submission_id = target.submission_id
+                        )
+                        SELECT count(*) FROM target
+                        """,
+                        (
+                            submission_id,
+                            form_id,
+                            [str(uuid.uuid4()) for _ in updates],
+                            list(updates.keys()),
+                            list(updates.values()),
+                        ),
+                    )
+                    if (await cursor.fetchone())[0] == 0:
+                        raise HTTPException(status_code=403, detail="Form cannot be edited unless admin approves it")
+                    await record_write(cursor, self.schema_id)
+                # the reset flag moves the owner's counts
+                invalidate_dashboards(self.schema_id)
+        except BaseException:
+            await self._discard_uploads(s3, uploaded)
+            raise
+
+        return {
+            "message": "Form updated successfully",
+            "submission_id": submission_id,
+        }
+
+    def _upload_folder(self) -> str:
+        return f"{self.schema_id}/submissions"
+
+    def create_upload_urls(self, files: List[UploadUrlRequestItem], s3: S3Service, expiry_hours: int = 1) -> List[dict]:
+        """
+        Presigned PUT URLs for uploading submission files straight to the
+        bucket. The client PUTs each file with the returned Content-Type and
+        then sends the keys to finalize_submission.
+        """
+        uploads = []
+        for item in files:
+            key = s3.new_object_key(self._upload_folder(), item.file_name)
+            uploads.append({
+                "field_id": item.field_id,
+                "file_name": item.file_name,
+                "key": key,
+                "content_type": s3.guess_content_type(item.file_name),
+                "url": s3.generate_upload_presigned_url(key, expiry_hours),
+            })
+        return uploads
+
+    async def finalize_submission(
+        self,
+        form_id: str,
+        submitted_by: str,
+        field_values: List[FieldValue],
+        files: List[UploadedFileRef],
+        s3: S3Service,
+    ):
+        """
+        Record a submission whose files the client already uploaded with
+        create_upload_urls. Every key must belong to this tenant and exist
+        in the bucket (checked with parallel HEAD requests) before the rows
+        are written through the same single-statement insert as
+        submit_form_with_files. Several files for one field are stored as a
+        JSON array, as update_form_with_files does.
+        """
+        keys = [ref.key for ref in files]
+        if self._foreign_keys(keys):
+            raise HTTPException(status_code=400, detail="File key does not belong to this tenant")
+
+        sizes = await s3.head_objects(keys)
+        missing = [key for key in keys if sizes.get(key) is None]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Files not uploaded: {', '.join(missing)}")
+
+        file_map = self._file_map(files)
+        final_field_values = self._merge_field_values(field_values, file_map)
+        submission_id, submitted_at = await self._insert_submission(form_id, submitted_by, final_field_values)
+        return {
+            "message": "Form submitted successfully",
+            "submission_id": submission_id,
+            "submitted_at": submitted_at,
+        }
+    
+
+
+
+    def _foreign_keys(self, keys: List[str]) -> List[str]:
+        """Keys outside this tenant's upload folder."""
+        prefix = self._upload_folder() + "/"
+        return [key for key in keys if not key.startswith(prefix) or ".." in key]
+
+    def _file_map(self, files: List[UploadedFileRef]) -> dict:
+        """field_id -> stored value: the key, or a JSON array when a field has several."""
+        by_field = {}
+        for ref in files:
+            by_field.setdefault(str(ref.field_id), []).append(ref.key)
+        return {
+            fid: field_keys[0] if len(field_keys) == 1 else json.dumps(field_keys)
+            for fid, field_keys in by_field.items()
+        }
+
+    async def submit_batch(self, submitted_by: str, items: List[BatchSubmissionItem], s3: Optional[S3Service] = None):
+        """
+        Record many submissions (e.g. replayed by an offline client) at once.
+
+        Items are validated together: one query checks every form and field
+        id, and every referenced file is HEADed in one parallel batch. The
+        valid items are then written in a single statement. If that write
+        fails, they are retried one by one so a single bad item cannot sink
+        the rest. Returns one result per item, in request order, echoing the
+        item's idempotency_key.
+        """
+        results = [
+            {"index": index, "idempotency_key": item.idempotency_key, "status": "created",
+             "submission_id": None, "submitted_at": None, "error": None}
+            for index, item in enumerate(items)
+        ]
+
+        def reject(index, error):
+            results[index]["status"] = "rejected"
+            results[index]["error"] = error
+
+        form_fields = await self._form_fields([str(item.form_id) for item in items])
+
+        keys = []
+        for index, item in enumerate(items):
+            fields = form_fields.get(str(item.form_id))
+            if fields is None:
+                reject(index, "Form not found")
+                continue
+            unknown = {str(fv.field_id) for fv in item.field_values} | {str(ref.field_id) for ref in item.files}
+            unknown -= fields
+            if unknown:
+                reject(index, f"Fields not in form: {', '.join(sorted(unknown))}")
+                continue
+            item_keys = [ref.key for ref in item.files]
+            if self._foreign_keys(item_keys):
+                reject(index, "File key does not belong to this tenant")
+                continue
+            if item_keys and s3 is None:
+                reject(index, "File storage is not configured")
+                continue
+            keys.extend(item_keys)
+
+        sizes = await s3.head_objects(keys) if keys else {}
+
+        rows = []
+        for index, item in enumerate(items):
+            if results[index]["status"] != "created":
+                continue
+            missing = [ref.key for ref in item.files if sizes.get(ref.key) is None]
+            if missing:
+                reject(index, f"Files not uploaded: {', '.join(missing)}")
+                continue
+            final_field_values = self._merge_field_values(item.field_values, self._file_map(item.files))
+            rows.append((index, str(item.form_id), final_field_values))
+
+        if rows:
+            try:
+                written = await self._insert_submissions(submitted_by, rows)
+            except Exception as e:
+                logger.error(f"Batch insert failed, retrying items one by one: {str(e)}")
+                written = {}
+                for index, form_id, final_field_values in rows:
+                    try:
+                        written[index] = await self._insert_submission(form_id, submitted_by, final_field_values)
+                    except Exception as item_error:
+                        results[index]["status"] = "failed"
+                        results[index]["error"] = str(item_error)
+            for index, (submission_id, submitted_at) in written.items():
+                results[index]["submission_id"] = submission_id
+                results[index]["submitted_at"] = submitted_at
+
+        return results
+
+    async def _form_fields(self, form_ids: List[str]) -> dict:
+        """
+        {form_id: {field_id, ...}} for the forms that exist among `form_ids`.
+        Its own short block, so no connection is held across later uploads
+        and writes.
+        """
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                await cursor.execute(
                     """
-                    UPDATE form_field_values
-                    SET value_text = %s
-                    WHERE submission_id = %s AND field_id = %s
+                    SELECT f.form_id, ff.field_id
+                    FROM form f
+                    LEFT JOIN form_fields ff ON ff.form_id = f.form_id
+                    WHERE f.form_id = ANY(%s::uuid[])
                     """,
-                    (new_value, submission_id, field_id),
+                    (list(set(form_ids)),),
                 )
-                # If no row was updated (new field_id), insert it
-                if cursor.rowcount == 0:
-                    cursor.execute(
-                        """
+                field_rows = await cursor.fetchall()
+        form_fields = {}
+        for form_id, field_id in field_rows:
+            fields = form_fields.setdefault(str(form_id), set())
+            if field_id is not None:
+                fields.add(str(field_id))
+        return form_fields
+
+    async def _insert_submissions(self, submitted_by: str, rows: List[tuple]) -> dict:
+        """
+        Bulk form of _insert_submission: every header and every field value
+        in one statement and one short transaction. `rows` holds
+        (index, form_id, final_field_values); returns {index: (submission_id, submitted_at)}.
+        """
+        submission_ids = [str(uuid.uuid4()) for _ in rows]
+        value_ids, value_submissions, value_fields, value_texts = [], [], [], []
+        for submission_id, (_, _, final_field_values) in zip(submission_ids, rows):
+            for fv in final_field_values:
+                value_ids.append(str(uuid.uuid4()))
+                value_submissions.append(submission_id)
+                value_fields.append(fv["field_id"])
+                value_texts.append(fv["value"])
+
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                await cursor.execute(
+                    """
+                    WITH submissions AS (
+                        INSERT INTO form_submissions (submission_id, form_id, submitted_by, submitted_at)
+                        SELECT s.submission_id, s.form_id, %s, NOW()
+                        FROM unnest(%s::uuid[], %s::uuid[]) AS s(submission_id, form_id)
+                        RETURNING submission_id, submitted_at
+                    ), field_rows AS (
                         INSERT INTO form_field_values (id, submission_id, field_id, value_text)
-                        VALUES (%s, %s, %s, %s)
-                        """,
-                        (str(uuid.uuid4()), submission_id, field_id, new_value),
+                        SELECT v.id, v.submission_id, v.field_id, v.value_text
+                        FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[], %s::text[]) AS v(id, submission_id, field_id, value_text)
+                        JOIN submissions ON submissions.submission_id = v.submission_id
                     )
+                    SELECT submission_id, submitted_at FROM submissions
+                    """,
+                    (
+                        str(submitted_by),
+                        submission_ids,
+                        [form_id for _, form_id, _ in rows],
+                        value_ids,
+                        value_submissions,
+                        value_fields,
+                        value_texts,
+                    ),
+                )
+                submitted = {str(submission_id): submitted_at for submission_id, submitted_at in await cursor.fetchall()}
+                await record_write(cursor, self.schema_id)
+            invalidate_dashboards(self.schema_id, submitted_by)
+
+        return {
+            index: (submission_id, submitted[submission_id])
+            for submission_id, (index, _, _) in zip(submission_ids, rows)
+        }
 
-            # Update modified timestamp
-            cursor.execute(
+    async def enqueue_submission(
+        self,
+        form_id: str,
+        submitted_by: str,
+        field_values: List[FieldValue],
+        files: Optional[List[UploadFile]],
+        s3: S3Service,
+    ):
+        """
+        Write-behind variant of submit_form_with_files: validate, upload the
+        files, then store the payload in submission_ingest_queue and return.
+        The ingest worker writes the submission later under the
+        submission_id returned here; get_ingest_status reports when it has.
+        """
+        fields = (await self._form_fields([form_id])).get(str(form_id))
+        if fields is None:
+            raise HTTPException(status_code=404, detail="Form not found")
+        unknown = {str(fv.field_id) for fv in field_values} - fields
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Fields not in form: {', '.join(sorted(unknown))}")
+
+        uploaded = await self._upload_files(s3, files) if files else []
+        # Assign object keys to field_ids (match by order), as submit_form_with_files does
+        file_map = {str(fv.field_id): obj.key for fv, obj in zip(field_values, uploaded)}
+        final_field_values = self._merge_field_values(field_values, file_map)
+
+        submission_id = str(uuid.uuid4())
+        try:
+            with outside_request_session():
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    await cursor.execute(
                         """
-                        UPDATE form_submissions 
-                        SET submitted_at = NOW(),
-                            flagged = 'none'
-                        WHERE submission_id = %s
+                        INSERT INTO submission_ingest_queue (submission_id, form_id, submitted_by, field_values)
+                        VALUES (%s, %s, %s, %s::jsonb)
+                        RETURNING enqueued_at
                         """,
-                        (submission_id,),
+                        (submission_id, str(form_id), str(submitted_by), json.dumps(final_field_values)),
                     )
+                    enqueued_at = (await cursor.fetchone())[0]
+                    await record_write(cursor, self.schema_id)
+        except BaseException:
+            await self._discard_uploads(s3, uploaded)
+            raise
 
         return {
-            "message": "Form updated successfully",
+            "message": "Form submission accepted",
             "submission_id": submission_id,
+            "status": "pending",
+            "enqueued_at": enqueued_at,
         }
-    
 
+    async def get_ingest_status(self, submission_id: str, user_id: str) -> dict:
+        """
+        Where a queued submission is. Queue rows are purged some time after
+        they are materialized, so a submission with no queue row but a
+        form_submissions row is reported as materialized.
+        """
+        async with get_async_db_connection(self.schema_id) as cursor:
+            await cursor.execute(
+                """
+                SELECT status, enqueued_at, materialized_at, error, attempts
+                FROM submission_ingest_queue
+                WHERE submission_id = %s AND submitted_by = %s
+                """,
+                (submission_id, user_id),
+            )
+            row = await cursor.fetchone()
+            if row:
+                status, enqueued_at, materialized_at, error, attempts = row
+                return {
+                    "submission_id": submission_id,
+                    "status": status,
+                    "enqueued_at": enqueued_at,
+                    "materialized_at": materialized_at,
+                    "error": error,
+                    "attempts": attempts,
+                }
 
+            await cursor.execute(
+                "SELECT submitted_at FROM form_submissions WHERE submission_id = %s AND submitted_by = %s",
+                (submission_id, user_id),
+            )
+            row = await cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Submission not found")
+        return {"submission_id": submission_id, "status": "materialized", "submitted_at": row[0]}
 
-    def get_form_by_submission_id(self, submission_id: str, user_id: str):
-        with get_db_connection(self.schema_id) as cursor:
-            cursor.execute(
+    def _attach_file_urls(self, field_values: List[dict], s3: S3Service):
+        """
+        Add `file_urls` (presigned GET URLs) to every file-type field value,
+        signing all keys in the response in one batch. Values are a single
+        key or a JSON array of keys; anything that is already a URL is left
+        alone.
+        """
+        file_values = []
+        for fv in field_values:
+            if (fv.get("field_type") or "").lower() not in FILE_FIELD_TYPES:
+                continue
+            value = fv.get("value")
+            keys = value if isinstance(value, list) else [value]
+            keys = [k for k in keys if isinstance(k, str) and k and not k.startswith(("http://", "https://"))]
+            if keys:
+                file_values.append((fv, keys))
+        if not file_values:
+            return
+
+        urls = s3.generate_download_presigned_urls(key for _, keys in file_values for key in keys)
+        for fv, keys in file_values:
+            fv["file_urls"] = [urls[key] for key in keys]
+
+    @read_only
+    async def get_form_by_submission_id(
+        self,
+        submission_id: str,
+        user_id: str,
+        include_file_urls: bool = False,
+        s3: Optional[S3Service] = None,
+    ):
+        async with get_async_db_connection(self.schema_id) as cursor:
+            await cursor.execute(
                 """
                 SELECT fs.submission_id, fs.form_id, f.title AS form_title,
                     u.full_name AS submitted_by, fs.submitted_at, fs.flagged
@@ -307,38 +730,36 @@ class FormSubmissions:
                 """,
                 (submission_id,),
             )
-            submission = cursor.fetchone()
+            submission = await cursor.fetchone()
             if not submission:
                 raise HTTPException(status_code=404, detail="Submission not found")
 
             (sub_id, form_id, form_title, submitted_by, submitted_at, flagged) = submission
 
             # fetch field values
-            cursor.execute(
+            await cursor.execute(
                 """
-                SELECT fsv.field_id, ff.name AS field_name, fsv.value_text ,ff.field_type
+                SELECT fsv.field_id, ff.name AS field_name, fsv.value_json, ff.field_type
                 FROM form_field_values fsv
                 JOIN form_fields ff ON fsv.field_id = ff.field_id
                 WHERE fsv.submission_id = %s
                 """,
                 (submission_id,),
             )
-            field_rows = cursor.fetchall()
+            field_rows = await cursor.fetchall()
 
             field_values = []
-            for field_id, field_name, value_text,field_type in field_rows:
-                parsed_value = value_text
-                try:
-                    parsed_value = json.loads(value_text)  # if JSON stored
-                except (json.JSONDecodeError, TypeError):
-                    pass
+            for field_id, field_name, value_json, field_type in field_rows:
                 field_values.append({
                     "field_id": field_id,
                     "field_name": field_name,
                     "field_type": field_type,
-                    "value": parsed_value
+                    "value": value_json
                 })
 
+            if include_file_urls and s3:
+                self._attach_file_urls(field_values, s3)
+
             return {
                 "submission_id": sub_id,
                 "form_id": form_id,
@@ -351,6 +772,7 @@ class FormSubmissions:
 
     
 # get all form submissions with filters and pagination
+    @read_only
     async def get_all_submissions(
         self,
         form_id: Optional[str] = None,
@@ -361,8 +783,18 @@ class FormSubmissions:
         end_date: Optional[str] = None,
         page: int = 0,
         limit: int = 10,
-        is_admin: bool = False
+        is_admin: bool = False,
+        cursor: Optional[str] = None,
+        count: str = COUNT_EXACT,
     ):
+        """
+        One page of submissions, newest first. With `cursor` (a next_cursor
+        from an earlier call) the page starts right after that row instead
+        of at page * limit, so a deep page costs the same as the first.
+        next_cursor is None once there are no more rows. `count` picks how
+        total_submissions is worked out (see app.configuration.counting).
+        """
+        count = check_count_strategy(count)
         offset = page * limit
         base_query = """
             SELECT fs.submission_id, fs.form_id, u.full_name AS submitted_by,
@@ -394,29 +826,32 @@ class FormSubmissions:
             base_query += " AND fs.flagged = %s"
             params.append(flagged)
 
-        if start_date:
-            start_date_obj = datetime.strptime(start_date, "%d-%m-%Y").date()
-            base_query += " AND DATE(fs.submitted_at) >= %s"
-            params.append(str(start_date_obj))
-
-        if end_date:
-            end_date_obj = datetime.strptime(end_date, "%d-%m-%Y").date()
-            base_query += " AND DATE(fs.submitted_at) <= %s"
-            params.append(str(end_date_obj))
-
-        # Count total for pagination
-        count_query = f"SELECT COUNT(*) FROM ({base_query}) as subquery"
-        with get_db_connection(self.schema_id) as cursor:
-            cursor.execute(count_query, tuple(params))
-            total_count = cursor.fetchone()[0]
-
-        # Sorting + pagination (always latest first)
-        final_query = base_query + " ORDER BY fs.submitted_at DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
+        date_filter, date_params = self._submitted_at_filter(start_date, end_date)
+        base_query += date_filter
+        params.extend(date_params)
+
+        # Total for pagination; the counters can't split by date
+        counter = None
+        if not start_date and not end_date:
+            counter = {"form_id": form_id, "task_id": task_id, "submitted_by": submitted_by, "flagged": flagged}
+        async with get_async_db_connection(self.schema_id) as db_cursor:
+            total_count = await self._count_total(db_cursor, count, base_query, params, counter)
+
+        # Sorting + pagination (always latest first; submission_id breaks ties)
+        if cursor:
+            after_submitted_at, after_submission_id = decode_cursor(cursor)
+            final_query = base_query + """
+                AND (fs.submitted_at, fs.submission_id) < (%s::timestamp, %s::uuid)
+                ORDER BY fs.submitted_at DESC, fs.submission_id DESC LIMIT %s
+            """
+            params.extend([after_submitted_at, after_submission_id, limit + 1])
+        else:
+            final_query = base_query + " ORDER BY fs.submitted_at DESC, fs.submission_id DESC LIMIT %s OFFSET %s"
+            params.extend([limit + 1, offset])
 
-        with get_db_connection(self.schema_id) as cursor:
-            cursor.execute(final_query, tuple(params))
-            rows = cursor.fetchall()
+        async with get_async_db_connection(self.schema_id) as db_cursor:
+            await db_cursor.execute(final_query, tuple(params))
+            rows, has_more = split_page(await db_cursor.fetchall(), limit)
 
         submissions = []
         for row in rows:
@@ -432,10 +867,87 @@ class FormSubmissions:
                 "flagged": flagged
             })
 
-        return submissions, total_count
+        return {
+            "count": count,
+            "total_submissions": total_count,
+            "total_pages": total_pages(total_count, limit),
+            "has_more": has_more,
+            "next_cursor": encode_cursor(rows[-1][3], rows[-1][0]) if has_more else None,
+            "submissions": submissions,
+        }
+
+    def _submitted_at_filter(self, start_date: Optional[str], end_date: Optional[str]):
+        """
+        SQL (and params) limiting fs.submitted_at to the tenant-local days
+        start_date..end_date (dd-mm-yyyy, both inclusive). Compares the bare
+        column against a half-open range so indexes on submitted_at apply.
+        """
+        start = datetime.strptime(start_date, "%d-%m-%Y").date() if start_date else None
+        end = datetime.strptime(end_date, "%d-%m-%Y").date() if end_date else None
+        lower, upper = local_date_range(self.schema_id, start, end)
+        query, params = "", []
+        if lower is not None:
+            query += " AND fs.submitted_at >= %s"
+            params.append(lower)
+        if upper is not None:
+            query += " AND fs.submitted_at < %s"
+            params.append(upper)
+        return query, params
+
+    async def _count_total(self, cursor, count: str, query: str, params: list, counter: Optional[dict] = None) -> Optional[int]:
+        """
+        How many rows `query` returns, under the `count` strategy. `counter`
+        is the same filter as submission_counts dimensions, when the
+        counters can answer it exactly.
+        """
+        if count == COUNT_NONE:
+            return None
+        if count == COUNT_ESTIMATED:
+            return await estimate_count_async(cursor, query, params)
+        if counter is not None:
+            return await self._counted_submissions(cursor, **counter)
+        await cursor.execute(f"SELECT COUNT(*) FROM ({query}) AS subquery", tuple(params))
+        return (await cursor.fetchone())[0]
+
+    async def _counted_submissions(
+        self,
+        cursor,
+        form_id: Optional[str] = None,
+        task_id: Optional[str] = None,
+        submitted_by: Optional[str] = None,
+        flagged: Optional[str] = None,
+    ) -> int:
+        """
+        Exact submission total from submission_counts, joined the way the
+        listings join (users, form, task) so both agree.
+        """
+        query = """
+            SELECT COALESCE(SUM(c.submissions), 0)::bigint
+            FROM submission_counts c
+            JOIN users u ON c.submitted_by = u.user_id
+            JOIN form f ON c.form_id = f.form_id
+            JOIN task t ON f.task_id = t.task_id
+            WHERE 1=1
+        """
+        params = []
+        if form_id:
+            query += " AND c.form_id = %s"
+            params.append(str(form_id))
+        if task_id:
+            query += " AND t.task_id = %s"
+            params.append(str(task_id))
+        if submitted_by:
+            query += " AND c.submitted_by = %s"
+            params.append(str(submitted_by))
+        if flagged:
+            query += " AND c.flagged = %s"
+            params.append(flagged)
+        await cursor.execute(query, tuple(params))
+        return (await cursor.fetchone())[0]
 
     
     # get the form data based on user or all data related to form_id;
+    @read_only
     async def get_my_form_submissions(
     self, form_id: Optional[str], user_id: str, page: int, limit: int):
         """
@@ -446,12 +958,12 @@ class FormSubmissions:
         """
         offset = page * limit
 
-        with get_db_connection(self.schema_id) as cursor:
+        async with get_async_db_connection(self.schema_id) as cursor:
             if form_id:
-                cursor.execute(
+                await cursor.execute(
                     """
                     SELECT fs.submission_id, fs.form_id, f.title AS form_name,
-                        fs.submitted_at, fsv.field_id, fsv.value_text
+                        fs.submitted_at, fsv.field_id, fsv.value_json
                     FROM form_submissions fs
                     JOIN form_field_values fsv ON fs.submission_id = fsv.submission_id
                     JOIN form f ON fs.form_id = f.form_id
@@ -461,9 +973,9 @@ class FormSubmissions:
                     """,
                     (str(form_id), str(user_id), limit, offset),
                 )
-                rows = cursor.fetchall()
+                rows = await cursor.fetchall()
 
-                cursor.execute(
+                await cursor.execute(
                     """
                     SELECT COUNT(*)
                     FROM form_submissions
@@ -471,13 +983,13 @@ class FormSubmissions:
                     """,
                     (str(form_id), str(user_id)),
                 )
-                total_count = cursor.fetchone()[0]
+                total_count = (await cursor.fetchone())[0]
 
             else:
-                cursor.execute(
+                await cursor.execute(
                     """
                     SELECT fs.submission_id, fs.form_id, f.title AS form_name,
-                        fs.submitted_at, fsv.field_id, fsv.value_text
+                        fs.submitted_at, fsv.field_id, fsv.value_json
                     FROM form_submissions fs
                     JOIN form_field_values fsv ON fs.submission_id = fsv.submission_id
                     JOIN form f ON fs.form_id = f.form_id
@@ -487,9 +999,9 @@ class FormSubmissions:
                     """,
                     (str(user_id), limit, offset),
                 )
-                rows = cursor.fetchall()
+                rows = await cursor.fetchall()
 
-                cursor.execute(
+                await cursor.execute(
                     """
                     SELECT COUNT(*)
                     FROM form_submissions
@@ -497,7 +1009,7 @@ class FormSubmissions:
                     """,
                     (str(user_id),),
                 )
-                total_count = cursor.fetchone()[0]
+                total_count = (await cursor.fetchone())[0]
 
         if not rows:
             return [], total_count
@@ -505,7 +1017,7 @@ class FormSubmissions:
         # Group submissions by form_id
         forms_map = {}
         for row in rows:
-            submission_id, form_id, form_name, submitted_at, field_id, value_text = row
+            submission_id, form_id, form_name, submitted_at, field_id, value_json = row
 
             if form_id not in forms_map:
                 forms_map[form_id] = {
@@ -524,24 +1036,18 @@ class FormSubmissions:
                 }
                 forms_map[form_id]["submissions"].append(submission)
 
-            # Decode JSON values if possible
-            parsed_value = value_text
-            try:
-                parsed_value = json.loads(value_text)
-            except (json.JSONDecodeError, TypeError):
-                pass
-
             submission["field_values"].append({
                 "field_id": field_id,
-                "value": parsed_value
+                "value": value_json
             })
 
         return list(forms_map.values()), total_count
     
     #get total form submissions of a user
-    def get_total_form_submissions(self, user_id: str) -> int:
-        with get_db_connection(self.schema_id) as cursor:
-            cursor.execute(
+    @read_only
+    async def get_total_form_submissions(self, user_id: str) -> int:
+        async with get_async_db_connection(self.schema_id) as cursor:
+            await cursor.execute(
                 """
                 SELECT COUNT(*)
                 FROM form_submissions
@@ -550,9 +1056,10 @@ class FormSubmissions:
                 (str(user_id),),
             )
             
-            total_count = cursor.fetchone()[0]
+            total_count = (await cursor.fetchone())[0]
         return total_count           
     # get forms submitted by a specific user with optional form_id filter and pagination            
+    @read_only
     async def get_submissions_by_user(
         self, user_id: str, form_id: Optional[str] = None, page: int = 0, limit: int = 10
     ):
@@ -564,10 +1071,10 @@ class FormSubmissions:
         """
         offset = page * limit
 
-        with get_db_connection(self.schema_id) as cursor:
+        async with get_async_db_connection(self.schema_id) as cursor:
             if form_id:
                 # Step 1: Get paginated submissions (no field join here)
-                cursor.execute(
+                await cursor.execute(
                     """
                     SELECT fs.submission_id, fs.form_id, f.title AS form_name, fs.submitted_at
                     FROM form_submissions fs
@@ -578,7 +1085,7 @@ class FormSubmissions:
                     """,
                     (str(user_id), str(form_id), limit, offset),
                 )
-                submissions = cursor.fetchall()
+                submissions = await cursor.fetchall()
 
                 if not submissions:
                     return []
@@ -596,9 +1103,9 @@ class FormSubmissions:
                 }
 
                 # Step 2: Fetch field values for those submissions
-                cursor.execute(
+                await cursor.execute(
                     """
-                    SELECT fsv.submission_id, fsv.field_id, ff.name AS field_name, fsv.value_text
+                    SELECT fsv.submission_id, fsv.field_id, ff.name AS field_name, fsv.value_json
                     FROM form_field_values fsv
                     JOIN form_fields ff ON fsv.field_id = ff.field_id
                     WHERE fsv.submission_id = ANY(%s::uuid[])
@@ -606,20 +1113,14 @@ class FormSubmissions:
                     """,
                     (submission_ids,),
                 )
-                field_rows = cursor.fetchall()
-
-                for submission_id, field_id, field_name, value_text in field_rows:
-                    parsed_value = value_text
-                    try:
-                        parsed_value = json.loads(value_text)
-                    except (json.JSONDecodeError, TypeError):
-                        pass
+                field_rows = await cursor.fetchall()
 
+                for submission_id, field_id, field_name, value_json in field_rows:
                     submissions_map[submission_id]["field_values"].append(
                         {
                             "field_id": field_id,
                             "field_name": field_name,
-                            "value": parsed_value,
+                            "value": value_json,
                         }
                     )
 
@@ -627,7 +1128,7 @@ class FormSubmissions:
 
             else:
                 # Summary of all submissions (paginated)
-                cursor.execute(
+                await cursor.execute(
                     """
                     SELECT fs.submission_id, f.form_id, f.title AS form_name, fs.submitted_at
                     FROM form_submissions fs
@@ -638,7 +1139,7 @@ class FormSubmissions:
                     """,
                     (str(user_id), limit, offset),
                 )
-                rows = cursor.fetchall()
+                rows = await cursor.fetchall()
 
                 if not rows:
                     return []
@@ -653,33 +1154,35 @@ class FormSubmissions:
                     for row in rows
                 ]
                 
+    @read_only
     async def count_submissions_by_user(self, user_id: str, form_id: Optional[str] = None) -> int:
         """
         Count total submissions by a specific user.
         - If form_id is provided -> count submissions for that form only.
         - Else -> count all submissions by the user.
+        Read from submission_counts, so it costs the same at any volume.
         """
-        with get_db_connection(self.schema_id) as cursor:
+        async with get_async_db_connection(self.schema_id) as cursor:
             if form_id:
-                cursor.execute(
+                await cursor.execute(
                     """
-                    SELECT COUNT(*) 
-                    FROM form_submissions 
+                    SELECT COALESCE(SUM(submissions), 0)::bigint
+                    FROM submission_counts
                     WHERE submitted_by = %s AND form_id = %s
                     """,
                     (str(user_id), str(form_id)),
                 )
             else:
-                cursor.execute(
+                await cursor.execute(
                     """
-                    SELECT COUNT(*) 
-                    FROM form_submissions 
+                    SELECT COALESCE(SUM(submissions), 0)::bigint
+                    FROM submission_counts
                     WHERE submitted_by = %s
                     """,
                     (str(user_id),),
                 )
 
-            result = cursor.fetchone()
+            result = await cursor.fetchone()
             return result[0] if result else 0
                 
                 
@@ -697,13 +1200,13 @@ class FormSubmissions:
             Sends notifications based on flag action.
             """
 
-            with get_db_connection(self.schema_id) as cursor:
+            async with get_async_db_connection(self.schema_id) as cursor:
                 #  Ensure submission exists
-                cursor.execute(
+                await cursor.execute(
                     "SELECT form_id, submitted_by FROM form_submissions WHERE submission_id = %s",
                     (submission_id,),
                 )
-                existing = cursor.fetchone()
+                existing = await cursor.fetchone()
                 # print("this fatched data",existing)
                 if not existing:
                     raise HTTPException(status_code=404, detail="Submission not found")
@@ -711,15 +1214,15 @@ class FormSubmissions:
                 form_id, submission_owner = existing
 
                 #  Get flagging user's name
-                cursor.execute(
+                await cursor.execute(
                     "SELECT full_name FROM users WHERE user_id = %s", (flagged_by,)
                 )
-                user_record = cursor.fetchone()
+                user_record = await cursor.fetchone()
                 flagger_name = user_record[0] if user_record else "User"
 
                 #  Get form name
-                cursor.execute("SELECT title,created_by FROM form WHERE form_id = %s", (form_id,))
-                form_record = cursor.fetchone()
+                await cursor.execute("SELECT title,created_by FROM form WHERE form_id = %s", (form_id,))
+                form_record = await cursor.fetchone()
                 # print("thus form id",form_id)
                 # print("this fatched data",form_record)
                 form_name = form_record[0] if form_record else "Form"
@@ -730,7 +1233,7 @@ class FormSubmissions:
                     raise HTTPException(status_code=403, detail="Only admins can approve or reject flags")
 
                 #  Update flag status
-                cursor.execute(
+                await cursor.execute(
                     "UPDATE form_submissions SET flagged = %s WHERE submission_id = %s",
                     (flag_status, submission_id),
                 )
@@ -740,7 +1243,7 @@ class FormSubmissions:
                 # ==============================
                 if flag_status == "raised":
                     # Notify admins
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         INSERT INTO notifications (user_id,form_id, title, message, created_at, created_by,submission_id)
                         VALUES (%s,%s, 'Flag Raised', %s, %s, %s, %s)
@@ -756,7 +1259,7 @@ class FormSubmissions:
 
                 elif flag_status in ["approved", "rejected"]:
                     # Notify submission owner
-                    cursor.execute(
+                    await cursor.execute(
                         """
                         INSERT INTO notifications (user_id,form_id, title, message, created_at, created_by,submission_id)
                         VALUES (%s, %s,'Flag {status}', %s, %s, %s, %s)
@@ -771,6 +1274,7 @@ class FormSubmissions:
                         ),
                     )
 
+            invalidate_dashboards(self.schema_id, submission_owner)
             return {
                 "message": f"{flag_status} request to edit form successfully"
                 # "submission_id": submission_id,
@@ -1094,6 +1598,7 @@ class FormSubmissions:
 #     return list(submissions_map.values())
 
 
+    @read_only
     async def export_submissions(
         self,
         form_id: Optional[str] = None,
@@ -1104,8 +1609,12 @@ class FormSubmissions:
         end_date: Optional[str] = None,
         page: int = 0,
         limit: int = 10,
-        is_admin: bool = False
+        is_admin: bool = False,
+        include_file_urls: bool = False,
+        s3: Optional[S3Service] = None,
+        count: str = COUNT_EXACT,
     ):
+        count = check_count_strategy(count)
         offset = page * limit
 
         # ---------- Step 0: Count total submissions ----------
@@ -1138,37 +1647,35 @@ class FormSubmissions:
             count_query += " AND fs.flagged = %s"
             params.append(flagged)
 
-        if start_date:
-            start_date_obj = datetime.strptime(start_date, "%d-%m-%Y").date()
-            count_query += " AND DATE(fs.submitted_at) >= %s"
-            params.append(str(start_date_obj))
-
-        if end_date:
-            end_date_obj = datetime.strptime(end_date, "%d-%m-%Y").date()
-            count_query += " AND DATE(fs.submitted_at) <= %s"
-            params.append(str(end_date_obj))
+        date_filter, date_params = self._submitted_at_filter(start_date, end_date)
+        count_query += date_filter
+        params.extend(date_params)
 
-        with get_db_connection(self.schema_id) as cursor:
-            cursor.execute(count_query, tuple(params))
-            total_submissions = cursor.fetchone()[0]
-
-        total_pages = (total_submissions + limit - 1) // limit  # ceil division
+        id_query = count_query.replace("SELECT COUNT(*)", "SELECT fs.submission_id")
+        # the counters can't split by date
+        counter = None
+        if not start_date and not end_date:
+            counter = {"form_id": form_id, "task_id": task_id, "submitted_by": submitted_by, "flagged": flagged}
+        async with get_async_db_connection(self.schema_id) as cursor:
+            total_submissions = await self._count_total(cursor, count, id_query, params, counter)
 
         # ---------- Step 1: Get limited submission_ids ----------
-        base_query = count_query.replace("SELECT COUNT(*)", "SELECT fs.submission_id")
-        base_query += " ORDER BY fs.submitted_at DESC LIMIT %s OFFSET %s"
-        params_with_limit = params + [limit, offset]
+        base_query = id_query + " ORDER BY fs.submitted_at DESC LIMIT %s OFFSET %s"
+        params_with_limit = params + [limit + 1, offset]
 
-        with get_db_connection(self.schema_id) as cursor:
-            cursor.execute(base_query, tuple(params_with_limit))
-            submission_ids = [row[0] for row in cursor.fetchall()]
+        async with get_async_db_connection(self.schema_id) as cursor:
+            await cursor.execute(base_query, tuple(params_with_limit))
+            rows, has_more = split_page(await cursor.fetchall(), limit)
+            submission_ids = [row[0] for row in rows]
 
         if not submission_ids:
             return {
                 "page": page,
                 "limit": limit,
+                "count": count,
                 "total_submissions": total_submissions,
-                "total_pages": total_pages,
+                "total_pages": total_pages(total_submissions, limit),
+                "has_more": has_more,
                 "submissions": []
             }
 
@@ -1176,7 +1683,7 @@ class FormSubmissions:
         detail_query = """
             SELECT fs.submission_id, fs.form_id, u.full_name AS submitted_by,
                 fs.submitted_at, fs.flagged, t.task_id, t.name AS task_name, f.title AS form_title,
-                fsv.field_id, ff.name AS field_name, fsv.value_text
+                fsv.field_id, ff.name AS field_name, fsv.value_json, ff.field_type
             FROM form_submissions fs
             JOIN users u ON fs.submitted_by = u.user_id
             JOIN form f ON fs.form_id = f.form_id
@@ -1187,15 +1694,15 @@ class FormSubmissions:
             ORDER BY fs.submitted_at DESC
         """
 
-        with get_db_connection(self.schema_id) as cursor:
-            cursor.execute(detail_query, (submission_ids,))
-            rows = cursor.fetchall()
+        async with get_async_db_connection(self.schema_id) as cursor:
+            await cursor.execute(detail_query, (submission_ids,))
+            rows = await cursor.fetchall()
 
         # ---------- Step 3: Organize ----------
         submissions_map = {}
         for row in rows:
             (submission_id, form_id, submitted_by_name, submitted_at, flagged,
-            task_id, task_name, form_title, field_id, field_name, value_text) = row
+            task_id, task_name, form_title, field_id, field_name, value_json, field_type) = row
 
             if submission_id not in submissions_map:
                 submissions_map[submission_id] = {
@@ -1210,22 +1717,27 @@ class FormSubmissions:
                     "field_values": []
                 }
 
-            if field_id and field_name and value_text:
-                parsed_value = value_text
-                try:
-                    parsed_value = json.loads(value_text)
-                except (json.JSONDecodeError, TypeError):
-                    pass
+            # skips missing and empty values, as the value_text check used to
+            if field_id and field_name and value_json is not None and value_json != "":
                 submissions_map[submission_id]["field_values"].append({
                     "field_id": field_id,
                     "field_name": field_name,
-                    "value": parsed_value
+                    "field_type": field_type,
+                    "value": value_json
                 })
 
+        if include_file_urls and s3:
+            # one signing batch for the whole page
+            self._attach_file_urls(
+                [fv for submission in submissions_map.values() for fv in submission["field_values"]], s3
+            )
+
         return {
             "page": page,
             "limit": limit,
+            "count": count,
             "total_submissions": total_submissions,
-            "total_pages": total_pages,
+            "total_pages": total_pages(total_submissions, limit),
+            "has_more": has_more,
             "submissions": list(submissions_map.values())
         }
@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.configuration.database import get_async_db_connection, outside_request_session
+
+logger = logging.getLogger(__name__)
+
+# How long a completed key is replayed.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+# An in-progress key older than this is treated as abandoned (worker died mid-request).
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))
+# Expired rows are deleted at most this often per schema and worker.
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "300"))
+# Tries at storing the response of a write that already committed.
+IDEMPOTENCY_STORE_ATTEMPTS = int(os.getenv("IDEMPOTENCY_STORE_ATTEMPTS", "3"))
+MAX_KEY_LENGTH = 255
+
+_last_purge = {}  # schema -> monotonic time of the last purge
+
+
+class _Claim:
+    """The key the running request holds; set while its call runs."""
+
+    __slots__ = ("schema", "user_id", "endpoint", "idempotency_key", "request_hash", "written")
+
+    def __init__(self, schema: str, user_id: str, endpoint: str, idempotency_key: str, request_hash: str):
+        self.schema = schema
+        self.user_id = user_id
+        self.endpoint = endpoint
+        self.idempotency_key = idempotency_key
+        self.request_hash = request_hash
+        self.written = False
+
+
+_current_claim: ContextVar[Optional[_Claim]] = ContextVar("idempotency_claim", default=None)
+
+
+async def record_write(cursor, schema: str):
+    """
+    Mark the running request's Idempotency-Key as done, on `cursor`, inside
+    the transaction of a write that commits on its own (under
+    outside_request_session). The key then commits with the write, so a
+    retry can never run it again, even if storing the response fails.
+    No-op when the request carries no key.
+    """
+    claim = _current_claim.get()
+    if claim is None or claim.schema != schema:
+        return
+    await cursor.execute(
+        """
+        UPDATE idempotency_keys
+        SET status = 'completed'
+        WHERE user_id = %s AND endpoint = %s AND idempotency_key = %s AND request_hash = %s
+        """,
+        (claim.user_id, claim.endpoint, claim.idempotency_key, claim.request_hash),
+    )
+    claim.written = True
+
+
+def request_fingerprint(*parts) -> str:
+    """Stable hash of whatever identifies a request's payload."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IdempotencyService:
+    """
+    Idempotency-Key handling for write endpoints.
+
+    The first request with a key claims it (committed at once, so a
+    concurrent retry sees the claim and gets a 409) and runs. Writes that
+    commit on their own mark the key done in their own transaction
+    (record_write); writes made through the request session are marked
+    done in that session, so either way the key commits with the write.
+    The response is stored afterwards. Later requests with the same key
+    and payload get the stored response back without running again; the
+    same key with a different payload is a 422. If the request fails before
+    its write commits, the claim is dropped so the client can retry. If the
+    write committed but its response could never be stored, retries get a
+    409 for IDEMPOTENCY_LOCK_SECONDS and a 410 after that, never a rerun.
+    """
+
+    def __init__(self, schema_id: str):
+        self.schema_id = schema_id
+
+    async def run(
+        self,
+        idempotency_key: Optional[str],
+        user_id: str,
+        endpoint: str,
+        request_hash: str,
+        call: Callable[[], Awaitable],
+        response_model=None,
+        status_code: int = 200,
+    ):
+        """
+        Run `call` once per key. `response_model`, if given, shapes the
+        stored body the way the route's response_model shapes the live one;
+        `status_code` is the route's success status, replayed with it.
+        """
+        if not idempotency_key:
+            return await call()
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+
+        stored = await self._claim(idempotency_key, user_id, endpoint, request_hash)
+        if stored is not None:
+            status_code, body = stored
+            return JSONResponse(content=body, status_code=status_code, headers={"Idempotent-Replayed": "true"})
+
+        claim = _Claim(self.schema_id, user_id, endpoint, idempotency_key, request_hash)
+        token = _current_claim.set(claim)
+        try:
+            result = await call()
+        except BaseException:
+            # Only drops a claim whose write never committed.
+            await self._release(idempotency_key, user_id, endpoint)
+            raise
+        finally:
+            _current_claim.reset(token)
+
+        # The write has happened: from here on the key is never released,
+        # a failure only costs the stored response (see _claim).
+        try:
+            body = jsonable_encoder(response_model.model_validate(result) if response_model else result)
+        except Exception as e:
+            logger.error(f"Could not encode the response for Idempotency-Key {idempotency_key}: {str(e)}")
+            return result
+        await self._complete(claim, status_code, body)
+        return result
+
+    async def _claim(self, idempotency_key: str, user_id: str, endpoint: str, request_hash: str):
+        """Claim the key; returns None if this request should run, else the stored (status, body)."""
+        stored = None
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                await self._purge_expired(cursor)
+                # A competing in-progress claim released between the INSERT and
+                # the SELECT leaves nothing to read; claim again, a few times.
+                for _ in range(3):
+                    stored = await self._try_claim(cursor, idempotency_key, user_id, endpoint, request_hash)
+                    if stored != ():
+                        break
+        if stored is None:
+            return None
+        if not stored:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+        stored_hash, status, response_status, response_body, lock_expired = stored
+        if stored_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if status == "completed" and response_status is None and lock_expired:
+            # The write committed but its response was never stored; running
+            # it again would repeat the write, so tell the client to look.
+            raise HTTPException(
+                status_code=410,
+                detail="The request with this Idempotency-Key was applied but its response is no longer available",
+            )
+        # completed without a response, recently: the response is still being stored
+        if status != "completed" or response_status is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        return response_status, response_body
+
+    async def _try_claim(self, cursor, idempotency_key: str, user_id: str, endpoint: str, request_hash: str):
+        """
+        None if the key was claimed, else the existing row as (request_hash,
+        status, response_status, response_body, lock_expired), or () if it
+        vanished in between.
+        """
+        await cursor.execute(
+            """
+            INSERT INTO idempotency_keys (user_id, endpoint, idempotency_key, request_hash, expires_at)
+            VALUES (%s, %s, %s, %s, now() + make_interval(secs => %s))
+            ON CONFLICT (user_id, endpoint, idempotency_key) DO UPDATE
+            SET request_hash = EXCLUDED.request_hash,
+                status = 'in_progress',
+                response_status = NULL,
+                response_body = NULL,
+                created_at = now(),
+                expires_at = EXCLUDED.expires_at
+            WHERE idempotency_keys.expires_at < now()
+               OR (idempotency_keys.status = 'in_progress'
+                   AND idempotency_keys.created_at < now() - make_interval(secs => %s))
+            RETURNING 1
+            """,
+            (user_id, endpoint, idempotency_key, request_hash, IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LOCK_SECONDS),
+        )
+        if await cursor.fetchone():
+            return None
+
+        await cursor.execute(
+            """
+            SELECT request_hash, status, response_status, response_body,
+                   created_at < now() - make_interval(secs => %s)
+            FROM idempotency_keys
+            WHERE user_id = %s AND endpoint = %s AND idempotency_key = %s
+            """,
+            (IDEMPOTENCY_LOCK_SECONDS, user_id, endpoint, idempotency_key),
+        )
+        return await cursor.fetchone() or ()
+
+    async def _complete(self, claim: _Claim, status_code: int, body):
+        query = """
+            UPDATE idempotency_keys
+            SET status = 'completed', response_status = %s, response_body = %s::jsonb
+            WHERE user_id = %s AND endpoint = %s AND idempotency_key = %s AND request_hash = %s
+        """
+        params = (status_code, json.dumps(body), claim.user_id, claim.endpoint, claim.idempotency_key, claim.request_hash)
+        if not claim.written:
+            # The write is in the request session: commit the key with it.
+            # If this fails the write rolls back too and the claim lapses
+            # after IDEMPOTENCY_LOCK_SECONDS.
+            try:
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    await cursor.execute(query, params)
+            except Exception as e:
+                logger.error(f"Could not store the response for Idempotency-Key {claim.idempotency_key}: {str(e)}")
+            return
+
+        # The write already committed; store the response on its own, retrying
+        # so the key does not end up completed with no response to replay.
+        for attempt in range(IDEMPOTENCY_STORE_ATTEMPTS):
+            try:
+                with outside_request_session():
+                    async with get_async_db_connection(self.schema_id) as cursor:
+                        await cursor.execute(query, params)
+                return
+            except Exception as e:
+                logger.error(
+                    f"Could not store the response for Idempotency-Key {claim.idempotency_key} "
+                    f"(attempt {attempt + 1} of {IDEMPOTENCY_STORE_ATTEMPTS}): {str(e)}"
+                )
+                if attempt + 1 < IDEMPOTENCY_STORE_ATTEMPTS:
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+
+    async def _release(self, idempotency_key: str, user_id: str, endpoint: str):
+        try:
+            with outside_request_session():
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    await cursor.execute(
+                        """
+                        DELETE FROM idempotency_keys
+                        WHERE user_id = %s AND endpoint = %s AND idempotency_key = %s AND status = 'in_progress'
+                        """,
+                        (user_id, endpoint, idempotency_key),
+                    )
+        except Exception as e:
+            # The claim expires after IDEMPOTENCY_LOCK_SECONDS anyway.
+            logger.error(f"Could not release Idempotency-Key {idempotency_key}: {str(e)}")
+
+    async def _purge_expired(self, cursor):
+        now = time.monotonic()
+        if now - _last_purge.get(self.schema_id, 0) < IDEMPOTENCY_PURGE_INTERVAL:
+            return
+        _last_purge[self.schema_id] = now
+        await cursor.execute("DELETE FROM idempotency_keys WHERE expires_at < now()")
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional, Set
+
+import psycopg
+
+from app.configuration.cache import invalidate_dashboards
+from app.configuration.database import get_async_db_connection, outside_request_session
+
+logger = logging.getLogger(__name__)
+
+# Run the drainer in this process (turn off to drain from dedicated workers only).
+INGEST_WORKER_ENABLED = os.getenv("INGEST_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Queued submissions written per transaction.
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+# After a local enqueue, wait this long so a burst is written as one batch.
+INGEST_BATCH_WINDOW_SECONDS = float(os.getenv("INGEST_BATCH_WINDOW_MS", "50")) / 1000
+# Every tenant's queue is checked this often, for rows enqueued by other
+# workers or left behind by a restart.
+INGEST_SWEEP_SECONDS = int(os.getenv("INGEST_SWEEP_SECONDS", "10"))
+# Materialized queue rows are kept this long for status polling.
+INGEST_RETENTION_HOURS = int(os.getenv("INGEST_RETENTION_HOURS", "24"))
+# A row that hit a transient error waits this long before its next try,
+# doubling with every attempt up to INGEST_RETRY_MAX_SECONDS.
+INGEST_RETRY_BASE_SECONDS = int(os.getenv("INGEST_RETRY_BASE_SECONDS", "5"))
+INGEST_RETRY_MAX_SECONDS = int(os.getenv("INGEST_RETRY_MAX_SECONDS", "300"))
+
+_DUE = "status = 'pending' AND (next_attempt_at IS NULL OR next_attempt_at <= now())"
+
+# Writes the claimed queue rows into form_submissions / form_field_values and
+# marks them materialized, all in one statement. SKIP LOCKED lets several
+# workers drain the same queue without waiting on each other.
+_MATERIALIZE_SQL = """
+    WITH batch AS (
+        SELECT submission_id, form_id, submitted_by, field_values, enqueued_at
+        FROM submission_ingest_queue
+        WHERE {due} {filter}
+        ORDER BY enqueued_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ), submissions AS (
+        INSERT INTO form_submissions (submission_id, form_id, submitted_by, submitted_at)
+        SELECT submission_id, form_id, submitted_by, enqueued_at FROM batch
+    ), field_rows AS (
+        INSERT INTO form_field_values (id, submission_id, field_id, value_text)
+        SELECT gen_random_uuid(), batch.submission_id, (fv->>'field_id')::uuid, fv->>'value'
+        FROM batch, jsonb_array_elements(batch.field_values) AS fv
+    )
+    UPDATE submission_ingest_queue q
+    SET status = 'materialized', materialized_at = now(), error = NULL
+    FROM batch
+    WHERE q.submission_id = batch.submission_id
+    RETURNING q.submission_id, batch.submitted_by
+"""
+
+_pending_schemas: Set[str] = set()
+_wakeup: Optional[asyncio.Event] = None
+_task: Optional[asyncio.Task] = None
+
+
+def notify_enqueued(schema: str):
+    """Tell this worker's drainer that `schema` has new queued submissions."""
+    _pending_schemas.add(schema)
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _invalidate_dashboards(schema: str, rows):
+    for submitted_by in {row[1] for row in rows}:
+        invalidate_dashboards(schema, submitted_by)
+
+
+async def drain_schema(schema: str) -> int:
+    """
+    Materialize one batch of the schema's pending submissions; returns how
+    many were written. If the database rejects the batch's data, its rows
+    are retried one at a time and only the ones it rejects again are marked
+    failed, so a single bad row cannot block the queue. Any other error
+    (pool timeout, lost connection, deadlock) leaves the rows pending:
+    a row that hits one is retried later with backoff, never dropped.
+    """
+    try:
+        with outside_request_session():
+            async with get_async_db_connection(schema) as cursor:
+                await cursor.execute(_MATERIALIZE_SQL.format(due=_DUE, filter=""), (INGEST_BATCH_SIZE,))
+                rows = await cursor.fetchall()
+            _invalidate_dashboards(schema, rows)
+            return len(rows)
+    except Exception as e:
+        if not _rejected(e):
+            logger.error(f"Ingest batch for schema '{schema}' failed, left pending for the next sweep: {str(e)}")
+            return 0
+        logger.error(f"Ingest batch for schema '{schema}' failed, retrying rows one by one: {str(e)}")
+
+    with outside_request_session():
+        async with get_async_db_connection(schema) as cursor:
+            await cursor.execute(
+                f"""
+                SELECT submission_id FROM submission_ingest_queue
+                WHERE {_DUE}
+                ORDER BY enqueued_at
+                LIMIT %s
+                """,
+                (INGEST_BATCH_SIZE,),
+            )
+            submission_ids = [row[0] for row in await cursor.fetchall()]
+
+    written = 0
+    for submission_id in submission_ids:
+        try:
+            with outside_request_session():
+                async with get_async_db_connection(schema) as cursor:
+                    await cursor.execute(
+                        _MATERIALIZE_SQL.format(due=_DUE, filter="AND submission_id = %s"), (submission_id, 1)
+                    )
+                    rows = await cursor.fetchall()
+                _invalidate_dashboards(schema, rows)
+                written += len(rows)
+        except Exception as e:
+            await _record_failure(schema, submission_id, e)
+    return written
+
+
+def _rejected(error: Exception) -> bool:
+    """The database refused the data itself; trying the same row again cannot help."""
+    return isinstance(error, (psycopg.DataError, psycopg.IntegrityError))
+
+
+async def _record_failure(schema: str, submission_id, error: Exception):
+    if _rejected(error):
+        query = """
+            UPDATE submission_ingest_queue SET status = 'failed', error = %s
+            WHERE submission_id = %s AND status = 'pending'
+        """
+        params = (str(error), submission_id)
+    else:
+        query = """
+            UPDATE submission_ingest_queue
+            SET attempts = attempts + 1,
+                error = %s,
+                next_attempt_at = now() + make_interval(secs => LEAST(%s * power(2, attempts), %s))
+            WHERE submission_id = %s AND status = 'pending'
+        """
+        params = (str(error), INGEST_RETRY_BASE_SECONDS, INGEST_RETRY_MAX_SECONDS, submission_id)
+    try:
+        with outside_request_session():
+            async with get_async_db_connection(schema) as cursor:
+                await cursor.execute(query, params)
+    except Exception as e:
+        # still pending; retried on the next sweep
+        logger.error(f"Could not record ingest failure for submission {submission_id}: {str(e)}")
+
+
+async def _queue_schemas() -> Set[str]:
+    """Tenant schemas that have a submission_ingest_queue table."""
+    async with get_async_db_connection("public") as cursor:
+        await cursor.execute(
+            """
+            SELECT table_schema
+            FROM information_schema.tables
+            WHERE table_name = 'submission_ingest_queue' AND table_type = 'BASE TABLE'
+            """
+        )
+        return {row[0] for row in await cursor.fetchall()}
+
+
+async def _purge_materialized(schema: str):
+    async with get_async_db_connection(schema) as cursor:
+        await cursor.execute(
+            """
+            DELETE FROM submission_ingest_queue
+            WHERE status = 'materialized' AND materialized_at < now() - make_interval(hours => %s)
+            """,
+            (INGEST_RETENTION_HOURS,),
+        )
+
+
+async def _run():
+    last_sweep = 0.0
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=INGEST_SWEEP_SECONDS)
+            await asyncio.sleep(INGEST_BATCH_WINDOW_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        schemas = set(_pending_schemas)
+        _pending_schemas.clear()
+
+        sweep = time.monotonic() - last_sweep >= INGEST_SWEEP_SECONDS
+        if sweep:
+            last_sweep = time.monotonic()
+            try:
+                schemas |= await _queue_schemas()
+            except Exception as e:
+                logger.error(f"Could not list ingest queues: {str(e)}")
+
+        for schema in schemas:
+            try:
+                while await drain_schema(schema) >= INGEST_BATCH_SIZE:
+                    pass
+                if sweep:
+                    await _purge_materialized(schema)
+            except Exception as e:
+                # left pending; picked up again on the next sweep
+                logger.error(f"Could not drain ingest queue for schema '{schema}': {str(e)}")
+
+
+def start_ingest_worker():
+    """Start the background drainer; call once the DB pools are up."""
+    global _task, _wakeup
+    if not INGEST_WORKER_ENABLED or _task is not None:
+        return
+    _wakeup = asyncio.Event()
+    _task = asyncio.create_task(_run())
+
+
+async def stop_ingest_worker():
+    """Stop the drainer. Anything still queued stays in the table for the next start."""
+    global _task, _wakeup
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+    _wakeup = None
@@ -0,0 +1,347 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Optional, Set
+
+from fastapi import HTTPException
+
+from app.configuration.database import get_async_db_connection, outside_request_session
+from app.configuration.s3service import S3_UPLOAD_PART_SIZE, S3Service, get_s3_service, upload_semaphore
+
+logger = logging.getLogger(__name__)
+
+# Largest body a single PATCH may carry; the client picks anything up to this.
+MAX_CHUNK_SIZE = S3_UPLOAD_PART_SIZE
+# An upload left open this long without a chunk is aborted (0 keeps them forever).
+RESUMABLE_UPLOAD_EXPIRY_HOURS = int(os.getenv("RESUMABLE_UPLOAD_EXPIRY_HOURS", "24"))
+# Every tenant is checked for expired uploads this often.
+RESUMABLE_UPLOAD_SWEEP_SECONDS = int(os.getenv("RESUMABLE_UPLOAD_SWEEP_SECONDS", "3600"))
+
+_sweeper: Optional[asyncio.Task] = None
+
+
+class ResumableUploadService:
+    """
+    tus-like resumable uploads backed by an S3 multipart upload.
+
+    create -> PATCH chunks at the current offset -> (HEAD to learn the
+    offset after a dropped connection) -> complete. Chunks can be any size
+    up to MAX_CHUNK_SIZE; they are kept in resumable_upload_chunks until
+    enough has arrived for an S3 part (at least 5 MiB), then sent as one.
+    The finished object's key is what the client passes to the submission
+    finalize endpoint. Uploads left open for RESUMABLE_UPLOAD_EXPIRY_HOURS
+    are aborted by a background sweep (purge_expired_uploads).
+
+    Every DB step is its own short transaction, committed before any S3
+    call, so no connection is held while bytes move to the bucket.
+    """
+
+    def __init__(self, schema_id: str):
+        self.schema_id = schema_id
+
+    def _folder(self) -> str:
+        return f"{self.schema_id}/submissions"
+
+    async def create_upload(self, user_id: str, file_name: str, size: int, content_type: Optional[str], s3: S3Service):
+        if size < 0:
+            raise HTTPException(status_code=400, detail="Upload size must not be negative")
+        upload_id = str(uuid.uuid4())
+        key = s3.new_object_key(self._folder(), file_name)
+        content_type = content_type or s3.guess_content_type(file_name)
+        s3_upload_id = await s3.create_multipart_upload(key, content_type)
+
+        try:
+            with outside_request_session():
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    await cursor.execute(
+                        """
+                        INSERT INTO resumable_uploads
+                            (upload_id, object_key, s3_upload_id, file_name, content_type, total_size, created_by)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        """,
+                        (upload_id, key, s3_upload_id, file_name, content_type, size, user_id),
+                    )
+        except BaseException:
+            await s3.abort_multipart_upload(key, s3_upload_id)
+            raise
+
+        return {"upload_id": upload_id, "key": key, "offset": 0, "size": size, "max_chunk_size": MAX_CHUNK_SIZE}
+
+    async def get_upload(self, upload_id: str, user_id: str) -> dict:
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                await cursor.execute(
+                    """
+                    SELECT upload_id, object_key, s3_upload_id, total_size, received, flushed, parts, status
+                    FROM resumable_uploads
+                    WHERE upload_id = %s AND created_by = %s
+                    """,
+                    (upload_id, user_id),
+                )
+                row = await cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        upload_id, key, s3_upload_id, total_size, received, flushed, parts, status = row
+        return {
+            "upload_id": upload_id,
+            "key": key,
+            "s3_upload_id": s3_upload_id,
+            "size": total_size,
+            "offset": received,
+            "flushed": flushed,
+            "parts": parts if isinstance(parts, list) else json.loads(parts),
+            "status": status,
+        }
+
+    async def append_chunk(self, upload_id: str, user_id: str, offset: int, data: bytes, s3: S3Service) -> int:
+        """
+        Store `data` at `offset`, which must be the current offset; returns
+        the new offset. Sends buffered chunks to S3 once they fill a part.
+        """
+        if len(data) > MAX_CHUNK_SIZE:
+            raise HTTPException(status_code=413, detail=f"Chunk larger than {MAX_CHUNK_SIZE} bytes")
+
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                await cursor.execute(
+                    """
+                    SELECT total_size, received, flushed, status
+                    FROM resumable_uploads
+                    WHERE upload_id = %s AND created_by = %s
+                    FOR UPDATE
+                    """,
+                    (upload_id, user_id),
+                )
+                row = await cursor.fetchone()
+                if not row:
+                    raise HTTPException(status_code=404, detail="Upload not found")
+                total_size, received, flushed, status = row
+                if status != "open":
+                    raise HTTPException(status_code=409, detail=f"Upload is {status}")
+                if offset != received:
+                    raise HTTPException(status_code=409, detail=f"Offset mismatch; current offset is {received}")
+                if received + len(data) > total_size:
+                    raise HTTPException(status_code=400, detail="Chunk goes past the declared upload size")
+                if data:
+                    await cursor.execute(
+                        "INSERT INTO resumable_upload_chunks (upload_id, chunk_offset, data) VALUES (%s, %s, %s)",
+                        (upload_id, offset, data),
+                    )
+                    await cursor.execute(
+                        "UPDATE resumable_uploads SET received = %s, updated_at = now() WHERE upload_id = %s",
+                        (received + len(data), upload_id),
+                    )
+        received += len(data)
+
+        if received - flushed >= S3_UPLOAD_PART_SIZE:
+            try:
+                await self._flush(upload_id, user_id, s3)
+            except Exception as e:
+                # The chunk is stored; the next PATCH or complete retries the part.
+                logger.error(f"Could not send buffered part for upload {upload_id}: {str(e)}")
+        return received
+
+    async def _flush(self, upload_id: str, user_id: str, s3: S3Service, final: bool = False):
+        """
+        Send buffered chunks to S3, one part at a time. A part is the
+        shortest run of chunks from `flushed` that reaches the part size;
+        a shorter remainder is only sent when `final` and every byte has
+        arrived, since S3 accepts a short part only as the last one.
+
+        The S3 calls run with no DB transaction open, and a part is recorded
+        only if `flushed` hasn't moved meanwhile. Because a part's bytes
+        depend only on where it starts, a concurrent flush of the same part
+        uploads identical bytes under the same number, so either one may win.
+        """
+        while True:
+            upload = await self.get_upload(upload_id, user_id)
+            with outside_request_session():
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT chunk_offset, length(data)
+                        FROM resumable_upload_chunks
+                        WHERE upload_id = %s AND chunk_offset >= %s
+                        ORDER BY chunk_offset
+                        """,
+                        (upload_id, upload["flushed"]),
+                    )
+                    sizes = await cursor.fetchall()
+
+            offsets = []
+            length = 0
+            for chunk_offset, chunk_size in sizes:
+                if length >= S3_UPLOAD_PART_SIZE:
+                    break
+                offsets.append(chunk_offset)
+                length += chunk_size
+            is_last = upload["flushed"] + length == upload["size"]
+            if not length or (length < S3_UPLOAD_PART_SIZE and not (final and is_last)):
+                return
+
+            with outside_request_session():
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    await cursor.execute(
+                        """
+                        SELECT data
+                        FROM resumable_upload_chunks
+                        WHERE upload_id = %s AND chunk_offset = ANY(%s)
+                        ORDER BY chunk_offset
+                        """,
+                        (upload_id, offsets),
+                    )
+                    body = b"".join(bytes(row[0]) for row in await cursor.fetchall())
+            flushed = upload["flushed"] + len(body)
+
+            async with upload_semaphore():
+                part = await s3.upload_part(upload["key"], upload["s3_upload_id"], len(upload["parts"]) + 1, body)
+
+            with outside_request_session():
+                async with get_async_db_connection(self.schema_id) as cursor:
+                    await cursor.execute(
+                        """
+                        UPDATE resumable_uploads
+                        SET flushed = %s, parts = parts || %s::jsonb, updated_at = now()
+                        WHERE upload_id = %s AND flushed = %s
+                        """,
+                        (flushed, json.dumps([part]), upload_id, upload["flushed"]),
+                    )
+                    if cursor.rowcount:
+                        await cursor.execute(
+                            "DELETE FROM resumable_upload_chunks WHERE upload_id = %s AND chunk_offset < %s",
+                            (upload_id, flushed),
+                        )
+
+    async def complete_upload(self, upload_id: str, user_id: str, s3: S3Service) -> dict:
+        """Send the last part and assemble the object once every byte has arrived."""
+        upload = await self.get_upload(upload_id, user_id)
+        if upload["status"] == "completed":
+            return {"upload_id": upload_id, "key": upload["key"], "size": upload["size"]}
+        if upload["status"] != "open":
+            raise HTTPException(status_code=409, detail=f"Upload is {upload['status']}")
+        if upload["offset"] != upload["size"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete; {upload['offset']} of {upload['size']} bytes received",
+            )
+
+        await self._flush(upload_id, user_id, s3, final=True)
+        upload = await self.get_upload(upload_id, user_id)
+        if upload["flushed"] != upload["size"]:
+            raise HTTPException(status_code=409, detail="Upload is being completed by another request")
+
+        if upload["parts"]:
+            await s3.complete_multipart_upload(upload["key"], upload["s3_upload_id"], upload["parts"])
+        else:
+            # Empty file: S3 rejects a multipart upload with no parts
+            await s3.abort_multipart_upload(upload["key"], upload["s3_upload_id"])
+            await s3.put_bytes(upload["key"], b"")
+
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                await cursor.execute(
+                    "UPDATE resumable_uploads SET status = 'completed', updated_at = now() WHERE upload_id = %s",
+                    (upload_id,),
+                )
+        return {"upload_id": upload_id, "key": upload["key"], "size": upload["size"]}
+
+    async def abort_upload(self, upload_id: str, user_id: str, s3: S3Service):
+        upload = await self.get_upload(upload_id, user_id)
+        if upload["status"] == "completed":
+            raise HTTPException(status_code=409, detail="Upload is already completed")
+        with outside_request_session():
+            async with get_async_db_connection(self.schema_id) as cursor:
+                await cursor.execute("DELETE FROM resumable_upload_chunks WHERE upload_id = %s", (upload_id,))
+                await cursor.execute(
+                    "UPDATE resumable_uploads SET status = 'aborted', updated_at = now() WHERE upload_id = %s",
+                    (upload_id,),
+                )
+        await s3.abort_multipart_upload(upload["key"], upload["s3_upload_id"])
+
+
+async def purge_expired_uploads(schema: str, s3: S3Service) -> int:
+    """
+    Abort the schema's uploads that have had no chunk for
+    RESUMABLE_UPLOAD_EXPIRY_HOURS: mark them aborted, drop their buffered
+    chunks, then abort their S3 multipart uploads. Returns how many.
+    Uploads a PATCH is writing to right now are skipped.
+    """
+    with outside_request_session():
+        async with get_async_db_connection(schema) as cursor:
+            await cursor.execute(
+                """
+                UPDATE resumable_uploads u
+                SET status = 'aborted', updated_at = now()
+                FROM (
+                    SELECT upload_id
+                    FROM resumable_uploads
+                    WHERE status = 'open' AND updated_at < now() - make_interval(hours => %s)
+                    FOR UPDATE SKIP LOCKED
+                ) expired
+                WHERE u.upload_id = expired.upload_id
+                RETURNING u.upload_id, u.object_key, u.s3_upload_id
+                """,
+                (RESUMABLE_UPLOAD_EXPIRY_HOURS,),
+            )
+            expired = await cursor.fetchall()
+            if expired:
+                await cursor.execute(
+                    "DELETE FROM resumable_upload_chunks WHERE upload_id = ANY(%s)",
+                    ([row[0] for row in expired],),
+                )
+
+    for _, key, s3_upload_id in expired:
+        await s3.abort_multipart_upload(key, s3_upload_id)
+    return len(expired)
+
+
+async def _upload_schemas() -> Set[str]:
+    """Tenant schemas that have a resumable_uploads table."""
+    async with get_async_db_connection("public") as cursor:
+        await cursor.execute(
+            """
+            SELECT table_schema
+            FROM information_schema.tables
+            WHERE table_name = 'resumable_uploads' AND table_type = 'BASE TABLE'
+            """
+        )
+        return {row[0] for row in await cursor.fetchall()}
+
+
+async def _sweep():
+    while True:
+        try:
+            s3 = get_s3_service()
+            for schema in await _upload_schemas():
+                try:
+                    purged = await purge_expired_uploads(schema, s3)
+                    if purged:
+                        logger.info(f"Aborted {purged} expired uploads in schema '{schema}'")
+                except Exception as e:
+                    # still open; tried again on the next sweep
+                    logger.error(f"Could not purge expired uploads for schema '{schema}': {str(e)}")
+        except Exception as e:
+            logger.error(f"Could not sweep expired uploads: {str(e)}")
+        await asyncio.sleep(RESUMABLE_UPLOAD_SWEEP_SECONDS)
+
+
+def start_upload_sweeper():
+    """Start aborting expired uploads in the background; call once the DB pools are up."""
+    global _sweeper
+    if RESUMABLE_UPLOAD_EXPIRY_HOURS <= 0 or _sweeper is not None:
+        return
+    _sweeper = asyncio.create_task(_sweep())
+
+
+async def stop_upload_sweeper():
+    global _sweeper
+    if _sweeper is None:
+        return
+    _sweeper.cancel()
+    try:
+        await _sweeper
+    except asyncio.CancelledError:
+        pass
+    _sweeper = None
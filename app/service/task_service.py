@@ -3,7 +3,8 @@ from typing import List
 import uuid
 
 from app.Models.task_model import TaskCreate, TaskCreationResponse, TaskListResponse, TaskResponse, TaskUpdate
-from app.configuration.database import get_db_connection
+from app.configuration.cache import invalidate_dashboards
+from app.configuration.database import get_db_connection, read_only
 from app.repository.user_repo import get_user_by_id
 
 
@@ -41,13 +42,14 @@ class TaskService:
             created_by_name = created_by["name"] if created_by else None
             # print("Created by user details:", created_by)
 
-            return TaskCreationResponse(
-                task_id=task_record[0],
-                name=task_record[1],
-                description=task_record[2],
-                created_by=created_by_name,
-                created_at=task_record[4],
-            )
+        invalidate_dashboards(self.schema_id, task_data.created_by)
+        return TaskCreationResponse(
+            task_id=task_record[0],
+            name=task_record[1],
+            description=task_record[2],
+            created_by=created_by_name,
+            created_at=task_record[4],
+        )
 
     # update task with task_id
     def update_task(self, task_id: uuid.UUID, task_data: TaskUpdate) -> bool:
@@ -97,6 +99,7 @@ class TaskService:
     #             )
     #         return None
 
+    @read_only
     def get_task_by_id(self, task_id: uuid.UUID, user_id: uuid.UUID, role: str) -> TaskResponse | None:
         with get_db_connection(self.schema_id) as cursor:
             if role.lower() == "admin":
@@ -143,6 +146,7 @@ class TaskService:
             return None
 
     #get all tasks
+    @read_only
     def get_tasks_list(self, user_id: uuid.UUID) -> List[TaskResponse]:  
         with get_db_connection(self.schema_id) as cursor:
             cursor.execute(
@@ -169,6 +173,7 @@ class TaskService:
             return tasks
 
     #get tasks list for user
+    @read_only
     def get_tasks_list_for_user(self, user_id: uuid.UUID) -> List[TaskListResponse]:
         with get_db_connection(self.schema_id) as cursor:
             cursor.execute(
@@ -242,6 +247,7 @@ class TaskService:
         #             "tasks": tasks,
         #         }
     # get all tasks with pagination (works for both admin and users)
+    @read_only
     def get_all_tasks(self, user_id: uuid.UUID, role: str, page: int = 0, limit: int = 10) -> dict[str, any]:
         offset = page * limit
 
@@ -331,9 +337,13 @@ class TaskService:
                 """,
                 (str(task_id), str(user_id)),
             )
-            return cursor.rowcount == 1
+            deleted = cursor.rowcount == 1
+        if deleted:
+            invalidate_dashboards(self.schema_id)
+        return deleted
 
     #get favorite tasks
+    @read_only
     def get_tasks_by_ids(self, task_ids: List[uuid.UUID]) -> List[TaskResponse]:
             with get_db_connection(self.schema_id) as cursor:
                 # convert UUIDs to strings